@@ -0,0 +1,276 @@
+import argparse
+import gzip
+import json
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+# ===== CONFIGURATION =====
+
+DEFAULT_ANALYSIS_SOURCE = "sp500_bill_analysis.json"
+DEFAULT_DETAILS_PATH = "../ui/app/data.txt"
+DEFAULT_OUTPUT_DIR = "../ui/public/bundle"
+DEFAULT_NUM_SHARDS = 16
+DEFAULT_TOP_N = 10
+
+BUNDLE_VERSION = 1
+
+# Fields kept in the columnar summary; everything else goes to the detail shards
+FACTOR_FIELDS = {
+    "direct": "DirectRiskFactor",
+    "indirect": "IndirectRiskFactor",
+    "time": "TimeFactor",
+}
+
+
+# ===== LOADING =====
+
+
+def load_company_details(details_path):
+    """Company list (ticker, weight, sector) from the FinancialInformationAgent output"""
+    with open(details_path, "r", encoding="utf-8") as f:
+        return json.load(f)["company_details"]
+
+
+def load_analyses(source):
+    """Per-ticker analyses from batch_analyze_sp500: either the aggregated JSON
+    list or a folder of <TICKER>.json files"""
+    source = Path(source)
+    analyses = {}
+
+    if source.is_dir():
+        for file_path in sorted(source.glob("*.json")):
+            with open(file_path, "r", encoding="utf-8") as f:
+                analysis = json.load(f)
+            analyses[analysis.get("Ticker", file_path.stem)] = analysis
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            for analysis in json.load(f):
+                analyses[analysis["Ticker"]] = analysis
+
+    return analyses
+
+
+def parse_weight(weight):
+    """Weights are stored as French decimals ("0,0765")"""
+    try:
+        return float(str(weight).replace(",", "."))
+    except ValueError:
+        return 0.0
+
+
+def shard_for(ticker, num_shards):
+    """Stable shard assignment (crc32 is identical across runs, unlike hash())"""
+    return zlib.crc32(ticker.encode("utf-8")) % num_shards
+
+
+# ===== BUNDLE =====
+
+
+def build_summary(company_details, analyses, num_shards):
+    """Columnar first-paint summary: one array per field, one row per company"""
+    sectors = sorted({c.get("gics_sector", "Unclassified") for c in company_details})
+    sector_index = {sector: idx for idx, sector in enumerate(sectors)}
+
+    columns = {
+        "ticker": [],
+        "company": [],
+        "weight": [],
+        "sector": [],
+        **{name: [] for name in FACTOR_FIELDS},
+        "shard": [],
+    }
+
+    for company in company_details:
+        ticker = company["ticker"]
+        analysis = analyses.get(ticker, {})
+
+        columns["ticker"].append(ticker)
+        columns["company"].append(company.get("company", ticker))
+        columns["weight"].append(round(parse_weight(company.get("weight", 0)), 6))
+        columns["sector"].append(sector_index[company.get("gics_sector", "Unclassified")])
+        for name, field in FACTOR_FIELDS.items():
+            columns[name].append(analysis.get(field, 0))
+        columns["shard"].append(shard_for(ticker, num_shards))
+
+    return {
+        "version": BUNDLE_VERSION,
+        "generated_at": datetime.now().isoformat(),
+        "num_shards": num_shards,
+        "sectors": sectors,
+        "columns": columns,
+    }
+
+
+def build_detail_shards(analyses, num_shards):
+    """Everything not needed for first paint, grouped into num_shards shards"""
+    shards = {idx: {} for idx in range(num_shards)}
+
+    for ticker, analysis in analyses.items():
+        detail = {
+            key: value
+            for key, value in analysis.items()
+            if key != "Ticker" and key not in FACTOR_FIELDS.values()
+        }
+        shards[shard_for(ticker, num_shards)][ticker] = detail
+
+    return shards
+
+
+# ===== AGGREGATES =====
+
+
+def risk_index(analysis):
+    """Composite score shown by the dashboard: (Direct + Indirect) / 2 x Time"""
+    direct = analysis.get("DirectRiskFactor", 0)
+    indirect = analysis.get("IndirectRiskFactor", 0)
+    time_factor = analysis.get("TimeFactor", 0)
+    return (direct + indirect) / 2 * time_factor
+
+
+def _weighted_mean(pairs):
+    total_weight = sum(weight for _, weight in pairs)
+    if total_weight <= 0:
+        return 0.0
+    return sum(value * weight for value, weight in pairs) / total_weight
+
+
+def compute_risk_aggregates(company_details, analyses, top_n=DEFAULT_TOP_N):
+    """Weighted portfolio risk, per-GICS-sector aggregates and top-N rankings.
+
+    Companies without an analysis count with zero risk but keep their weight,
+    the same way the dashboard treats them.
+    """
+    rows = []
+    for company in company_details:
+        analysis = analyses.get(company["ticker"], {})
+        rows.append({
+            "ticker": company["ticker"],
+            "company": company.get("company", company["ticker"]),
+            "sector": company.get("gics_sector", "Unclassified"),
+            "weight": parse_weight(company.get("weight", 0)),
+            "risk": risk_index(analysis),
+            "direct": analysis.get("DirectRiskFactor", 0),
+            "indirect": analysis.get("IndirectRiskFactor", 0),
+            "analyzed": company["ticker"] in analyses,
+        })
+
+    def summarize(group):
+        return {
+            "weight": round(sum(r["weight"] for r in group) * 100, 4),
+            "weighted_risk": round(_weighted_mean([(r["risk"], r["weight"]) for r in group]), 4),
+            "weighted_direct": round(_weighted_mean([(r["direct"], r["weight"]) for r in group]), 4),
+            "weighted_indirect": round(_weighted_mean([(r["indirect"], r["weight"]) for r in group]), 4),
+            "companies": len(group),
+            "analyzed": sum(1 for r in group if r["analyzed"]),
+        }
+
+    by_sector = {}
+    for row in rows:
+        by_sector.setdefault(row["sector"], []).append(row)
+
+    sectors = sorted(
+        ({"name": name, **summarize(group)} for name, group in by_sector.items()),
+        key=lambda sector: sector["weight"],
+        reverse=True,
+    )
+
+    def ranking(ordered):
+        return [
+            {
+                "ticker": r["ticker"],
+                "company": r["company"],
+                "sector": r["sector"],
+                "risk": round(r["risk"], 4),
+                "weight": round(r["weight"] * 100, 4),
+                "contribution": round(r["risk"] * r["weight"], 6),
+            }
+            for r in ordered[:top_n]
+        ]
+
+    analyzed = [r for r in rows if r["analyzed"]]
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "portfolio": summarize(rows),
+        "sectors": sectors,
+        "rankings": {
+            "most_at_risk": ranking(sorted(analyzed, key=lambda r: r["risk"])),
+            "most_favoured": ranking(sorted(analyzed, key=lambda r: r["risk"], reverse=True)),
+            "largest_risk_contribution": ranking(sorted(analyzed, key=lambda r: r["risk"] * r["weight"])),
+        },
+    }
+
+
+def print_risk_report(aggregates):
+    portfolio = aggregates["portfolio"]
+    print(f"\nPortfolio risk: {portfolio['weighted_risk']:+.3f} "
+          f"({portfolio['analyzed']}/{portfolio['companies']} companies analyzed)")
+    print(f"\n{'Sector':<26s} {'Weight':>7s} {'Risk':>7s}")
+    for sector in aggregates["sectors"]:
+        print(f"{sector['name']:<26s} {sector['weight']:6.2f}% {sector['weighted_risk']:+7.3f}")
+    print(f"\nMost at Risk:")
+    for r in aggregates["rankings"]["most_at_risk"][:5]:
+        print(f"  {r['ticker']:5s} {r['risk']:+.3f}")
+
+
+def _compact_json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def export_dashboard_bundle(
+    analysis_source=DEFAULT_ANALYSIS_SOURCE,
+    details_path=DEFAULT_DETAILS_PATH,
+    output_dir=DEFAULT_OUTPUT_DIR,
+    num_shards=DEFAULT_NUM_SHARDS,
+    top_n=DEFAULT_TOP_N,
+):
+    """Write summary.json, aggregates.json and details/<shard>.json.gz for the dashboard"""
+    company_details = load_company_details(details_path)
+    analyses = load_analyses(analysis_source)
+
+    output_dir = Path(output_dir)
+    details_dir = output_dir / "details"
+    details_dir.mkdir(parents=True, exist_ok=True)
+
+    # Remove shards left over from a run with a different shard count
+    for stale in details_dir.glob("*.json.gz"):
+        stale.unlink()
+
+    summary = build_summary(company_details, analyses, num_shards)
+    summary_path = output_dir / "summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        f.write(_compact_json(summary))
+
+    aggregates = compute_risk_aggregates(company_details, analyses, top_n)
+    aggregates_path = output_dir / "aggregates.json"
+    with open(aggregates_path, "w", encoding="utf-8") as f:
+        f.write(_compact_json(aggregates))
+
+    shard_bytes = 0
+    for idx, shard in build_detail_shards(analyses, num_shards).items():
+        payload = gzip.compress(_compact_json(shard).encode("utf-8"), compresslevel=9)
+        (details_dir / f"{idx}.json.gz").write_bytes(payload)
+        shard_bytes += len(payload)
+
+    print(f"✅ Dashboard bundle: {len(company_details)} companies, {len(analyses)} analyses")
+    print(f"   Summary: {summary_path} ({summary_path.stat().st_size:,} bytes)")
+    print(f"   Aggregates: {aggregates_path} ({aggregates_path.stat().st_size:,} bytes)")
+    print(f"   Details: {num_shards} shards in {details_dir} ({shard_bytes:,} bytes)")
+    print_risk_report(aggregates)
+
+    return summary, aggregates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the compact dashboard data bundle")
+    parser.add_argument("--analyses", default=DEFAULT_ANALYSIS_SOURCE,
+                        help="batch_analyze_sp500 aggregated JSON or folder of per-ticker JSON")
+    parser.add_argument("--details", default=DEFAULT_DETAILS_PATH,
+                        help="company details JSON (ticker, weight, sector)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--shards", type=int, default=DEFAULT_NUM_SHARDS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="size of the risk rankings")
+    args = parser.parse_args()
+
+    export_dashboard_bundle(args.analyses, args.details, args.output, args.shards, args.top)
@@ -1,12 +1,15 @@
 import os
+import sys
 import json
 import pandas as pd
 import openai
 from tavily import TavilyClient
 from sec_downloader import Downloader
-from markitdown import MarkItDown
-from bs4 import BeautifulSoup
-import copy
+import functools
+import hashlib
+import io
+import mmap
+from contextlib import contextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 import statistics
@@ -14,105 +17,361 @@ import time
 import traceback
 import re
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from Common.conversion import conversion_stage
+from Common.model_client import openai_model_client
+from Common.near_duplicates import MinHasher, NearDuplicateIndex
+from Common.quotes import QuoteIndex
+from Common.telemetry import tracer
+from Common.tokens import count_tokens
+from Common.transport import transport
+
 load_dotenv()
 
 # ===== CONFIGURATION =====
 
-client = openai.OpenAI(api_key=BEDROCK_API_KEY, base_url=BEDROCK_ENDPOINT)
-tavily_client = TavilyClient(TAVILY_API_KEY)
-md = MarkItDown(enable_plugins=False)
+BEDROCK_API_KEY = os.getenv("BEDROCK_API_KEY")
+BEDROCK_ENDPOINT = os.getenv("BEDROCK_ENDPOINT")
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+MODEL_ID = os.getenv("MODEL_ID", "openai.gpt-oss-120b-1:0")
+
+# External clients go through the record/replay transport (TRANSPORT_MODE=live/record/replay).
+# The model client pools connections, bounds concurrency and retries, and labels
+# calls with their routing tier ("triage" / "extraction") for the per-tier counters
+model_client = openai_model_client(
+    BEDROCK_API_KEY, BEDROCK_ENDPOINT, default_model=MODEL_ID, default_tier="extraction"
+)
+tavily_client = transport.wrap_tavily(lambda: TavilyClient(TAVILY_API_KEY))
+sec_client = transport.wrap_sec_downloader(lambda: Downloader("Company", "email@example.com"))
+
+
+# ===== MODEL ROUTING =====
+
+# A small, fast model flags the chunks worth extracting and only those go to
+# MODEL_ID; quote verification still checks everything the extraction returns.
+# TRIAGE_MODEL_ID="" sends every chunk to the extraction model.
+TRIAGE_MODEL_ID = os.getenv("TRIAGE_MODEL_ID", "openai.gpt-oss-20b-1:0")
+TRIAGE_TOKEN_BUDGET = int(os.getenv("TRIAGE_TOKEN_BUDGET", "16000"))
+TRIAGE_CHUNKS_PER_REQUEST = int(os.getenv("TRIAGE_CHUNKS_PER_REQUEST", "8"))
+
+TRIAGE_SYSTEM_MESSAGES = {
+    "bill": """Triage bill text for the company below. The text comes in <chunk id="N"> blocks.
+A chunk is relevant if it has a specific provision (tariff, tax, subsidy, ban, regulation,
+preferably with a rate or amount) that could affect the company, its industry, its suppliers
+or their countries. Procedural text, definitions and general statements are not relevant.
+When unsure, include the chunk.
+
+Output: {"relevant": [chunk ids]}""",
+    "sec": """Triage 10-K text. The text comes in <chunk id="N"> blocks.
+A chunk is relevant if it states a QUANTITATIVE metric about supplier concentration,
+geographic exposure, customer concentration or financials (a percentage, amount or count).
+When unsure, include the chunk.
+
+Output: {"relevant": [chunk ids]}""",
+}
+
+
+class ChunkPacker:
+    """Packs (chunk_num, idx, chunk_text) chunks into requests of at most
+    max_chunks chunks and token_budget prompt tokens, prefix included"""
+
+    def __init__(self, prefix_tokens, token_budget, max_chunks):
+        self.prefix_tokens = prefix_tokens
+        self.token_budget = token_budget
+        self.max_chunks = max(1, max_chunks)
+
+    @staticmethod
+    def chunk_block(chunk_num, chunk_text):
+        return f'<chunk id="{chunk_num}">\n{chunk_text}\n</chunk>'
+
+    def chunk_blocks(self, chunks):
+        return "\n".join(self.chunk_block(chunk_num, chunk_text) for chunk_num, _, chunk_text in chunks)
+
+    def chunk_tokens(self, chunk_num, chunk_text):
+        return count_tokens(self.chunk_block(chunk_num, chunk_text))
+
+    def fits(self, batch_tokens, batch_size, chunk_tokens):
+        """Whether one more chunk fits a batch; an empty batch takes any chunk"""
+        if batch_size == 0:
+            return True
+        return (
+            batch_size < self.max_chunks
+            and self.prefix_tokens + batch_tokens + chunk_tokens <= self.token_budget
+        )
+
+    def pack(self, chunks):
+        """Split [(chunk_num, idx, chunk_text)] into request-sized batches"""
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = self.chunk_tokens(chunk[0], chunk[2])
+            if not self.fits(batch_tokens, len(batch), tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+
+class ChunkTriage(ChunkPacker):
+    """Relevance triage of a document's chunks on TRIAGE_MODEL_ID, one request
+    per packed batch. Fails open: if the triage call fails or answers
+    nonsense, every chunk goes on to extraction."""
+
+    def __init__(
+        self,
+        kind,
+        header,
+        model_id=TRIAGE_MODEL_ID,
+        token_budget=TRIAGE_TOKEN_BUDGET,
+        max_chunks=TRIAGE_CHUNKS_PER_REQUEST,
+    ):
+        self.system_message = TRIAGE_SYSTEM_MESSAGES[kind]
+        self.header = header
+        self.model_id = model_id
+        super().__init__(
+            count_tokens(self.system_message) + count_tokens(header), token_budget, max_chunks
+        )
+
+    def relevant(self, chunks):
+        """The chunks of one batch flagged relevant, in order"""
+        try:
+            with tracer.span("triage", chunks=len(chunks)):
+                result = model_client.complete_json_sync(
+                    [
+                        {"role": "system", "content": self.system_message},
+                        {"role": "user", "content": f"{self.header}\n{self.chunk_blocks(chunks)}"},
+                    ],
+                    model=self.model_id,
+                    tier="triage",
+                    temperature=0,
+                    max_tokens=200,
+                )
+                flagged = {int(chunk_id) for chunk_id in result["relevant"]}
+        except Exception as e:
+            print(f"   ⚠️ Triage error, sending all {len(chunks)} chunks to extraction: {e}")
+            tracer.count("triage_errors")
+            return list(chunks)
+
+        positives = [chunk for chunk in chunks if chunk[0] in flagged]
+        tracer.count("triage_positive", len(positives))
+        tracer.count("triage_negative", len(chunks) - len(positives))
+        return positives
+
+
+# ===== QUOTE VERIFICATION =====
+
+
+def find_quote(quote, chunk_text, quote_index=None):
+    """(start, end) of a model quote, or None if it is not in the source.
+
+    With a QuoteIndex the whole document read so far is searched, ignoring
+    whitespace and Unicode differences, and the offsets are document offsets;
+    without one the quote must appear verbatim in chunk_text.
+    """
+    if not quote:
+        return None
+
+    if quote_index is None:
+        start = chunk_text.find(quote)
+        return (start, start + len(quote)) if start != -1 else None
+
+    offsets = quote_index.find(quote)
+    if offsets and quote not in chunk_text:
+        # Would have been rejected by a verbatim in-chunk check
+        tracer.count("quotes_recovered")
+    return offsets
+
+
+# ===== PER-COMPANY BUDGETS =====
+
+# Caps on what one analyze_stock run may spend (0 = unlimited)
+COMPANY_MAX_LLM_CALLS = int(os.getenv("COMPANY_MAX_LLM_CALLS", "0"))
+COMPANY_MAX_TOKENS = int(os.getenv("COMPANY_MAX_TOKENS", "0"))
+COMPANY_MAX_SECONDS = float(os.getenv("COMPANY_MAX_SECONDS", "0"))
+
+
+class CompanyBudget:
+    """LLM calls, tokens and wall time one company may use, read from its
+    "stock" span, plus a record of the work skipped or cut short (budget or
+    early exit) so it shows up in the output Overview.
+
+    Checked before each request, so the last request may overshoot a cap.
+    The wall-time clock runs from creation; pause() stops it while the
+    company waits (between pipeline stages) and resume() restarts it.
+    """
+
+    def __init__(
+        self,
+        max_llm_calls=COMPANY_MAX_LLM_CALLS,
+        max_tokens=COMPANY_MAX_TOKENS,
+        max_seconds=COMPANY_MAX_SECONDS,
+    ):
+        self.limits = {"llm_calls": max_llm_calls, "tokens": max_tokens, "seconds": max_seconds}
+        self.span = tracer.current()
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        self.skips = []
+
+    def pause(self):
+        if self.start is not None:
+            self.elapsed += time.perf_counter() - self.start
+            self.start = None
+
+    def resume(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+
+    def seconds(self):
+        running = time.perf_counter() - self.start if self.start is not None else 0.0
+        return self.elapsed + running
+
+    def used(self):
+        counters = self.span.counters if self.span is not None else {}
+        return {
+            "llm_calls": counters.get("llm_calls", 0),
+            "tokens": counters.get("prompt_tokens", 0) + counters.get("completion_tokens", 0),
+            "seconds": round(self.seconds(), 1),
+        }
+
+    def exceeded(self):
+        """Name of the first exhausted limit ("max_tokens"...), or None"""
+        used = self.used()
+        for name, limit in self.limits.items():
+            if limit and used[name] >= limit:
+                return f"max_{name}"
+        return None
+
+    def skip(self, step, reason, **details):
+        print(f"   ⏭️  {step} skipped ({reason}) " + ", ".join(f"{k}={v}" for k, v in details.items()))
+        tracer.count("budget_skips")
+        self.skips.append({"step": step, "reason": reason, **details})
+
+    def truncated_bills(self):
+        """{bill name: exhausted limit} of the bills a limit cut short or
+        skipped. Early exits are left out: they are part of the analysis, and
+        their chunks are in the chunk log."""
+        truncated = {}
+        for skip in self.skips:
+            if skip["step"] != "bills" or skip["reason"] == "early_exit":
+                continue
+            for name in skip.get("bills_skipped", [skip.get("bill")]):
+                truncated.setdefault(name, skip["reason"])
+        return truncated
+
+    def report(self):
+        return {
+            "limits": {name: limit for name, limit in self.limits.items() if limit},
+            "used": self.used(),
+            "truncated": bool(self.skips),
+            "skips": self.skips,
+        }
 
 
 # ===== STEP 1: SEC FILING ANALYSIS =====
 
 
-def analyze_sec_filing(ticker):
-    """Extract risk metrics from SEC 10-K with EXACT citations - AI ONLY for extraction"""
-    print(f"\n{'=' * 70}")
-    print(f"[STEP 1] 📄 SEC FILING ANALYSIS: {ticker}")
-    print(f"{'=' * 70}")
+def extract_sec_metrics(chunk_num, chunk_text, quote_index):
+    """One extraction call on one 10-K chunk, returns the metrics whose quote verifies"""
+    verified_metrics = []
 
-    try:
-        dl = Downloader("Company", "email@example.com")
-        html = dl.get_filing_html(ticker=ticker, form="10-K")
+    with tracer.span("sec_chunk", chunk=chunk_num):
+        try:
+            result = model_client.complete_json_sync(
+                [
+                    {
+                        "role": "system",
+                        "content": """Extract QUANTITATIVE metrics with EXACT quotes ONLY.
+                    Output: {
+                        "metrics": [{
+                            "type": "supplier_concentration/geographic/customer/financial",
+                            "value": number,
+                            "unit": "percent/million/etc",
+                            "exact_quote": "COPY VERBATIM from text"
+                        }]
+                    }""",
+                    },
+                    {"role": "user", "content": chunk_text},
+                ],
+                temperature=0.05,
+                max_tokens=600,
+            )
+
+            for metric in result.get("metrics", []):
+                exact_quote = metric.get("exact_quote", "")
+                # VERIFY quote exists
+                quote_offsets = find_quote(exact_quote, chunk_text, quote_index)
+                if quote_offsets:
+                    metric["quote_offsets"] = list(quote_offsets)
+                    verified_metrics.append(metric)
+                    print(
+                        f"✅ {metric.get('type')}: {metric.get('value')} {metric.get('unit', '')}"
+                    )
+                else:
+                    tracer.reject("sec_quote_not_found")
+
+        except Exception as e:
+            pass
 
-        soup = BeautifulSoup(html, "html.parser")
+    return verified_metrics
 
-        # Extract tables
-        table_list = []
-        i = 1
-        for table in soup.find_all("table"):
-            table_list.append({"index": i, "html": str(copy.deepcopy(table))})
-            table.replace_with(f"TABLE_PLACEHOLDER_{i}")
-            i += 1
 
-        # Remove hidden
-        for div in soup.find_all("div", {"style": "display:none"}):
-            div.decompose()
+@tracer.traced("sec_filing", ticker="ticker")
+def analyze_sec_filing(ticker, budget=None):
+    """Extract risk metrics from SEC 10-K with EXACT citations - AI ONLY for extraction
 
-        # Convert to markdown
-        with open("temp_filing.html", "w", encoding="utf-8") as f:
-            f.write(soup.prettify())
+    With TRIAGE_MODEL_ID set, the small model first picks the chunks that
+    have metrics; only those are sent to the extraction model.
+    """
+    print(f"\n{'=' * 70}")
+    print(f"[STEP 1] 📄 SEC FILING ANALYSIS: {ticker}")
+    print(f"{'=' * 70}")
 
-        result = md.convert("temp_filing.html")
+    try:
+        html = sec_client.get_filing_html(ticker=ticker, form="10-K")
 
-        with open("temp_filing.md", "w", encoding="utf-8") as f:
-            f.write(result.text_content)
+        # Tables -> placeholders, hidden divs removed, markdown (process pool, cached)
+        filing_path = conversion_stage.path("sec_filing", html)
 
-        with open("temp_filing.md", "r", encoding="utf-8") as f:
+        with open(filing_path, "r", encoding="utf-8") as f:
             lines = [line.rstrip() for line in f]
 
         verified_metrics = []
         chunk_size = 100
-
-        # AI ONLY extracts - we verify
+        # Quotes are verified against the whole filing, not just the chunk
+        quote_index = QuoteIndex()
+        chunks = []
         for idx in range(0, len(lines), chunk_size):
-            chunk = lines[idx : idx + chunk_size]
-            chunk_text = "\n".join(chunk)
+            chunk_text = "\n".join(lines[idx : idx + chunk_size])
+            quote_index.add(chunk_text + "\n")
+            if chunk_text.strip():
+                chunks.append((idx // chunk_size + 1, idx, chunk_text))
 
-            if not chunk_text.strip():
-                continue
+        triage = ChunkTriage("sec", f"Company ticker: {ticker}") if TRIAGE_MODEL_ID else None
+        batches = triage.pack(chunks) if triage is not None else ([chunk] for chunk in chunks)
 
-            try:
-                response = client.chat.completions.create(
-                    model=MODEL_ID,
-                    response_format={"type": "json_object"},
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": """Extract QUANTITATIVE metrics with EXACT quotes ONLY.
-                            Output: {
-                                "metrics": [{
-                                    "type": "supplier_concentration/geographic/customer/financial",
-                                    "value": number,
-                                    "unit": "percent/million/etc",
-                                    "exact_quote": "COPY VERBATIM from text"
-                                }]
-                            }""",
-                        },
-                        {"role": "user", "content": chunk_text},
-                    ],
-                    temperature=0.05,
-                    max_tokens=600,
+        # AI ONLY extracts - we verify
+        for batch in batches:
+            positives = batch
+            exceeded = budget.exceeded() if budget is not None else None
+            if not exceeded and triage is not None:
+                positives = triage.relevant(batch)
+
+            for chunk_num, _, chunk_text in positives:
+                exceeded = exceeded or (budget.exceeded() if budget is not None else None)
+                if exceeded:
+                    break
+                verified_metrics.extend(extract_sec_metrics(chunk_num, chunk_text, quote_index))
+
+            if exceeded:
+                first_skipped = chunk_num if positives else batch[0][0]
+                budget.skip(
+                    "sec_filing",
+                    exceeded,
+                    chunks_skipped=sum(1 for chunk in chunks if chunk[0] >= first_skipped),
                 )
-
-                result = json.loads(response.choices[0].message.content)
-                for metric in result.get("metrics", []):
-                    exact_quote = metric.get("exact_quote", "")
-                    # VERIFY quote exists
-                    if exact_quote and exact_quote in chunk_text:
-                        verified_metrics.append(metric)
-                        print(
-                            f"✅ {metric.get('type')}: {metric.get('value')} {metric.get('unit', '')}"
-                        )
-
-            except Exception as e:
-                continue
-
-        # Cleanup
-        for temp_file in ["temp_filing.html", "temp_filing.md"]:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+                break
 
         print(f"\n✅ SEC: {len(verified_metrics)} verified metrics")
         return verified_metrics
@@ -125,12 +384,18 @@ def analyze_sec_filing(ticker):
 # ===== STEP 2: SUPPLIER ANALYSIS =====
 
 
-def analyze_suppliers(company_name):
+@tracer.traced("suppliers", company="company_name")
+def analyze_suppliers(company_name, budget=None):
     """Get suppliers - AI ONLY for extraction"""
     print(f"\n{'=' * 70}")
     print(f"[STEP 2] 🔗 SUPPLIER ANALYSIS: {company_name}")
     print(f"{'=' * 70}")
 
+    exceeded = budget.exceeded() if budget is not None else None
+    if exceeded:
+        budget.skip("suppliers", exceeded)
+        return []
+
     try:
         response = tavily_client.search(
             query=f"{company_name} suppliers manufacturers contractors partners COMPANY NAMES",
@@ -140,10 +405,8 @@ def analyze_suppliers(company_name):
         info = response.get("answer", "")
 
         # AI ONLY extracts structured data
-        llm_response = client.chat.completions.create(
-            model=MODEL_ID,
-            response_format={"type": "json_object"},
-            messages=[
+        result = model_client.complete_json_sync(
+            [
                 {
                     "role": "system",
                     "content": """Extract suppliers ONLY if explicitly mentioned:
@@ -163,7 +426,6 @@ def analyze_suppliers(company_name):
             temperature=0.05,
         )
 
-        result = json.loads(llm_response.choices[0].message.content)
         suppliers = result.get("suppliers", [])
 
         print(f"✅ Found {len(suppliers)} suppliers")
@@ -180,18 +442,8 @@ def analyze_suppliers(company_name):
 # ===== STEP 3: BILL ANALYSIS - FIXED TO AVOID VAGUE IMPACTS =====
 
 
-def analyze_bills(company_name, sector, industry, suppliers, bills_folder="bills"):
-    """Analyze bills with STRICT direct impact requirements"""
-    print(f"\n{'=' * 70}")
-    print(f"[STEP 3] 📜 BILL ANALYSIS: {company_name}")
-    print(f"{'=' * 70}")
-
-    bills_path = Path(bills_folder)
-    if not bills_path.exists():
-        print("❌ No bills folder")
-        return []
-
-    # Build supplier context - COMPACT but complete
+def build_supplier_context(suppliers):
+    """Build supplier context - COMPACT but complete"""
     supplier_context = []
     for s in suppliers[:20]:  # Limit to top 20 suppliers
         supplier_context.append(
@@ -201,185 +453,749 @@ def analyze_bills(company_name, sector, industry, suppliers, bills_folder="bills
                 "criticality": s.get("criticality", "medium"),
             }
         )
+    return supplier_context
+
+
+# Chunk by characters to avoid extremely long lines breaking context
+BILL_CHUNK_SIZE = 5000  # ~5k chars per chunk
+BILL_CHUNK_OVERLAP = 200  # 200 char overlap to avoid splitting mid-sentence
+
+# STRICT system message to avoid vague impacts. Static, so it stays the
+# start of every bill prompt (providers cache identical prompt prefixes)
+BILL_SYSTEM_MESSAGE = """Extract ONLY DIRECT and SPECIFIC impacts on the company or its named suppliers.
+REJECT vague, general, or speculative impacts.
+
+CRITERIA FOR EXTRACTION:
+- MUST directly mention company, suppliers, or specific industries/products
+- MUST have clear quantitative impact (tariff rates, tax amounts, subsidy values)
+- MUST be specific legislation with clear consequences
+- REJECT general policy statements without specific impacts
+
+The bill text comes in <chunk id="N"> blocks; chunk_id is the block the quote is copied from.
+
+Output: {
+    "impacts": [{
+        "chunk_id": N,
+        "target": "company/specific_supplier_name",
+        "supplier_country": "country if supplier",
+        "impact_type": "tariff/regulation/tax/ban/subsidy",
+        "affected_geography": "country/region mentioned in bill",
+        "quantitative_value": number (REQUIRED for tariffs/taxes/subsidies),
+        "unit": "percent/dollars/etc",
+        "severity": float 0.0-1.0,
+        "exact_quote": "VERBATIM text from bill showing the specific impact",
+        "timeframe": "immediate/short-term/long-term",
+        "reasoning": "specific explanation of HOW this directly affects the target"
+    }]
+}
+
+REJECT impacts that are:
+- General industry trends
+- Vague policy statements
+- Speculative future effects
+- Without specific quantitative values for tariffs/taxes/subsidies"""
+
+# Chunks share one request (system message and supplier list sent once) up to
+# this many prompt tokens and chunks
+BILL_PROMPT_TOKEN_BUDGET = int(os.getenv("BILL_PROMPT_TOKEN_BUDGET", "8000"))
+BILL_CHUNKS_PER_REQUEST = int(os.getenv("BILL_CHUNKS_PER_REQUEST", "4"))
+BILL_COMPLETION_TOKENS_PER_CHUNK = 1500
+
+
+def encode_suppliers(supplier_context):
+    """One "name | country | criticality" line per supplier - a fraction of
+    the tokens of indented JSON"""
+    if not supplier_context:
+        return "(none)"
+    return "\n".join(
+        f"{s.get('name', '')} | {s.get('country', '')} | {s.get('criticality', 'medium')}"
+        for s in supplier_context
+    )
 
-    print(f"📊 Analyzing with {len(supplier_context)} supplier locations")
-    for s in supplier_context[:5]:
-        print(f"   - {s.get('name')} in {s.get('country')}")
 
-    all_verified_impacts = []
+def company_header(company_name, sector, industry, supplier_context):
+    return f"""Company: {company_name}
+Sector: {sector}
+Industry: {industry}
 
-    # Process ALL files
-    for file_path in bills_path.glob("*"):
-        if not file_path.is_file():
-            continue
+Known Suppliers (name | country | criticality):
+{encode_suppliers(supplier_context)}"""
 
-        print(f"\n📄 {file_path.name}")
 
-        try:
-            result = md.convert(str(file_path))
-            bill_text = result.text_content
+class BillPromptBuilder(ChunkPacker):
+    """Bill extraction prompts for one company, several chunks per request.
+
+    The company/supplier header comes before the chunks, so every request of a
+    company starts with the same system message + header and only the tail
+    varies. Token counts are measured (Common/tokens.py) to pack chunks up to
+    token_budget.
+    """
+
+    def __init__(
+        self,
+        company_name,
+        sector,
+        industry,
+        supplier_context,
+        token_budget=BILL_PROMPT_TOKEN_BUDGET,
+        max_chunks=BILL_CHUNKS_PER_REQUEST,
+    ):
+        self.header = f"""{company_header(company_name, sector, industry, supplier_context)}
+
+Analyze for DIRECT, SPECIFIC impacts only. Reject vague statements.
+
+Bill Text:"""
+        super().__init__(
+            count_tokens(BILL_SYSTEM_MESSAGE) + count_tokens(self.header), token_budget, max_chunks
+        )
+
+    def messages(self, chunks):
+        return [
+            {"role": "system", "content": BILL_SYSTEM_MESSAGE},
+            {"role": "user", "content": f"{self.header}\n{self.chunk_blocks(chunks)}"},
+        ]
+
+
+# Read straight from disk, no conversion needed
+PLAIN_TEXT_SUFFIXES = (".txt", ".md")
+# UTF-8 continuation bytes: dropping them from a byte block leaves one byte per character
+UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+def scan_text_file(path, block_size=4 * 1024 * 1024):
+    """(char count, longest line in bytes) of a UTF-8 file, scanned block by
+    block through mmap so the file is never read into memory as a whole"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0, 0
+
+        chars = 0
+        max_line = 0
+        current_line = 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, block_size):
+                block = mapped[offset : offset + block_size]
+                chars += len(block.translate(None, UTF8_CONTINUATION_BYTES))
+
+                lines = block.split(b"\n")
+                if len(lines) == 1:
+                    current_line += len(lines[0])
+                    continue
+                # First piece continues the line from the previous block
+                max_line = max(max_line, current_line + len(lines[0]), *(len(line) for line in lines[1:-1]))
+                current_line = len(lines[-1])
+
+        return chars, max(max_line, current_line)
+
+
+@contextmanager
+def open_bill_text(file_path):
+    """Yield (text stream, char count, longest line) for a bill.
+
+    Plain-text bills are streamed from disk; other formats are streamed from
+    their cached conversion artifact, so a bill is never held in memory whole.
+    """
+    file_path = Path(file_path)
+
+    if file_path.suffix.lower() in PLAIN_TEXT_SUFFIXES:
+        text_path = file_path
+    else:
+        text_path = conversion_stage.path("markitdown", file_path)
+
+    chars, max_line = scan_text_file(text_path)
+    with open(text_path, "r", encoding="utf-8", errors="replace", newline="") as stream:
+        yield stream, chars, max_line
+
+
+def prefetch_bill_conversions(bills_folder="bills"):
+    """Queue the conversion of every non-text bill on the process pool so it
+    overlaps with the SEC and supplier network calls"""
+    bills_path = Path(bills_folder)
+    if not bills_path.exists():
+        return
+    conversion_stage.prefetch(
+        "markitdown",
+        [
+            p for p in sorted(bills_path.glob("*"))
+            if p.is_file() and p.suffix.lower() not in PLAIN_TEXT_SUFFIXES
+        ],
+    )
+
 
+def iter_bill_chunks(bill_text, chunk_size=BILL_CHUNK_SIZE, overlap=BILL_CHUNK_OVERLAP):
+    """Yield (chunk_num, position, chunk_text) with overlap; chunk_num starts at 1
+
+    bill_text is a string or a text stream; a stream is read sequentially and
+    only one chunk window is held in memory.
+    """
+    stream = io.StringIO(bill_text, newline="") if isinstance(bill_text, str) else bill_text
+    step = chunk_size - overlap
+
+    chunk_num = 0
+    idx = 0
+    # Same chunks as slicing the whole text: window k is text[k*step : k*step + chunk_size]
+    window = stream.read(chunk_size)
+    while window:
+        chunk_num += 1
+        yield chunk_num, idx, window
+        idx += step
+        window = window[step:] + stream.read(step)
+
+
+def is_boilerplate_chunk(chunk_text):
+    """Skip chunks that are obviously navigation or boilerplate"""
+    return (
+        "table of contents" in chunk_text.lower()
+        or re.search(r"page \d+", chunk_text.lower())
+        or re.search(r"section \d+", chunk_text.lower())
+    )
+
+
+# Supplier names and countries this short, or written in capitals, are matched
+# with their case: "US", "ON" or "Arm" in lowercase are ordinary words
+CASE_SENSITIVE_TERM_LENGTH = 3
+
+
+@functools.lru_cache(maxsize=4096)
+def term_pattern(term):
+    """Whole-word pattern of a supplier name or country"""
+    flags = 0 if len(term) <= CASE_SENSITIVE_TERM_LENGTH or term.isupper() else re.IGNORECASE
+    # Lookarounds rather than \b: names may end in punctuation ("Inc.")
+    return re.compile(rf"(?<!\w){re.escape(term)}(?!\w)", flags)
+
+
+def mentions(chunk_text, term):
+    term = (term or "").strip()
+    return bool(term) and term_pattern(term).search(chunk_text) is not None
+
+
+def relevant_suppliers(chunk_text, supplier_context):
+    """Suppliers whose name or country the chunk mentions - the part of the
+    supplier context that can actually change what the chunk yields"""
+    return sorted(
+        s["name"]
+        for s in supplier_context
+        if mentions(chunk_text, s.get("name")) or mentions(chunk_text, s.get("country"))
+    )
+
+
+def industry_terms(industry):
+    """Lowercased words of a GICS industry worth looking for in a bill
+    ("Semiconductors" -> "semiconductor")"""
+    return [word.lower().rstrip("s") for word in re.findall(r"[A-Za-z]{5,}", industry or "")]
+
+
+def chunk_relevance(chunk_text, company_name, terms, relevant):
+    """How much a chunk is about the company: 1.0 names it, 0.5 mentions one
+    of its suppliers or their countries, 0.25 its industry, 0.0 none of that"""
+    lowered = chunk_text.lower()
+    if company_name and company_name.lower() in lowered:
+        return 1.0
+    if relevant:
+        return 0.5
+    if any(term in lowered for term in terms):
+        return 0.25
+    return 0.0
+
+
+# After this many consecutive analyzed chunks of a bill without impacts, chunks
+# with no relevance (chunk_relevance 0) are skipped; 0 disables the early exit
+BILL_EARLY_EXIT_CHUNKS = int(os.getenv("BILL_EARLY_EXIT_CHUNKS", "4"))
+
+
+# Near-duplicate chunks (shared boilerplate, amended re-prints of a bill) are
+# sent to the model once per company; 0 disables the deduplication
+BILL_DEDUP_THRESHOLD = float(os.getenv("BILL_DEDUP_THRESHOLD", "0.85"))
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def numeric_tokens(chunk_text):
+    """Numbers a chunk states (rates, amounts, deadlines), leaving out the
+    words cut by the chunk window edges"""
+    words = chunk_text.split()
+    return frozenset(NUMBER.findall(" ".join(words[1:-1])))
+
+
+class ChunkDeduplicator:
+    """Verified impacts of the chunks analyzed so far in one analyze_bills run,
+    looked up by MinHash/LSH similarity across all bill files"""
+
+    def __init__(self, threshold=BILL_DEDUP_THRESHOLD):
+        self.hasher = MinHasher()
+        self.index = NearDuplicateIndex(threshold)
+        self.representatives = {}
+
+    def lookup(self, chunk_text, relevant):
+        """(signature, representative or None) for a chunk about to be analyzed.
+
+        The representative may still be waiting for its model answer
+        (impacts None) when both chunks are in the same request batch.
+        """
+        signature = self.hasher.signature(chunk_text)
+        key, _ = self.index.query(signature)
+        representative = self.representatives.get(key)
+        # Same text but other suppliers mentioned could change the extraction,
+        # other numbers are an amendment (a new rate or deadline)
+        if representative is not None and (
+            representative["relevant"] != relevant
+            or representative["numbers"] != numeric_tokens(chunk_text)
+        ):
+            representative = None
+        return signature, representative
+
+    def reserve(self, signature, bill_name, chunk_num, chunk_text, relevant):
+        """Index a chunk sent to the model; its impacts come with resolve()"""
+        key = (bill_name, chunk_num)
+        self.index.add(key, signature)
+        self.representatives[key] = {
+            "bill_name": bill_name,
+            "chunk_index": chunk_num,
+            "relevant": relevant,
+            "numbers": numeric_tokens(chunk_text),
+            "impacts": None,
+        }
+
+    def resolve(self, bill_name, chunk_num, impacts):
+        self.representatives[(bill_name, chunk_num)]["impacts"] = [dict(impact) for impact in impacts]
+
+    def forget(self, bill_name, chunk_num):
+        """The model call failed: later look-alikes get their own call"""
+        self.representatives.pop((bill_name, chunk_num), None)
+
+
+def fan_out_impacts(representative, bill_name, chunk_text, idx):
+    """Impacts of a representative chunk, re-verified against a near-duplicate
+    at bill offset idx, or None when one of the quotes is not in the duplicate
+    itself: it says something else and needs its own model call"""
+    chunk_quotes = QuoteIndex()
+    chunk_quotes.add(chunk_text, idx)
+
+    impacts = []
+    for impact in representative["impacts"]:
+        quote_offsets = chunk_quotes.find(impact.get("exact_quote", "").strip())
+        if not quote_offsets:
+            return None
+        impacts.append(dict(
+            impact,
+            bill_name=bill_name,
+            quote_offsets=list(quote_offsets),
+            duplicate_of={"bill_name": representative["bill_name"], "chunk_index": representative["chunk_index"]},
+        ))
+    return impacts
+
+
+def impact_chunk(impact, chunks, quote_offsets):
+    """Chunk number an impact belongs to: the chunk holding its quote, the
+    model's chunk_id when several (overlap) or none of them do"""
+    try:
+        labelled = int(impact.get("chunk_id"))
+    except (TypeError, ValueError):
+        labelled = None
+    chunk_nums = [chunk_num for chunk_num, _, _ in chunks]
+
+    start = quote_offsets[0]
+    holding = [chunk_num for chunk_num, idx, chunk_text in chunks if idx <= start < idx + len(chunk_text)]
+    if labelled in holding or (not holding and labelled in chunk_nums):
+        return labelled
+    return holding[0] if holding else chunk_nums[0]
+
+
+def analyze_bill_chunks(chunks, bill_name, prompt_builder, quote_index=None):
+    """One LLM call on a batch of chunks [(chunk_num, idx, chunk_text)],
+    returns {chunk_num: impacts that pass verification}
+
+    quote_index (a QuoteIndex over the bill read so far) lets quotes that span
+    the chunk overlap or were re-whitespaced by the model still verify.
+    """
+    if quote_index is None:
+        quote_index = QuoteIndex()
+        for _, idx, chunk_text in chunks:
+            quote_index.add(chunk_text, idx)
+
+    verified = {chunk_num: [] for chunk_num, _, _ in chunks}
+    batch_text = "\n".join(chunk_text for _, _, chunk_text in chunks)
+
+    tracer.count("prompted_chunks", len(chunks))
+    result = model_client.complete_json_sync(
+        prompt_builder.messages(chunks),
+        temperature=0.05,
+        max_tokens=BILL_COMPLETION_TOKENS_PER_CHUNK * len(chunks),
+    )
+
+    for impact in result.get("impacts", []):
+        exact_quote = impact.get("exact_quote", "").strip()
+        quote_offsets = find_quote(exact_quote, batch_text, quote_index)
+
+        # STRICT VERIFICATION: Quote must exist AND be meaningful
+        if (
+            quote_offsets
+            and len(exact_quote) > 20  # Must be substantial quote
+            and not exact_quote.lower().startswith(
+                ("section", "chapter", "article", "subsection")
+            )
+        ):
+            # Additional quality checks
+            impact_type = impact.get("impact_type", "").lower()
+            quantitative_value = impact.get("quantitative_value")
+
+            # Require quantitative values for financial impacts
+            if (
+                impact_type in ["tariff", "tax", "subsidy"]
+                and quantitative_value is None
+            ):
+                print(f"   ❌ REJECTED: {impact_type} without quantitative value")
+                tracer.reject("missing_quantitative_value")
+                continue
+
+            # Check for vague targets
+            target = impact.get("target", "").lower()
+            if target in [
+                "company",
+                "supplier",
+                "company/supplier_name",
+                "various",
+                "multiple",
+            ]:
+                print(f"   ❌ REJECTED: Vague target '{target}'")
+                tracer.reject("vague_target")
+                continue
+
+            chunk_num = impact_chunk(impact, chunks, quote_offsets)
+            impact.pop("chunk_id", None)
+            impact["bill_name"] = bill_name
+            impact["quote_offsets"] = list(quote_offsets)
+            verified[chunk_num].append(impact)
+
+            print(
+                f"   ✅ {impact.get('target')}: {impact.get('impact_type')} ({impact.get('quantitative_value')}{impact.get('unit', '')})"
+            )
+        else:
+            print(f"   ❌ REJECTED: Invalid or truncated quote")
+            tracer.reject("quote_not_verified")
+
+    return verified
+
+
+def prompt_bill_batch(chunks, bill_name, prompt_builder, quote_index=None):
+    """analyze_bill_chunks, retrying chunk by chunk when the packed request is
+    too long for the model; chunks that still fail are left out"""
+    chunk_range = f"{chunks[0][0]}-{chunks[-1][0]}" if len(chunks) > 1 else f"{chunks[0][0]}"
+    try:
+        with tracer.span("bill_batch", chunks=len(chunks)):
+            return analyze_bill_chunks(chunks, bill_name, prompt_builder, quote_index)
+    except openai.BadRequestError as e:
+        if "maximum context length" not in str(e):
+            print(f"   ⚠️ API error [chunk {chunk_range}]: {e}")
+            return {}
+        if len(chunks) == 1:
+            chunk_num, idx, chunk_text = chunks[0]
+            print(
+                f"   ⚠️ CHUNK TOO LONG ERROR [chunk {chunk_num}]: chunk length={len(chunk_text)} chars, position={idx:,}"
+            )
+            return {}
+    except Exception as e:
+        print(f"   ⚠️ Processing error [chunk {chunk_range}]: {e}")
+        return {}
+
+    verified = {}
+    for chunk in chunks:
+        verified.update(prompt_bill_batch([chunk], bill_name, prompt_builder, quote_index))
+    return verified
+
+
+@tracer.traced("bill_file", bill="file_path")
+def analyze_bill_file(
+    file_path,
+    company_name,
+    sector,
+    industry,
+    supplier_context,
+    chunk_log=None,
+    deduplicator=None,
+    prompt_builder=None,
+    budget=None,
+    early_exit_chunks=BILL_EARLY_EXIT_CHUNKS,
+    triage=None,
+    failed_chunks=None,
+):
+    """Analyze ONE bill file with STRICT direct impact requirements
+
+    chunk_log, if given, receives {chunk_num: relevant supplier names} for every
+    analyzed chunk (used to re-prompt only what a supplier change affects).
+    failed_chunks, if given, receives {chunk_num: reason} for the chunks left
+    without an answer by an error ("file" when the bill could not be read).
+    deduplicator, if given, answers near-duplicates of already analyzed chunks
+    without a model call. Chunks are sent in batches packed by prompt_builder.
+    triage (ChunkTriage), if given, screens the chunks on the small model
+    first; only the ones it flags reach the extraction model.
+    budget (CompanyBudget) stops the bill once exhausted and records the
+    chunks left out, early exits included.
+    """
+    print(f"\n📄 {file_path.name}")
+
+    if prompt_builder is None:
+        prompt_builder = BillPromptBuilder(company_name, sector, industry, supplier_context)
+    terms = industry_terms(industry)
+    file_impacts = []
+
+    try:
+        with open_bill_text(file_path) as (bill_stream, bill_chars, max_line_length):
             # Check for extremely long lines in the original text
-            bill_lines = bill_text.split("\n")
-            max_line_length = max(len(line) for line in bill_lines) if bill_lines else 0
             if max_line_length > 10000:
                 print(
                     f"   ⚠️  WARNING: Found extremely long line ({max_line_length} chars) - using character chunking"
                 )
 
-            # Chunk by characters to avoid extremely long lines breaking context
-            char_chunk_size = 5000  # ~5k chars per chunk
-            overlap = 200  # 200 char overlap to avoid splitting mid-sentence
-
-            total_chunks = (len(bill_text) + char_chunk_size - overlap - 1) // (
-                char_chunk_size - overlap
+            total_chunks = (bill_chars + BILL_CHUNK_SIZE - BILL_CHUNK_OVERLAP - 1) // (
+                BILL_CHUNK_SIZE - BILL_CHUNK_OVERLAP
             )
             print(
-                f"   📊 Total chunks: {total_chunks} (bill size: {len(bill_text):,} chars)"
+                f"   📊 Total chunks: {total_chunks} (bill size: {bill_chars:,} chars)"
             )
 
-            chunk_num = 0
+            quote_index = QuoteIndex()
+            # Chunks for the next triage request (or extraction request without
+            # triage), and every chunk since the last one in file order
+            # (near-duplicates included)
+            packer = triage if triage is not None else prompt_builder
+            batch, batch_tokens = [], 0
+            held = []
+            # Analyzed chunks in a row without impacts, chunks skipped by the early exit
+            empty_streak = 0
+            early_exit_skipped = 0
+
+            def flush():
+                """Triage and extract the batch; False when the budget ran out"""
+                nonlocal batch, batch_tokens, empty_streak
+                results = {}
+                sent = set()
+                positives = batch
+                exceeded = None
+                if batch and triage is not None:
+                    exceeded = budget.exceeded() if budget is not None else None
+                    if not exceeded:
+                        positives = triage.relevant(batch)
+                        flagged = {chunk_num for chunk_num, _, _ in positives}
+                        # Triaged out: analyzed, no impacts
+                        results = {chunk_num: [] for chunk_num, _, _ in batch if chunk_num not in flagged}
+
+                for request in prompt_builder.pack(positives if not exceeded else []):
+                    exceeded = budget.exceeded() if budget is not None else None
+                    if exceeded:
+                        break
+                    sent.update(chunk_num for chunk_num, _, _ in request)
+                    results.update(prompt_bill_batch(request, file_path.name, prompt_builder, quote_index))
+
+                # Near-duplicates get the impacts of their representative,
+                # unless one of them does not verify against the duplicate
+                duplicate_impacts = {}
+                reprompt = []
+                for chunk_num, idx, chunk_text, relevant, relevance, representative in held:
+                    if representative is None:
+                        if deduplicator is not None:
+                            if chunk_num in results:
+                                deduplicator.resolve(file_path.name, chunk_num, results[chunk_num])
+                            else:
+                                deduplicator.forget(file_path.name, chunk_num)
+                    elif representative["impacts"] is not None:
+                        chunk_impacts = fan_out_impacts(representative, file_path.name, chunk_text, idx)
+                        if chunk_impacts is None:
+                            reprompt.append((chunk_num, idx, chunk_text))
+                        else:
+                            tracer.count("dedup_hits")
+                            duplicate_impacts[chunk_num] = chunk_impacts
+
+                if reprompt and not exceeded:
+                    tracer.count("dedup_reprompts", len(reprompt))
+                    for request in prompt_builder.pack(reprompt):
+                        exceeded = budget.exceeded() if budget is not None else None
+                        if exceeded:
+                            break
+                        sent.update(chunk_num for chunk_num, _, _ in request)
+                        results.update(prompt_bill_batch(request, file_path.name, prompt_builder, quote_index))
+
+                if exceeded:
+                    first_skipped = min(
+                        chunk_num for chunk_num, _, _ in batch + reprompt if chunk_num not in results
+                    )
+                    budget.skip(
+                        "bills",
+                        exceeded,
+                        bill=file_path.name,
+                        chunks_skipped=total_chunks - first_skipped + 1,
+                    )
+
+                for chunk_num, idx, chunk_text, relevant, relevance, representative in held:
+                    if chunk_num in duplicate_impacts:
+                        chunk_impacts = duplicate_impacts[chunk_num]
+                    elif chunk_num in results:
+                        chunk_impacts = results[chunk_num]
+                    else:
+                        # Its request failed, or its representative's did;
+                        # chunks the budget left out are recorded by skip()
+                        if failed_chunks is not None:
+                            if chunk_num in sent:
+                                failed_chunks[chunk_num] = "request failed"
+                            elif representative is not None and not exceeded:
+                                failed_chunks[chunk_num] = "representative failed"
+                        continue
+
+                    for impact in chunk_impacts:
+                        impact["chunk_index"] = chunk_num
+                    file_impacts.extend(chunk_impacts)
+                    empty_streak = 0 if chunk_impacts or relevance > 0 else empty_streak + 1
 
-            for idx in range(0, len(bill_text), char_chunk_size - overlap):
-                chunk_num += 1
-                # Get chunk with overlap
-                chunk_text = bill_text[idx : idx + char_chunk_size]
-                chunk_length = len(chunk_text)
+                    if chunk_log is not None:
+                        chunk_log[chunk_num] = relevant
+
+                batch, batch_tokens = [], 0
+                held.clear()
+                return not exceeded
+
+            for chunk_num, idx, chunk_text in iter_bill_chunks(bill_stream):
+                quote_index.add(chunk_text, idx)
 
                 if not chunk_text.strip():
                     continue
 
-                # Skip chunks that are obviously navigation or boilerplate
-                if (
-                    "table of contents" in chunk_text.lower()
-                    or re.search(r"page \d+", chunk_text.lower())
-                    or re.search(r"section \d+", chunk_text.lower())
-                ):
+                if is_boilerplate_chunk(chunk_text):
+                    tracer.count("skipped_chunks")
                     continue
 
                 try:
-                    # STRICT system message to avoid vague impacts
-                    system_message = """Extract ONLY DIRECT and SPECIFIC impacts on the company or its named suppliers.
-                    REJECT vague, general, or speculative impacts.
-
-                    CRITERIA FOR EXTRACTION:
-                    - MUST directly mention company, suppliers, or specific industries/products
-                    - MUST have clear quantitative impact (tariff rates, tax amounts, subsidy values)
-                    - MUST be specific legislation with clear consequences
-                    - REJECT general policy statements without specific impacts
-
-                    Output: {
-                        "impacts": [{
-                            "target": "company/specific_supplier_name",
-                            "supplier_country": "country if supplier",
-                            "impact_type": "tariff/regulation/tax/ban/subsidy",
-                            "affected_geography": "country/region mentioned in bill",
-                            "quantitative_value": number (REQUIRED for tariffs/taxes/subsidies),
-                            "unit": "percent/dollars/etc",
-                            "severity": float 0.0-1.0,
-                            "exact_quote": "VERBATIM text from bill showing the specific impact",
-                            "timeframe": "immediate/short-term/long-term",
-                            "reasoning": "specific explanation of HOW this directly affects the target"
-                        }]
-                    }
-
-                    REJECT impacts that are:
-                    - General industry trends
-                    - Vague policy statements
-                    - Speculative future effects
-                    - Without specific quantitative values for tariffs/taxes/subsidies"""
-
-                    response = client.chat.completions.create(
-                        model=MODEL_ID,
-                        response_format={"type": "json_object"},
-                        messages=[
-                            {"role": "system", "content": system_message},
-                            {
-                                "role": "user",
-                                "content": f"""Bill Text:
-{chunk_text}
-
-Company: {company_name}
-Sector: {sector}
-Industry: {industry}
+                    relevant = relevant_suppliers(chunk_text, supplier_context)
+                    relevance = chunk_relevance(chunk_text, company_name, terms, relevant)
+                    if early_exit_chunks and empty_streak >= early_exit_chunks and relevance == 0:
+                        early_exit_skipped += 1
+                        tracer.count("early_exit_chunks")
+                        # Logged so a supplier change that makes it relevant re-prompts it
+                        if chunk_log is not None:
+                            chunk_log[chunk_num] = relevant
+                        continue
 
-Known Suppliers (for reference):
-{json.dumps(supplier_context, indent=2)}
+                    representative = None
+                    if deduplicator is not None:
+                        signature, representative = deduplicator.lookup(chunk_text, relevant)
 
-Analyze for DIRECT, SPECIFIC impacts only. Reject vague statements.""",
-                            },
-                        ],
-                        temperature=0.05,
-                        max_tokens=1500,  # Increased for complete reasoning
-                    )
+                    if representative is None:
+                        tokens = packer.chunk_tokens(chunk_num, chunk_text)
+                        if not packer.fits(batch_tokens, len(batch), tokens):
+                            if not flush():
+                                break
+                        batch.append((chunk_num, idx, chunk_text))
+                        batch_tokens += tokens
+                        if deduplicator is not None:
+                            deduplicator.reserve(signature, file_path.name, chunk_num, chunk_text, relevant)
 
-                    result = json.loads(response.choices[0].message.content)
-
-                    for impact in result.get("impacts", []):
-                        exact_quote = impact.get("exact_quote", "").strip()
-
-                        # STRICT VERIFICATION: Quote must exist AND be meaningful
-                        if (
-                            exact_quote
-                            and exact_quote in chunk_text
-                            and len(exact_quote) > 20  # Must be substantial quote
-                            and not exact_quote.lower().startswith(
-                                ("section", "chapter", "article", "subsection")
-                            )
-                        ):
-                            # Additional quality checks
-                            impact_type = impact.get("impact_type", "").lower()
-                            quantitative_value = impact.get("quantitative_value")
-
-                            # Require quantitative values for financial impacts
-                            if (
-                                impact_type in ["tariff", "tax", "subsidy"]
-                                and quantitative_value is None
-                            ):
-                                print(
-                                    f"   ❌ REJECTED: {impact_type} without quantitative value"
-                                )
-                                continue
-
-                            # Check for vague targets
-                            target = impact.get("target", "").lower()
-                            if target in [
-                                "company",
-                                "supplier",
-                                "company/supplier_name",
-                                "various",
-                                "multiple",
-                            ]:
-                                print(f"   ❌ REJECTED: Vague target '{target}'")
-                                continue
-
-                            impact["bill_name"] = file_path.name
-                            all_verified_impacts.append(impact)
-
-                            print(
-                                f"   ✅ {impact.get('target')}: {impact.get('impact_type')} ({impact.get('quantitative_value')}{impact.get('unit', '')})"
-                            )
-                        else:
-                            print(f"   ❌ REJECTED: Invalid or truncated quote")
+                    held.append((chunk_num, idx, chunk_text, relevant, relevance, representative))
 
-                except openai.BadRequestError as e:
-                    if "maximum context length" in str(e):
-                        print(
-                            f"   ⚠️ CHUNK TOO LONG ERROR [chunk {chunk_num}/{total_chunks}]: chunk length={chunk_length} chars, position={idx:,}"
-                        )
-                        continue
-                    else:
-                        print(f"   ⚠️ API error [chunk {chunk_num}/{total_chunks}]: {e}")
-                        continue
                 except Exception as e:
                     print(
                         f"   ⚠️ Processing error [chunk {chunk_num}/{total_chunks}]: {e}"
                     )
+                    if failed_chunks is not None:
+                        failed_chunks[chunk_num] = f"processing error: {e}"
                     continue
 
-        except Exception as e:
-            print(f"   ❌ File error: {e}")
-            continue
+            else:
+                flush()
+
+            if early_exit_skipped:
+                if budget is not None:
+                    budget.skip(
+                        "bills",
+                        "early_exit",
+                        bill=file_path.name,
+                        chunks_skipped=early_exit_skipped,
+                    )
+                else:
+                    print(f"   ⏭️  Early exit: skipped {early_exit_skipped} chunks with no relevance")
+
+    except Exception as e:
+        print(f"   ❌ File error: {e}")
+        if failed_chunks is not None:
+            failed_chunks["file"] = f"file error: {e}"
+
+    return file_impacts
+
+
+@tracer.traced("bills", company="company_name")
+def analyze_bills(
+    company_name,
+    sector,
+    industry,
+    suppliers,
+    bills_folder="bills",
+    files=None,
+    chunk_logs=None,
+    budget=None,
+    failures=None,
+):
+    """Analyze bills with STRICT direct impact requirements
+
+    files restricts the analysis to a subset of the folder (incremental mode);
+    chunk_logs, if given, is filled with {bill name: {chunk_num: suppliers}},
+    failures with {bill name: {chunk_num: reason}} for bills with failed chunks.
+    budget (CompanyBudget) stops the analysis once exhausted.
+    """
+    print(f"\n{'=' * 70}")
+    print(f"[STEP 3] 📜 BILL ANALYSIS: {company_name}")
+    print(f"{'=' * 70}")
+
+    bills_path = Path(bills_folder)
+    if not bills_path.exists():
+        print("❌ No bills folder")
+        return []
+
+    supplier_context = build_supplier_context(suppliers)
+
+    print(f"📊 Analyzing with {len(supplier_context)} supplier locations")
+    for s in supplier_context[:5]:
+        print(f"   - {s.get('name')} in {s.get('country')}")
+
+    all_verified_impacts = []
+    # One per company: the extraction depends on the company and its suppliers
+    deduplicator = ChunkDeduplicator() if BILL_DEDUP_THRESHOLD > 0 else None
+    prompt_builder = BillPromptBuilder(company_name, sector, industry, supplier_context)
+    triage = (
+        ChunkTriage("bill", company_header(company_name, sector, industry, supplier_context))
+        if TRIAGE_MODEL_ID
+        else None
+    )
+
+    # Process ALL files (or only the requested ones)
+    if files is None:
+        files = sorted(p for p in bills_path.glob("*") if p.is_file())
+
+    for file_num, file_path in enumerate(files):
+        file_path = Path(file_path)
+        exceeded = budget.exceeded() if budget is not None else None
+        if exceeded:
+            budget.skip("bills", exceeded, bills_skipped=[Path(f).name for f in files[file_num:]])
+            break
+
+        chunk_log = {} if chunk_logs is not None else None
+        failed_chunks = {}
+        all_verified_impacts.extend(
+            analyze_bill_file(
+                file_path,
+                company_name,
+                sector,
+                industry,
+                supplier_context,
+                chunk_log=chunk_log,
+                deduplicator=deduplicator,
+                prompt_builder=prompt_builder,
+                budget=budget,
+                triage=triage,
+                failed_chunks=failed_chunks,
+            )
+        )
+        if chunk_logs is not None:
+            chunk_logs[file_path.name] = chunk_log
+        if failed_chunks and failures is not None:
+            failures[file_path.name] = failed_chunks
 
     # Filter out low-quality impacts
     high_quality_impacts = []
@@ -404,25 +1220,25 @@ Analyze for DIRECT, SPECIFIC impacts only. Reject vague statements.""",
 # ===== STEP 4: PURE PYTHON SYNTHESIS (NO AI) =====
 
 
-def synthesize_analysis(ticker, company_name, sec_metrics, suppliers, bill_impacts):
+def is_direct_impact(impact, company_name):
+    """Direct = targets the company itself, indirect = targets a supplier"""
+    target = impact.get("target", "").lower()
+    return (
+        target == "company"
+        or company_name.lower() in target
+        or any(keyword in target for keyword in ["direct", "primary", "specific"])
+    )
+
+
+@tracer.traced("synthesis", ticker="ticker")
+def synthesize_analysis(ticker, company_name, sec_metrics, suppliers, bill_impacts, budget_report=None):
     """PURE PYTHON - NO AI HALLUCINATIONS - NO TRUNCATION"""
     print(f"\n{'=' * 70}")
     print(f"[STEP 4] 🎯 SYNTHESIS (Pure Python): {ticker}")
     print(f"{'=' * 70}")
 
     # Separate direct vs indirect with better filtering
-    direct_impacts = [
-        i
-        for i in bill_impacts
-        if (
-            i.get("target", "").lower() == "company"
-            or company_name.lower() in i.get("target", "").lower()
-            or any(
-                keyword in i.get("target", "").lower()
-                for keyword in ["direct", "primary", "specific"]
-            )
-        )
-    ]
+    direct_impacts = [i for i in bill_impacts if is_direct_impact(i, company_name)]
 
     indirect_impacts = [
         i
@@ -433,9 +1249,9 @@ def synthesize_analysis(ticker, company_name, sec_metrics, suppliers, bill_impac
     ]
 
     # Get unique bills
-    bills_with_direct = list(set([i.get("bill_name", "") for i in direct_impacts]))
-    bills_with_indirect = list(set([i.get("bill_name", "") for i in indirect_impacts]))
-    all_bills = list(set([i.get("bill_name", "") for i in bill_impacts]))
+    bills_with_direct = sorted(set([i.get("bill_name", "") for i in direct_impacts]))
+    bills_with_indirect = sorted(set([i.get("bill_name", "") for i in indirect_impacts]))
+    all_bills = sorted(set([i.get("bill_name", "") for i in bill_impacts]))
 
     # CALCULATE DirectRiskFactor (pure math)
     if direct_impacts:
@@ -629,6 +1445,10 @@ def synthesize_analysis(ticker, company_name, sec_metrics, suppliers, bill_impac
         },
     }
 
+    # What the per-company budget / early exits left out (CompanyBudget.report)
+    if budget_report is not None:
+        result["Overview"]["budget"] = budget_report
+
     print(f"\n✅ SYNTHESIS COMPLETE (Pure Python):")
     print(f"   DirectRiskFactor: {result['DirectRiskFactor']}")
     print(f"   IndirectRiskFactor: {result['IndirectRiskFactor']}")
@@ -642,6 +1462,7 @@ def synthesize_analysis(ticker, company_name, sec_metrics, suppliers, bill_impac
 # ===== MAIN PIPELINE =====
 
 
+@tracer.traced("stock", ticker="ticker")
 def analyze_stock(
     ticker,
     company_name,
@@ -649,22 +1470,98 @@ def analyze_stock(
     industry,
     save_individual=True,
     output_folder="company_analyses",
+    bills_folder="bills",
+    state_folder="company_state",
 ):
     """Complete analysis - minimal AI usage"""
     print(f"\n{'#' * 70}")
     print(f"# ANALYZING: {company_name} ({ticker})")
     print(f"{'#' * 70}")
 
+    # Hash the bills BEFORE analyzing so a bill changed mid-run is picked up next time
+    bill_hashes = scan_bills(bills_folder)
+    prefetch_bill_conversions(bills_folder)
+
+    budget = CompanyBudget()
+
     # AI only for extraction
-    sec_metrics = analyze_sec_filing(ticker)
-    suppliers = analyze_suppliers(company_name)
-    bill_impacts = analyze_bills(company_name, sector, industry, suppliers)
+    sec_metrics = analyze_sec_filing(ticker, budget=budget)
+    suppliers = analyze_suppliers(company_name, budget=budget)
+    chunk_logs = {}
+    failures = {}
+    bill_impacts = analyze_bills(
+        company_name,
+        sector,
+        industry,
+        suppliers,
+        bills_folder=bills_folder,
+        chunk_logs=chunk_logs,
+        budget=budget,
+        failures=failures,
+    )
 
+    return complete_stock_analysis(
+        ticker,
+        company_name,
+        sector,
+        industry,
+        sec_metrics,
+        suppliers,
+        bill_impacts,
+        chunk_logs,
+        bill_hashes,
+        budget,
+        failures=failures,
+        save_individual=save_individual,
+        output_folder=output_folder,
+        state_folder=state_folder,
+    )
+
+
+def complete_stock_analysis(
+    ticker,
+    company_name,
+    sector,
+    industry,
+    sec_metrics,
+    suppliers,
+    bill_impacts,
+    chunk_logs,
+    bill_hashes,
+    budget,
+    failures=None,
+    save_individual=True,
+    output_folder="company_analyses",
+    state_folder="company_state",
+):
+    """Synthesis and saving once the extractions are done (analyze_stock and
+    the synthesis stage of pipeline.py)"""
     # Pure Python for synthesis (no hallucination)
     final_result = synthesize_analysis(
-        ticker, company_name, sec_metrics, suppliers, bill_impacts
+        ticker, company_name, sec_metrics, suppliers, bill_impacts, budget_report=budget.report()
     )
 
+    # Keep the raw extractions so new bills can be merged in later
+    if state_folder:
+        save_company_state(
+            state_folder,
+            {
+                "ticker": ticker,
+                "company_name": company_name,
+                "sector": sector,
+                "industry": industry,
+                "sec_metrics": sec_metrics,
+                "suppliers": suppliers,
+                "bills": group_impacts_by_bill(
+                    bill_impacts,
+                    bill_hashes,
+                    chunk_logs,
+                    truncated=budget.truncated_bills(),
+                    failures=failures,
+                ),
+            },
+        )
+
     # Save individual file
     if save_individual:
         Path(output_folder).mkdir(exist_ok=True)
@@ -684,6 +1581,7 @@ def batch_analyze_sp500(
     limit=None,
     output_path="sp500_bill_analysis.json",
     output_folder="company_analyses",
+    trace_path="pipeline_trace.jsonl",
 ):
     """Batch process - saves to both aggregated JSON and individual files"""
     df = pd.read_csv(csv_path)
@@ -733,12 +1631,389 @@ def batch_analyze_sp500(
     print(f"Aggregated file: {output_path}")
     print(f"Individual files: {output_folder}/")
 
-    # Show most at risk
+    print_most_at_risk(results)
+    report_trace(trace_path)
+
+    return results
+
+
+def print_most_at_risk(results, count=5):
     sorted_by_direct = sorted(results, key=lambda x: x.get("DirectRiskFactor", 0))
     print(f"\nMost at Direct Risk:")
-    for r in sorted_by_direct[:5]:
+    for r in sorted_by_direct[:count]:
         print(f"  {r['Ticker']:5s} {r.get('DirectRiskFactor', 0):+.3f}")
 
+
+def report_trace(trace_path="pipeline_trace.jsonl"):
+    """Print where the time and tokens went, and export every span as JSONL"""
+    print(f"\n{'=' * 70}")
+    print("PIPELINE INSTRUMENTATION")
+    print(f"{'=' * 70}")
+    print(tracer.summary_table())
+    if trace_path:
+        tracer.export_jsonl(trace_path)
+        print(f"\nSpans: {trace_path}")
+
+
+# ===== INCREMENTAL MODE: ONLY NEW OR CHANGED BILLS =====
+
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_bills(bills_folder="bills"):
+    """{bill file name: content hash} for every file in the bills folder"""
+    bills_path = Path(bills_folder)
+    if not bills_path.exists():
+        return {}
+    return {
+        p.name: hash_file(p) for p in sorted(bills_path.glob("*")) if p.is_file()
+    }
+
+
+def group_impacts_by_bill(bill_impacts, bill_hashes, chunk_logs=None, truncated=None, failures=None):
+    """Stored impact set: one entry per analyzed bill, even without impacts.
+
+    "chunks" maps each prompted chunk to the suppliers it mentions (JSON keys
+    are strings) so a supplier change only re-prompts the chunks it touches.
+    truncated ({bill name: exhausted limit}) marks the bills a budget cut
+    short and failures ({bill name: {chunk_num: reason}}) the chunks left
+    without an answer by an error, so the next incremental run analyzes
+    those bills again.
+    """
+    chunk_logs = chunk_logs or {}
+    bills = {
+        name: {"hash": bill_hash, "impacts": []}
+        for name, bill_hash in bill_hashes.items()
+    }
+    for impact in bill_impacts:
+        name = impact.get("bill_name", "")
+        bills.setdefault(name, {"hash": bill_hashes.get(name), "impacts": []})
+        bills[name]["impacts"].append(impact)
+    for name, chunk_log in chunk_logs.items():
+        if name in bills and chunk_log is not None:
+            bills[name]["chunks"] = {
+                str(chunk_num): names for chunk_num, names in chunk_log.items()
+            }
+    for name, reason in (truncated or {}).items():
+        if name in bills:
+            bills[name]["truncated"] = reason
+    for name, failed_chunks in (failures or {}).items():
+        if name in bills and failed_chunks:
+            bills[name]["failed_chunks"] = {
+                str(chunk_num): reason for chunk_num, reason in failed_chunks.items()
+            }
+    return bills
+
+
+def flatten_bill_impacts(state):
+    return [
+        impact
+        for name in sorted(state["bills"])
+        for impact in state["bills"][name]["impacts"]
+    ]
+
+
+def save_company_state(state_folder, state):
+    Path(state_folder).mkdir(exist_ok=True)
+    state_path = os.path.join(state_folder, f"{state['ticker']}.json")
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def load_company_state(state_folder, ticker):
+    state_path = os.path.join(state_folder, f"{ticker}.json")
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def bill_is_current(entry, bill_hash):
+    """Whether a stored bill entry is a complete analysis of this bill content"""
+    return entry.get("hash") == bill_hash and not entry.get("truncated") and not entry.get("failed_chunks")
+
+
+def diff_bills(state, bill_hashes):
+    """(new, changed or incompletely analyzed bill names, removed bill names)
+    since the state was saved"""
+    stored = state.get("bills", {})
+    changed = [
+        name
+        for name, bill_hash in bill_hashes.items()
+        if not bill_is_current(stored.get(name, {}), bill_hash)
+    ]
+    removed = [name for name in stored if name not in bill_hashes]
+    return changed, removed
+
+
+def reanalyze_stock_incremental(state, bill_hashes, bills_folder="bills"):
+    """Analyze only new/changed bills for one company and re-synthesize.
+
+    Returns None when no bill changed for this company (nothing to redo).
+    """
+    changed, removed = diff_bills(state, bill_hashes)
+    if not changed and not removed:
+        return None
+
+    ticker = state["ticker"]
+    print(f"\n{'#' * 70}")
+    print(f"# INCREMENTAL: {state['company_name']} ({ticker})")
+    print(f"# {len(changed)} new/changed bills, {len(removed)} removed")
+    print(f"{'#' * 70}")
+
+    with tracer.span("stock", ticker=ticker):
+        # Same caps as a full analyze_stock run
+        budget = CompanyBudget()
+        new_impacts = []
+        chunk_logs = {}
+        failures = {}
+        if changed:
+            new_impacts = analyze_bills(
+                state["company_name"],
+                state["sector"],
+                state["industry"],
+                state["suppliers"],
+                bills_folder=bills_folder,
+                files=[Path(bills_folder) / name for name in changed],
+                chunk_logs=chunk_logs,
+                budget=budget,
+                failures=failures,
+            )
+
+        # Merge: drop what the changed/removed bills contributed, then add the new impacts
+        for name in removed:
+            del state["bills"][name]
+        state["bills"].update(
+            group_impacts_by_bill(
+                new_impacts,
+                {name: bill_hashes[name] for name in changed},
+                chunk_logs,
+                truncated=budget.truncated_bills(),
+                failures=failures,
+            )
+        )
+
+        result = synthesize_analysis(
+            ticker,
+            state["company_name"],
+            state["sec_metrics"],
+            state["suppliers"],
+            flatten_bill_impacts(state),
+            budget_report=budget.report(),
+        )
+    return result
+
+
+def _supplier_key(supplier):
+    return (supplier.get("name", "").lower(), supplier.get("country", "").lower())
+
+
+def reanalyze_suppliers_incremental(state, new_suppliers, bill_hashes, bills_folder="bills"):
+    """Recompute only the indirect (supplier) impacts a supplier change can affect.
+
+    A prompted chunk is re-sent only if the suppliers it mentions (by name or
+    country) differ under the new supplier list; from the new answer only the
+    indirect impacts replace the old ones, direct impacts are kept. Indirect
+    impacts on suppliers that disappeared are dropped everywhere.
+    Returns False when the supplier set did not change.
+    """
+    old_context = build_supplier_context(state["suppliers"])
+    new_context = build_supplier_context(new_suppliers)
+    old_keys = {_supplier_key(s) for s in old_context}
+    new_keys = {_supplier_key(s) for s in new_context}
+    if old_keys == new_keys:
+        return False
+
+    company_name = state["company_name"]
+    removed_names = {name for name, _ in old_keys} - {name for name, _ in new_keys}
+    print(f"\n🔗 Supplier set changed for {company_name}: "
+          f"+{len(new_keys - old_keys)} / -{len(old_keys - new_keys)}")
+
+    reprompted = 0
+    prompt_builder = BillPromptBuilder(company_name, state["sector"], state["industry"], new_context)
+    for bill_name, entry in state["bills"].items():
+        # Bills that changed on disk (or were cut short) are handled by the bill delta
+        if not bill_is_current(entry, bill_hashes.get(bill_name)):
+            continue
+
+        file_path = Path(bills_folder) / bill_name
+
+        if "chunks" not in entry:
+            # State saved before chunk tracking: redo the whole bill
+            chunk_log = {}
+            failed_chunks = {}
+            entry["impacts"] = analyze_bill_file(
+                file_path, company_name, state["sector"], state["industry"],
+                new_context, chunk_log=chunk_log, prompt_builder=prompt_builder,
+                failed_chunks=failed_chunks,
+            )
+            entry["chunks"] = {str(k): v for k, v in chunk_log.items()}
+            if failed_chunks:
+                entry["failed_chunks"] = {str(k): v for k, v in failed_chunks.items()}
+            continue
+
+        stale_chunks = {}
+        quote_index = QuoteIndex()
+        with open_bill_text(file_path) as (bill_stream, _, _):
+            for chunk_num, idx, chunk_text in iter_bill_chunks(bill_stream):
+                quote_index.add(chunk_text, idx)
+                stored = entry["chunks"].get(str(chunk_num))
+                if stored is None:
+                    continue
+                relevant = relevant_suppliers(chunk_text, new_context)
+                if relevant != stored:
+                    stale_chunks[chunk_num] = (idx, chunk_text, relevant)
+
+        results = {}
+        for batch in prompt_builder.pack(
+            (chunk_num, idx, chunk_text) for chunk_num, (idx, chunk_text, _) in stale_chunks.items()
+        ):
+            results.update(prompt_bill_batch(batch, bill_name, prompt_builder, quote_index))
+
+        for chunk_num, (_, _, relevant) in stale_chunks.items():
+            if chunk_num not in results:
+                # The bill delta analyzes the bill again
+                entry.setdefault("failed_chunks", {})[str(chunk_num)] = "request failed"
+                continue
+            chunk_impacts = results[chunk_num]
+
+            reprompted += 1
+            new_indirect = [
+                dict(impact, chunk_index=chunk_num)
+                for impact in chunk_impacts
+                if not is_direct_impact(impact, company_name)
+            ]
+            entry["impacts"] = [
+                impact
+                for impact in entry["impacts"]
+                if impact.get("chunk_index") != chunk_num
+                or is_direct_impact(impact, company_name)
+            ] + new_indirect
+            entry["chunks"][str(chunk_num)] = relevant
+
+        entry["impacts"] = [
+            impact
+            for impact in entry["impacts"]
+            if is_direct_impact(impact, company_name)
+            or impact.get("target", "").lower() not in removed_names
+        ]
+
+    state["suppliers"] = new_suppliers
+    print(f"   🔁 Re-prompted {reprompted} chunks for the supplier change")
+    return True
+
+
+def incremental_analyze_sp500(
+    csv_path="constituents.csv",
+    limit=None,
+    output_path="sp500_bill_analysis.json",
+    output_folder="company_analyses",
+    bills_folder="bills",
+    state_folder="company_state",
+    refresh_suppliers=False,
+    trace_path="pipeline_trace.jsonl",
+):
+    """Re-run only what new or changed bills require.
+
+    Tickers without stored state get a full analyze_stock; tickers whose bills
+    are unchanged keep their previous result untouched. With refresh_suppliers,
+    suppliers are looked up again and only the indirect impacts touched by a
+    supplier change are recomputed.
+    """
+    df = pd.read_csv(csv_path)
+
+    if limit:
+        df = df.head(limit)
+
+    Path(output_folder).mkdir(exist_ok=True)
+
+    bill_hashes = scan_bills(bills_folder)
+    print(f"📜 {len(bill_hashes)} bills in {bills_folder}/")
+
+    results = []
+    reanalyzed = 0
+
+    for idx, row in df.iterrows():
+        ticker = row["Symbol"]
+        company_filepath = os.path.join(output_folder, f"{ticker}.json")
+
+        try:
+            state = load_company_state(state_folder, ticker)
+
+            if state is None:
+                result = analyze_stock(
+                    ticker=ticker,
+                    company_name=row["Security"],
+                    sector=row["GICS Sector"],
+                    industry=row["GICS Sub-Industry"],
+                    output_folder=output_folder,
+                    bills_folder=bills_folder,
+                    state_folder=state_folder,
+                )
+                reanalyzed += 1
+            else:
+                suppliers_changed = False
+                if refresh_suppliers:
+                    suppliers_changed = reanalyze_suppliers_incremental(
+                        state,
+                        analyze_suppliers(state["company_name"]),
+                        bill_hashes,
+                        bills_folder,
+                    )
+
+                result = reanalyze_stock_incremental(state, bill_hashes, bills_folder)
+
+                if result is None and suppliers_changed:
+                    result = synthesize_analysis(
+                        ticker,
+                        state["company_name"],
+                        state["sec_metrics"],
+                        state["suppliers"],
+                        flatten_bill_impacts(state),
+                    )
+
+                if result is None:
+                    if os.path.exists(company_filepath):
+                        with open(company_filepath, "r") as f:
+                            result = json.load(f)
+                    else:
+                        result = synthesize_analysis(
+                            ticker,
+                            state["company_name"],
+                            state["sec_metrics"],
+                            state["suppliers"],
+                            flatten_bill_impacts(state),
+                        )
+                else:
+                    save_company_state(state_folder, state)
+                    with open(company_filepath, "w") as f:
+                        json.dump(result, f, indent=2)
+                    print(f"💾 Saved to: {company_filepath}")
+                    reanalyzed += 1
+
+            results.append(result)
+
+        except Exception as e:
+            print(f"❌ {row['Security']}: {e}")
+            continue
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'=' * 70}")
+    print(f"INCREMENTAL RUN COMPLETE: {reanalyzed}/{len(df)} companies re-synthesized")
+    print(f"{'=' * 70}")
+    print(f"Aggregated file: {output_path}")
+
+    report_trace(trace_path)
+
     return results
 
 
@@ -755,4 +2030,7 @@ if __name__ == "__main__":
     batch_analyze_sp500()
 
     # Or run with limit for testing
-    # batch_analyze_sp500(limit=10)
\ No newline at end of file
+    # batch_analyze_sp500(limit=10)
+
+    # After dropping new files into bills/, only analyze what changed
+    # incremental_analyze_sp500()
\ No newline at end of file
@@ -0,0 +1,488 @@
+"""Single orchestrated run: every agent as a concurrent stage of one DAG.
+
+    constituents -> classification -> sec_suppliers -> bills -> synthesis -> export (S3)
+    directives   -> law_summary -----------------------------------------------^
+
+Stages are connected by bounded asyncio queues: a stage that gets ahead
+blocks on its full output queue (backpressure), so at most queue_size items
+wait between two stages while every stage works on a different company.
+Blocking steps (the agents' functions, S3) run in threads; model calls go
+through the shared clients of Common.model_client, which bound concurrency
+per provider.
+
+    python AgentOrchestrator/pipeline.py --csv constituents.csv --bucket my-bucket --limit 20
+    python AgentOrchestrator/pipeline.py --csv constituents.csv --bucket sp500 --local-s3 /tmp/s3 --directives directives/
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+for component in ("AgentOrchestrator", "LawReaderAgent", "FinancialInformationAgent"):
+    sys.path.append(str(REPO_ROOT / component))
+
+import FinancialInformationAgent as fia
+from agent import LawReaderAgent
+from main import (
+    CompanyBudget,
+    analyze_bills,
+    analyze_sec_filing,
+    analyze_suppliers,
+    complete_stock_analysis,
+    prefetch_bill_conversions,
+    print_most_at_risk,
+    report_trace,
+    scan_bills,
+)
+
+from Common.conversion import conversion_stage
+from Common.telemetry import tracer
+from DataManager.local_s3 import FilesystemS3Client
+from DataManager.manager import S3Storage
+
+# ===== CONFIGURATION =====
+
+# Items waiting between two stages
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+PIPELINE_PROGRESS_SECONDS = float(os.getenv("PIPELINE_PROGRESS_SECONDS", "10"))
+# Items each stage works on at once
+STAGE_WORKERS = {
+    "classification": 4,
+    "sec_suppliers": 4,
+    "bills": 4,
+    "synthesis": 2,
+    "law_summary": 2,
+    "export": 4,
+}
+
+# End of the stream from one upstream stage
+DONE = object()
+# Tells the other workers of a stage that every upstream is done
+_STOP = object()
+
+
+# ===== WORK ITEMS =====
+
+
+class CompanyRun:
+    """One company travelling through the stages"""
+
+    def __init__(self, ticker, company_name, sector=None, industry=None):
+        self.ticker = ticker
+        self.company_name = company_name
+        self.sector = sector
+        self.industry = industry
+        self.label = f"{company_name} ({ticker})"
+        self.classification = None
+        # "stock" span, open from sec_suppliers to synthesis
+        self.span = None
+        self.budget = None
+        self.sec_metrics = []
+        self.suppliers = []
+        self.bill_impacts = []
+        self.chunk_logs = {}
+        self.failures = {}
+        self.result = None
+
+    def exports(self):
+        """{S3 key (under the run prefix): data}"""
+        exports = {f"analyses/{self.ticker}.json": self.result}
+        if self.classification is not None:
+            exports[f"classifications/{self.ticker}.json"] = self.classification
+        return exports
+
+    def fail(self, error):
+        if self.span is not None:
+            tracer.end_span(self.span, error)
+            self.span = None
+
+
+class DirectiveRun:
+    """One directive summarized by LawReaderAgent"""
+
+    def __init__(self, file):
+        self.file = file
+        self.label = Path(file).name
+        # JSON text, as returned by LawReaderAgent.single_law_summary
+        self.summary = None
+
+    def exports(self):
+        return {f"laws/{Path(self.file).stem}.json": json.loads(self.summary)}
+
+    def fail(self, error):
+        pass
+
+
+# ===== STAGES =====
+
+
+class Source:
+    """Feeds items to a queue; put() waits while the queue is full"""
+
+    def __init__(self, name, items, outbox):
+        self.name = name
+        self.items = items
+        self.outbox = outbox
+        self.sent = 0
+        self.finished = False
+
+    async def run(self):
+        for item in self.items:
+            await self.outbox.put(item)
+            self.sent += 1
+        self.finished = True
+        await self.outbox.put(DONE)
+
+    def status(self):
+        return f"{self.name} {self.sent}{'' if self.finished else '+'}"
+
+
+class Stage:
+    """workers tasks taking items from inbox, awaiting func(item) and passing
+    what it returns to outbox (None drops the item). inputs is the number of
+    upstream stages feeding inbox: the stage ends, and sends DONE on, once
+    each of them has sent DONE. A failed item is reported and dropped."""
+
+    def __init__(self, name, func, workers, inbox, outbox=None, inputs=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self._open_inputs = inputs
+        self.active = 0
+        self.done = 0
+        self.failed = 0
+        self.busy_s = 0.0
+        self.max_queue = 0
+
+    async def run(self):
+        await asyncio.gather(*(self._worker() for _ in range(self.workers)))
+        if self.outbox is not None:
+            await self.outbox.put(DONE)
+
+    async def _worker(self):
+        while True:
+            item = await self.inbox.get()
+            if item is _STOP:
+                return
+            if item is DONE:
+                self._open_inputs -= 1
+                if self._open_inputs == 0:
+                    for _ in range(self.workers - 1):
+                        await self.inbox.put(_STOP)
+                    return
+                continue
+
+            self.max_queue = max(self.max_queue, self.inbox.qsize() + 1)
+            self.active += 1
+            start = time.perf_counter()
+            try:
+                result = await self.func(item)
+                self.done += 1
+            except Exception as e:
+                print(f"❌ [{self.name}] {item.label}: {e}")
+                self.failed += 1
+                item.fail(e)
+                result = None
+            finally:
+                self.active -= 1
+                self.busy_s += time.perf_counter() - start
+
+            if result is not None and self.outbox is not None:
+                await self.outbox.put(result)
+
+    def status(self):
+        failed = f" {self.failed}✗" if self.failed else ""
+        return f"{self.name} {self.done}✓{failed} {self.active}⏳ q{self.inbox.qsize()}"
+
+
+class PipelineProgress:
+    """One view of every stage: a status line every interval seconds, and a
+    per-stage table (utilization, deepest queue) at the end"""
+
+    def __init__(self, sources, stages, interval=PIPELINE_PROGRESS_SECONDS):
+        self.sources = sources
+        self.stages = stages
+        self.interval = interval
+        self.start = time.perf_counter()
+
+    def line(self):
+        parts = [part.status() for part in self.sources + self.stages]
+        return f"📊 {time.perf_counter() - self.start:6.1f}s | " + " | ".join(parts)
+
+    async def run(self):
+        if self.interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            print(self.line())
+
+    def report(self):
+        wall_s = time.perf_counter() - self.start
+        print(f"\n{'=' * 70}")
+        print(f"PIPELINE STAGES ({wall_s:.1f}s)")
+        print(f"{'=' * 70}")
+        print(f"{'stage':<16s} {'done':>6s} {'failed':>7s} {'workers':>8s} {'busy s':>8s} {'util':>6s} {'max q':>6s}")
+        for stage in self.stages:
+            utilization = stage.busy_s / (wall_s * stage.workers) if wall_s else 0.0
+            print(
+                f"{stage.name:<16s} {stage.done:>6d} {stage.failed:>7d} {stage.workers:>8d} "
+                f"{stage.busy_s:>8.1f} {utilization:>6.0%} {stage.max_queue:>6d}"
+            )
+
+
+# ===== PIPELINE =====
+
+
+class Pipeline:
+    """The stage functions and what they share: the S3 storage, the bills
+    (hashed once for every company) and the collected results"""
+
+    def __init__(
+        self,
+        storage,
+        prefix="pipeline",
+        bills_folder="bills",
+        output_folder="company_analyses",
+        state_folder="company_state",
+        queue_size=PIPELINE_QUEUE_SIZE,
+        workers=None,
+        progress_interval=PIPELINE_PROGRESS_SECONDS,
+    ):
+        self.storage = storage
+        self.prefix = prefix
+        self.bills_folder = bills_folder
+        self.output_folder = output_folder
+        self.state_folder = state_folder
+        self.queue_size = queue_size
+        self.workers = {**STAGE_WORKERS, **(workers or {})}
+        self.progress_interval = progress_interval
+        self.bill_hashes = {}
+        self.law_reader = None
+        self.results = []
+        self.progress = None
+
+    # ----- stage functions -----
+
+    @contextmanager
+    def working_on(self, run):
+        """The company's "stock" span, with its budget clock running only for
+        the stage: COMPANY_MAX_SECONDS is not used up waiting in a queue"""
+        with tracer.resume(run.span):
+            run.budget.resume()
+            try:
+                yield
+            finally:
+                run.budget.pause()
+
+    async def classify(self, run):
+        """FinancialInformationAgent analysis (GICS sector, industry, market
+        cap...); fills sector/industry when the constituents list has none"""
+        with tracer.span("classification", ticker=run.ticker):
+            analysis, _ = await asyncio.to_thread(fia.analysis_cache.get, run.company_name)
+            if analysis is None:
+                outcome = await fia.analyze_company_async(run.company_name)
+                if not outcome["success"]:
+                    print(f"   ⚠️ Classification failed for {run.label}: {outcome.get('error')}")
+                    return run
+                analysis = outcome["analysis"]
+                await asyncio.to_thread(fia.analysis_cache.set, run.company_name, analysis)
+
+        run.classification = analysis
+        run.sector = run.sector or analysis.get("gics_sector")
+        run.industry = run.industry or analysis.get("industry")
+        return run
+
+    async def fetch_filings(self, run):
+        """SEC 10-K metrics and suppliers, side by side"""
+        run.span = tracer.start_span("stock", ticker=run.ticker)
+        with tracer.resume(run.span):
+            run.budget = CompanyBudget()
+        with self.working_on(run):
+            run.sec_metrics, run.suppliers = await asyncio.gather(
+                asyncio.to_thread(analyze_sec_filing, run.ticker, budget=run.budget),
+                asyncio.to_thread(analyze_suppliers, run.company_name, budget=run.budget),
+            )
+        return run
+
+    async def extract_bill_impacts(self, run):
+        with self.working_on(run):
+            run.bill_impacts = await asyncio.to_thread(
+                analyze_bills,
+                run.company_name,
+                run.sector or "Unknown",
+                run.industry or "Unknown",
+                run.suppliers,
+                bills_folder=self.bills_folder,
+                chunk_logs=run.chunk_logs,
+                budget=run.budget,
+                failures=run.failures,
+            )
+        return run
+
+    async def synthesize(self, run):
+        with self.working_on(run):
+            run.result = await asyncio.to_thread(
+                complete_stock_analysis,
+                run.ticker,
+                run.company_name,
+                run.sector or "Unknown",
+                run.industry or "Unknown",
+                run.sec_metrics,
+                run.suppliers,
+                run.bill_impacts,
+                run.chunk_logs,
+                self.bill_hashes,
+                run.budget,
+                failures=run.failures,
+                output_folder=self.output_folder,
+                state_folder=self.state_folder,
+            )
+        tracer.end_span(run.span)
+        run.span = None
+        self.results.append(run.result)
+        return run
+
+    async def summarize_directive(self, run):
+        with tracer.span("law_summary", directive=run.label):
+            run.summary = await asyncio.to_thread(self.law_reader.single_law_summary, run.file)
+        return run if run.summary is not None else None
+
+    async def export(self, run):
+        with tracer.span("export"):
+            for key, data in run.exports().items():
+                await asyncio.to_thread(self.storage.save_json, f"{self.prefix}/{key}", data)
+        return None
+
+    # ----- wiring -----
+
+    async def run(self, companies, law_reader=None):
+        """Analyze companies ({ticker, company_name, sector, industry}), and
+        summarize the directives of law_reader (a LawReaderAgent) alongside;
+        returns the analyses"""
+        loop = asyncio.get_running_loop()
+        # Every worker may be in a thread at once; sec_suppliers uses two
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(self.workers.values()) + self.workers["sec_suppliers"]))
+
+        # Hash the bills BEFORE analyzing so a bill changed mid-run is picked up next time
+        self.bill_hashes = await asyncio.to_thread(scan_bills, self.bills_folder)
+        await asyncio.to_thread(prefetch_bill_conversions, self.bills_folder)
+
+        queue = lambda: asyncio.Queue(self.queue_size)
+        to_classify, to_fetch, to_bills, to_synthesize, to_export = (queue() for _ in range(5))
+
+        sources = [Source("constituents", (CompanyRun(**company) for company in companies), to_classify)]
+        stages = [
+            Stage("classification", self.classify, self.workers["classification"], to_classify, to_fetch),
+            Stage("sec_suppliers", self.fetch_filings, self.workers["sec_suppliers"], to_fetch, to_bills),
+            Stage("bills", self.extract_bill_impacts, self.workers["bills"], to_bills, to_synthesize),
+            Stage("synthesis", self.synthesize, self.workers["synthesis"], to_synthesize, to_export),
+        ]
+
+        if law_reader is not None:
+            self.law_reader = law_reader
+            await asyncio.to_thread(conversion_stage.prefetch, "law_text", self.law_reader.files)
+            to_summarize = queue()
+            sources.append(Source("directives", (DirectiveRun(file) for file in self.law_reader.files), to_summarize))
+            stages.append(
+                Stage("law_summary", self.summarize_directive, self.workers["law_summary"], to_summarize, to_export)
+            )
+
+        stages.append(
+            Stage("export", self.export, self.workers["export"], to_export, inputs=1 + (law_reader is not None))
+        )
+
+        self.progress = PipelineProgress(sources, stages, self.progress_interval)
+        reporter = asyncio.create_task(self.progress.run())
+        try:
+            await asyncio.gather(*(source.run() for source in sources), *(stage.run() for stage in stages))
+        finally:
+            reporter.cancel()
+
+        print(self.progress.line())
+        self.progress.report()
+        return self.results
+
+
+def read_constituents(csv_path="constituents.csv", limit=None):
+    """Companies of the S&P 500 constituents CSV (Symbol, Security, GICS Sector, GICS Sub-Industry)"""
+    df = pd.read_csv(csv_path)
+    if limit:
+        df = df.head(limit)
+
+    def optional(row, column):
+        value = row.get(column)
+        return value if isinstance(value, str) and value.strip() else None
+
+    return [
+        {
+            "ticker": row["Symbol"],
+            "company_name": row["Security"],
+            "sector": optional(row, "GICS Sector"),
+            "industry": optional(row, "GICS Sub-Industry"),
+        }
+        for _, row in df.iterrows()
+    ]
+
+
+def run_pipeline(
+    companies,
+    storage,
+    law_reader=None,
+    output_path="sp500_bill_analysis.json",
+    trace_path="pipeline_trace.jsonl",
+    **kwargs,
+):
+    """Run the whole DAG; the aggregated analyses are saved to output_path
+    and to <prefix>/sp500_bill_analysis.json in S3"""
+    pipeline = Pipeline(storage, **kwargs)
+    results = asyncio.run(pipeline.run(companies, law_reader))
+
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+    storage.save_json(f"{pipeline.prefix}/sp500_bill_analysis.json", results)
+
+    print_most_at_risk(results)
+    report_trace(trace_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every agent as one pipelined DAG")
+    parser.add_argument("--csv", default="constituents.csv", help="S&P 500 constituents CSV")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--bills", default="bills", help="bills folder")
+    parser.add_argument("--directives", default=None, help="directives folder for LawReaderAgent (optional)")
+    parser.add_argument("--bucket", default=os.getenv("PIPELINE_BUCKET"), help="S3 bucket (default: $PIPELINE_BUCKET)")
+    parser.add_argument("--prefix", default="pipeline", help="S3 key prefix")
+    parser.add_argument("--local-s3", default=None, help="store the S3 objects under this folder instead of AWS")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE)
+    parser.add_argument("--progress-seconds", type=float, default=PIPELINE_PROGRESS_SECONDS)
+    args = parser.parse_args()
+
+    if not args.bucket:
+        parser.error("--bucket (or PIPELINE_BUCKET) is required")
+
+    storage = S3Storage(args.bucket, client=FilesystemS3Client(args.local_s3) if args.local_s3 else None)
+
+    run_pipeline(
+        read_constituents(args.csv, args.limit),
+        storage,
+        law_reader=LawReaderAgent(directory=args.directives.rstrip("/") + "/") if args.directives else None,
+        prefix=args.prefix,
+        bills_folder=args.bills,
+        queue_size=args.queue_size,
+        progress_interval=args.progress_seconds,
+    )
@@ -0,0 +1,299 @@
+import copy
+import hashlib
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from bs4 import BeautifulSoup, UnicodeDammit, XMLParsedAsHTMLWarning
+from lxml import etree
+
+from Common.telemetry import tracer
+
+# Bump when a converter's output changes so stale artifacts are not reused
+CONVERTER_VERSION = 2
+CONVERSION_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", ".conversion_cache")
+# 0 converts inline on the calling thread
+CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+
+# ===== CONVERTERS (run in the worker processes) =====
+
+_markitdown = None
+
+
+def _get_markitdown():
+    # One MarkItDown per process, created on first use
+    global _markitdown
+    if _markitdown is None:
+        from markitdown import MarkItDown
+
+        _markitdown = MarkItDown(enable_plugins=False)
+    return _markitdown
+
+
+def markitdown_text(source):
+    """Any MarkItDown-supported file -> text (bills)"""
+    return _get_markitdown().convert(str(source)).text_content
+
+
+def law_text(source):
+    """Directive/law file -> flat text, as LawReaderAgent reads it"""
+    html = str(_get_markitdown().convert(str(source)))
+    return BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)
+
+
+# Elements that start a new block of text in the markdown output
+BLOCK_TAGS = frozenset((
+    "address", "article", "aside", "blockquote", "body", "br", "caption", "center", "dd", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "ul",
+))
+SKIPPED_TAGS = frozenset(("head", "script", "style", "title", "noscript", "template"))
+BLOCK_PREFIXES = {**{f"h{n}": "#" * n + " " for n in range(1, 7)}, "li": "- "}
+WHITESPACE_RUN = re.compile(r"\s+")
+
+
+def _html_encoding(html):
+    # Filings are mostly UTF-8 (or ASCII); the XML declaration of inline XBRL
+    # filings is not trusted, the bytes are
+    try:
+        html.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return UnicodeDammit(html).original_encoding or "cp1252"
+
+
+def _is_hidden(element):
+    style = element.get("style")
+    return style is not None and "display:none" in style.replace(" ", "").lower()
+
+
+def sec_filing_markdown(source):
+    """10-K HTML (bytes or path) -> markdown with tables swapped for
+    TABLE_PLACEHOLDER_<n> and hidden divs removed.
+
+    One lxml parse and one walk over the tree: skipped subtrees (tables,
+    hidden divs, scripts) are never copied or serialized, and the text is
+    emitted directly instead of going through MarkItDown's second parse.
+    """
+    html = source if isinstance(source, (bytes, bytearray)) else Path(source).read_bytes()
+    parser = etree.HTMLParser(
+        encoding=_html_encoding(html), huge_tree=True, remove_comments=True, remove_pis=True
+    )
+    root = etree.fromstring(bytes(html), parser=parser)
+    if root is None:
+        return ""
+
+    blocks = []
+    line = []
+    prefix = ""
+    table_count = 0
+
+    def end_block():
+        nonlocal prefix
+        text = WHITESPACE_RUN.sub(" ", "".join(line)).strip()
+        line.clear()
+        # An empty block (<li><p>...) keeps its prefix for the text inside
+        if text:
+            blocks.append(prefix + text)
+            prefix = ""
+
+    walker = etree.iterwalk(root, events=("start", "end"))
+    for event, element in walker:
+        tag = element.tag
+        if event == "start":
+            if tag in SKIPPED_TAGS or (tag == "div" and _is_hidden(element)):
+                walker.skip_subtree()
+                continue
+            if tag == "table":
+                end_block()
+                table_count += 1
+                blocks.append(f"TABLE_PLACEHOLDER_{table_count}")
+                walker.skip_subtree()
+                continue
+            if tag in BLOCK_TAGS:
+                end_block()
+                prefix = BLOCK_PREFIXES.get(tag, prefix)
+            if element.text:
+                line.append(element.text)
+        else:
+            if tag in BLOCK_TAGS:
+                end_block()
+            if element.tail:
+                line.append(element.tail)
+    end_block()
+
+    return "\n\n".join(blocks)
+
+
+def sec_filing_markdown_legacy(source):
+    """Previous 10-K path (html.parser, deepcopy per table, prettify, then a
+    second parse in MarkItDown); kept to benchmark sec_filing_markdown against"""
+    soup = BeautifulSoup(source, "html.parser")
+
+    # Extract tables
+    table_list = []
+    i = 1
+    for table in soup.find_all("table"):
+        table_list.append({"index": i, "html": str(copy.deepcopy(table))})
+        table.replace_with(f"TABLE_PLACEHOLDER_{i}")
+        i += 1
+
+    # Remove hidden
+    for div in soup.find_all("div", {"style": "display:none"}):
+        div.decompose()
+
+    # MarkItDown needs a file; each worker uses its own
+    with tempfile.TemporaryDirectory(prefix="filing_") as tmp:
+        html_path = Path(tmp) / "filing.html"
+        html_path.write_text(soup.prettify(), encoding="utf-8")
+        return markitdown_text(html_path)
+
+
+CONVERTERS = {
+    "markitdown": markitdown_text,
+    "law_text": law_text,
+    "sec_filing": sec_filing_markdown,
+    "sec_filing_legacy": sec_filing_markdown_legacy,
+}
+
+
+def _convert_to_artifact(converter, source, artifact_path):
+    text = CONVERTERS[converter](source)
+    artifact_path = Path(artifact_path)
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so a crashed worker never leaves a half artifact
+    tmp_path = artifact_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, artifact_path)
+    return str(artifact_path)
+
+
+# ===== STAGE =====
+
+
+def _content_hash(source):
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ConversionStage:
+    """Converts documents to text artifacts on a process pool.
+
+    Artifacts are cached on disk under <cache_dir>/<converter>/<content hash>.txt,
+    so a document is converted once per content, across runs. prefetch() queues
+    conversions ahead of the LLM stage; path()/read_text() wait for the result.
+    Sources are file paths, or bytes for downloaded documents.
+    """
+
+    def __init__(self, cache_dir=CONVERSION_CACHE_DIR, max_workers=CONVERSION_WORKERS):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}
+        # (path, mtime, size) -> content hash, so unchanged files are hashed once
+        self._file_hashes = {}
+        # Reentrant: done callbacks of already finished futures run under it
+        self._lock = threading.RLock()
+
+    def _get_executor(self):
+        # Created lazily from worker threads while other threads (model
+        # clients, tracer) may hold locks: spawned, not forked, children
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _source_hash(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            return _content_hash(source)
+        stat = os.stat(source)
+        file_key = (str(source), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if file_key in self._file_hashes:
+                return self._file_hashes[file_key]
+        # Hashed outside the lock; two threads may hash the same file once each
+        digest = _content_hash(source)
+        with self._lock:
+            return self._file_hashes.setdefault(file_key, digest)
+
+    def artifact_path(self, converter, source):
+        key = self._source_hash(source)
+        return self.cache_dir / converter / f"v{CONVERTER_VERSION}-{key}.txt"
+
+    def submit(self, converter, source):
+        """Future of the artifact path; cached artifacts resolve immediately"""
+        if converter not in CONVERTERS:
+            raise ValueError(f"Unknown converter: {converter}")
+        return self._submit(converter, source, self.artifact_path(converter, source))
+
+    def _submit(self, converter, source, artifact):
+        with self._lock:
+            if artifact in self._pending:
+                return self._pending[artifact]
+
+            if artifact.exists():
+                future = Future()
+                future.set_result(str(artifact))
+                return future
+
+            if self.max_workers > 0:
+                future = self._get_executor().submit(_convert_to_artifact, converter, source, str(artifact))
+            else:
+                future = Future()
+                try:
+                    future.set_result(_convert_to_artifact(converter, source, artifact))
+                except Exception as e:
+                    future.set_exception(e)
+
+            self._pending[artifact] = future
+            future.add_done_callback(lambda _: self._forget(artifact))
+            return future
+
+    def _forget(self, artifact):
+        with self._lock:
+            self._pending.pop(artifact, None)
+
+    def prefetch(self, converter, sources):
+        """Queue conversions without waiting"""
+        return [self.submit(converter, source) for source in sources]
+
+    def path(self, converter, source):
+        """Artifact path, converting (or waiting for a queued conversion) if needed"""
+        if converter not in CONVERTERS:
+            raise ValueError(f"Unknown converter: {converter}")
+        artifact = self.artifact_path(converter, source)
+        if artifact.exists():
+            tracer.cache_hit()
+            return artifact
+
+        with tracer.span("convert", converter=converter):
+            return Path(self._submit(converter, source, artifact).result())
+
+    def read_text(self, converter, source):
+        with open(self.path(converter, source), "r", encoding="utf-8", newline="") as f:
+            return f.read()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# Process-wide stage; the pool starts on the first conversion that needs it
+conversion_stage = ConversionStage()
@@ -0,0 +1,241 @@
+import abc
+import asyncio
+import functools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Common.prompt_cache import PROMPT_CACHING, converse_system
+from Common.telemetry import tracer
+from Common.transport import transport
+
+# Calls in flight per client (and connections kept in its pool)
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "8"))
+# Seconds per attempt, applied by the SDK's HTTP client
+MODEL_TIMEOUT_SECONDS = float(os.getenv("MODEL_TIMEOUT_SECONDS", "300"))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+
+# Bedrock error codes worth another attempt
+BEDROCK_RETRYABLE_CODES = frozenset((
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+))
+
+
+class ModelResponseError(ValueError):
+    """The model answer has no JSON object where one was expected"""
+
+    def __init__(self, message, text):
+        super().__init__(message)
+        self.text = text
+
+
+def parse_json_object(text):
+    """The JSON object of a model answer, starting at its first "{"; prose or
+    code fences around it are ignored. Raises ModelResponseError when that
+    object does not parse (a reply truncated at max_tokens)."""
+    start = text.find("{")
+    if start == -1:
+        raise ModelResponseError("No JSON object found in model response", text)
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError as e:
+        raise ModelResponseError(f"Invalid or truncated JSON object in model response: {e}", text) from e
+    if not isinstance(value, dict):
+        raise ModelResponseError("No JSON object found in model response", text)
+    return value
+
+
+class ModelReply:
+    def __init__(self, text, response, retries=0):
+        self.text = text
+        self.response = response
+        self.retries = retries
+
+    def json(self):
+        return parse_json_object(self.text)
+
+
+class ModelClient(abc.ABC):
+    """Async front for one provider's SDK client, shared by every agent of a
+    process.
+
+    Requests use OpenAI-style messages ({"role", "content": str}) whatever the
+    provider. At most max_concurrency SDK calls run at once, on the client's
+    own thread pool (the SDK clients are blocking, and going through them
+    keeps the record/replay transport); retryable errors are retried with
+    exponential backoff; token usage goes to the tracer of the caller.
+    Blocking callers use the *_sync variants.
+    """
+
+    def __init__(
+        self,
+        client,
+        default_model=None,
+        default_tier=None,
+        max_concurrency=MODEL_MAX_CONCURRENCY,
+        max_retries=MODEL_MAX_RETRIES,
+    ):
+        self.client = client
+        self.default_model = default_model
+        self.default_tier = default_tier
+        self.max_retries = max_retries
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="model")
+
+    @abc.abstractmethod
+    def _call(self, model, messages, json_mode, temperature, max_tokens, options):
+        """One blocking SDK call -> (text, raw response)"""
+
+    def is_retryable(self, error):
+        return False
+
+    async def complete(
+        self, messages, model=None, json_mode=False, temperature=None, max_tokens=None, tier=None, **options
+    ):
+        """ModelReply of one request; SDK errors that are not retryable (or
+        still fail after max_retries) are raised as is"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(
+            self._call, model or self.default_model, messages, json_mode, temperature, max_tokens, options
+        )
+        for attempt in range(self.max_retries + 1):
+            try:
+                text, response = await loop.run_in_executor(self._executor, call)
+            except Exception as e:
+                if not self.is_retryable(e) or attempt == self.max_retries:
+                    if attempt:
+                        tracer.count("retries", attempt)
+                    raise
+                await asyncio.sleep(2**attempt)
+                continue
+
+            tracer.record_llm(response=response, retries=attempt, tier=tier or self.default_tier)
+            return ModelReply(text, response, attempt)
+
+    async def complete_json(self, messages, **kwargs):
+        """Parsed JSON object of a JSON-mode request"""
+        reply = await self.complete(messages, json_mode=True, **kwargs)
+        return reply.json()
+
+    def complete_sync(self, messages, **kwargs):
+        return asyncio.run(self.complete(messages, **kwargs))
+
+    def complete_json_sync(self, messages, **kwargs):
+        return asyncio.run(self.complete_json(messages, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class OpenAIModelClient(ModelClient):
+    """OpenAI-compatible chat completions (Bedrock's OpenAI endpoint for the
+    orchestrator); json_mode sets response_format=json_object"""
+
+    def _call(self, model, messages, json_mode, temperature, max_tokens, options):
+        options = dict(options)
+        if json_mode:
+            options.setdefault("response_format", {"type": "json_object"})
+        if temperature is not None:
+            options["temperature"] = temperature
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        response = self.client.chat.completions.create(model=model, messages=messages, **options)
+        return response.choices[0].message.content or "", response
+
+    def is_retryable(self, error):
+        import openai
+
+        return isinstance(
+            error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+        )
+
+
+class BedrockModelClient(ModelClient):
+    """Bedrock converse API. System messages become the converse system
+    blocks, with a prompt cache point (Common.prompt_cache) unless the call
+    passes cache_system=False. Converse has no JSON mode: json_mode only
+    parses the answer."""
+
+    def _call(self, model, messages, json_mode, temperature, max_tokens, options):
+        options = dict(options)
+        cache_system = options.pop("cache_system", PROMPT_CACHING)
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        inference_config = {}
+        if temperature is not None:
+            inference_config["temperature"] = temperature
+        if max_tokens is not None:
+            inference_config["maxTokens"] = max_tokens
+
+        response = self.client.converse(
+            modelId=model,
+            system=converse_system(system, cache=cache_system) if system else [],
+            messages=[
+                {"role": m["role"], "content": [{"text": m["content"]}]}
+                for m in messages
+                if m["role"] != "system"
+            ],
+            inferenceConfig=inference_config,
+            **options,
+        )
+        text = "".join(block.get("text", "") for block in response["output"]["message"]["content"])
+        return text, response
+
+    def is_retryable(self, error):
+        from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+
+        if isinstance(error, ClientError):
+            return error.response.get("Error", {}).get("Code") in BEDROCK_RETRYABLE_CODES
+        return isinstance(error, (ConnectionError, ReadTimeoutError))
+
+
+# ===== SHARED CLIENTS =====
+
+
+def openai_model_client(
+    api_key, base_url, max_concurrency=MODEL_MAX_CONCURRENCY, timeout=MODEL_TIMEOUT_SECONDS, **kwargs
+):
+    """OpenAIModelClient over a pooled openai.OpenAI, through the transport.
+    SDK retries are off: the model client retries."""
+
+    def factory():
+        import httpx
+        import openai
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+        )
+        return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=http_client)
+
+    return OpenAIModelClient(transport.wrap_openai(factory), max_concurrency=max_concurrency, **kwargs)
+
+
+_bedrock_clients = {}
+_bedrock_lock = threading.Lock()
+
+
+def bedrock_model_client(region_name=None, max_concurrency=MODEL_MAX_CONCURRENCY, timeout=MODEL_TIMEOUT_SECONDS):
+    """Process-wide BedrockModelClient per region: the agents of one process
+    share its connection pool"""
+    with _bedrock_lock:
+        if region_name not in _bedrock_clients:
+
+            def factory():
+                import boto3
+                from botocore.config import Config
+
+                config = Config(
+                    read_timeout=timeout,
+                    max_pool_connections=max_concurrency,
+                    retries={"mode": "standard", "total_max_attempts": 1},
+                )
+                return boto3.client("bedrock-runtime", region_name=region_name, config=config)
+
+            _bedrock_clients[region_name] = BedrockModelClient(
+                transport.wrap_bedrock(factory), max_concurrency=max_concurrency
+            )
+        return _bedrock_clients[region_name]
@@ -0,0 +1,89 @@
+import re
+import zlib
+
+import numpy as np
+
+# Mersenne prime for the universal hash family (a*x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+WORD = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash signatures of word shingles.
+
+    Shingles are hashed with crc32, and the permutations come from a fixed
+    seed, so signatures (and therefore dedup decisions) are identical across
+    runs and processes.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and x < 2**32 keep a*x + b inside uint64
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        words = WORD.findall(text.lower())
+        size = self.shingle_size
+        if len(words) < size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text):
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME)
+        return permuted.min(axis=0)
+
+
+def estimated_similarity(signature, other):
+    """Estimated Jaccard similarity of the two shingle sets"""
+    return float(np.count_nonzero(signature == other)) / len(signature)
+
+
+class NearDuplicateIndex:
+    """LSH over MinHash signatures: band buckets give candidates, the full
+    signature comparison decides. With 16 bands of 8 rows, pairs above ~0.7
+    similarity are very likely to share a bucket."""
+
+    def __init__(self, threshold=0.85, num_perm=128, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows].tobytes()
+
+    def add(self, key, signature):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def query(self, signature):
+        """(key, similarity) of the most similar indexed item at or above the
+        threshold, or (None, 0.0)"""
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        best_key, best_similarity = None, 0.0
+        # Sorted so ties resolve the same way on every run
+        for key in sorted(candidates):
+            similarity = estimated_similarity(signature, self._signatures[key])
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        return best_key, best_similarity
+
+    def __len__(self):
+        return len(self._signatures)
@@ -0,0 +1,18 @@
+import os
+
+# Provider-side prompt caching of static prompt prefixes. Bedrock rejects cache
+# points for models without prompt caching: set PROMPT_CACHING=0 for those.
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "1") != "0"
+
+
+def converse_system(text, cache=PROMPT_CACHING):
+    """Bedrock converse system blocks: the static text followed by a cache
+    point, so calls sharing it are billed the cache-read rate for it.
+
+    Prefixes under the model's minimum (1,024 tokens for Claude Sonnet) are
+    accepted but not cached; the usage block then has no cache tokens.
+    """
+    blocks = [{"text": text}]
+    if cache:
+        blocks.append({"cachePoint": {"type": "default"}})
+    return blocks
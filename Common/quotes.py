@@ -0,0 +1,204 @@
+import bisect
+import re
+import unicodedata
+
+# Typographic characters models routinely "straighten" when quoting
+QUOTE_TRANSLATION = str.maketrans({
+    "‘": "'", "’": "'", "‚": "'", "‛": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-",
+    "\u00ad": None,  # soft hyphen
+})
+WHITESPACE_RUN = re.compile(r"\s+")
+LONG_WHITESPACE_RUN = re.compile(r"\s{2,}")
+
+# k-gram length and sampling step of the hash index: quotes of at least
+# KGRAM_SIZE + KGRAM_STEP - 1 chars always cover one sampled k-gram
+KGRAM_SIZE = 32
+KGRAM_STEP = 32
+# Normalized chars kept per document; beyond that the oldest half is dropped
+QUOTE_INDEX_MAX_CHARS = 16 * 1024 * 1024
+
+
+def normalize_quote_text(text):
+    """NFKC, straight quotes/dashes, whitespace runs collapsed to one space"""
+    text = unicodedata.normalize("NFKC", text).translate(QUOTE_TRANSLATION)
+    return WHITESPACE_RUN.sub(" ", text).strip()
+
+
+class QuoteIndex:
+    """Verifies model quotes against a whole document, fed chunk by chunk.
+
+    Keeps the normalized document, a sparse map back to original character
+    offsets (only where normalization changed lengths) and a sampled k-gram
+    hash index, so a quote is located without scanning the document.
+    """
+
+    def __init__(self, max_chars=QUOTE_INDEX_MAX_CHARS):
+        self.max_chars = max_chars
+        self.normalized = ""
+        self.base = 0          # normalized offset of self.normalized[0]
+        self.indexed_end = 0   # original offset up to which text was added
+        self._breaks = [0]     # normalized offsets where the delta changes
+        self._deltas = [0]     # original offset - normalized offset from there on
+        self._kgrams = {}
+        self._next_kgram = 0   # next sampled normalized offset to hash
+
+    def __len__(self):
+        return self.base + len(self.normalized)
+
+    def add(self, text, offset=None):
+        """Append document text starting at original offset (default: right
+        after what was added so far). Overlap with already indexed text, as
+        between consecutive bill chunks, is skipped."""
+        if offset is None:
+            offset = self.indexed_end
+        if offset + len(text) <= self.indexed_end:
+            return
+        if offset < self.indexed_end:
+            text = text[self.indexed_end - offset :]
+            offset = self.indexed_end
+
+        previous_space = bool(self.normalized) and self.normalized[-1] == " "
+        if unicodedata.is_normalized("NFKC", text) and "\u00ad" not in text:
+            self._add_normalized(text, offset, previous_space)
+        else:
+            self._add_slow(text, offset, previous_space)
+
+        self.indexed_end = offset + len(text)
+        self._index_kgrams()
+        if len(self.normalized) > self.max_chars:
+            self._drop_front(len(self.normalized) // 2)
+
+    def _add_normalized(self, text, offset, previous_space):
+        """Fast path for text NFKC leaves alone: only whitespace runs longer
+        than one char shift offsets, so only those are visited in Python"""
+        leading = WHITESPACE_RUN.match(text)
+        if leading and previous_space:
+            # Continues a whitespace run from the previous chunk
+            text = text[leading.end():]
+            offset += leading.end()
+            self._mark(len(self), offset)
+
+        norm_pos = len(self)
+        removed = 0
+        for match in LONG_WHITESPACE_RUN.finditer(text):
+            removed += match.end() - match.start() - 1
+            self._mark(norm_pos + match.end() - removed, offset + match.end())
+
+        self.normalized += WHITESPACE_RUN.sub(" ", text.translate(QUOTE_TRANSLATION))
+
+    def _add_slow(self, text, offset, previous_space):
+        pieces = []
+        norm_pos = len(self)
+        position = 0
+
+        def add_segment(segment, orig_start):
+            nonlocal norm_pos
+            if not segment:
+                return
+            normalized = unicodedata.normalize("NFKC", segment).translate(QUOTE_TRANSLATION)
+            pieces.append(normalized)
+            self._mark(norm_pos, orig_start)
+            if len(normalized) == len(segment):
+                norm_pos += len(normalized)
+                return
+
+            # Length changed (ligature, soft hyphen...): map char by char when
+            # the segment normalizes the same way one char at a time
+            per_char = [unicodedata.normalize("NFKC", char).translate(QUOTE_TRANSLATION) for char in segment]
+            if "".join(per_char) == normalized:
+                for position, char in enumerate(per_char):
+                    # Every char of an expansion ("ﬁ" -> "fi") maps back to
+                    # the original char, not to the ones after it
+                    for _ in char:
+                        self._mark(norm_pos, orig_start + position)
+                        norm_pos += 1
+            else:
+                norm_pos += len(normalized)
+            self._mark(norm_pos, orig_start + len(segment))
+
+        for match in WHITESPACE_RUN.finditer(text):
+            if match.start() > position:
+                add_segment(text[position : match.start()], offset + position)
+                previous_space = False
+            if not previous_space:
+                # A run of whitespace becomes one space
+                self._mark(norm_pos, offset + match.start())
+                pieces.append(" ")
+                norm_pos += 1
+                previous_space = True
+            self._mark(norm_pos, offset + match.end())
+            position = match.end()
+        add_segment(text[position:], offset + position)
+
+        self.normalized += "".join(pieces)
+
+    def _mark(self, norm_pos, orig_pos):
+        delta = orig_pos - norm_pos
+        if self._deltas[-1] == delta:
+            return
+        if self._breaks[-1] == norm_pos:
+            self._deltas[-1] = delta
+        else:
+            self._breaks.append(norm_pos)
+            self._deltas.append(delta)
+
+    def _index_kgrams(self):
+        end = len(self) - KGRAM_SIZE
+        while self._next_kgram <= end:
+            start = self._next_kgram - self.base
+            kgram = self.normalized[start : start + KGRAM_SIZE]
+            self._kgrams.setdefault(hash(kgram), []).append(self._next_kgram)
+            self._next_kgram += KGRAM_STEP
+
+    def _drop_front(self, count):
+        self.normalized = self.normalized[count:]
+        self.base += count
+        self._kgrams = {
+            key: kept
+            for key, positions in self._kgrams.items()
+            if (kept := [p for p in positions if p >= self.base])
+        }
+        cut = bisect.bisect_right(self._breaks, self.base) - 1
+        del self._breaks[:cut], self._deltas[:cut]
+
+    def original_offset(self, norm_pos):
+        index = bisect.bisect_right(self._breaks, norm_pos) - 1
+        return norm_pos + self._deltas[index]
+
+    def _candidates(self, needle):
+        """Normalized start offsets where needle may begin, from the k-gram index"""
+        for shift in range(KGRAM_STEP):
+            kgram = needle[shift : shift + KGRAM_SIZE]
+            for position in self._kgrams.get(hash(kgram), ()):
+                yield position - shift
+
+    def find(self, quote):
+        """(start, end) original offsets of quote in the document, or None.
+
+        Matching ignores Unicode compatibility forms, typographic quotes and
+        whitespace differences; offsets point at the original text.
+        """
+        needle = normalize_quote_text(quote)
+        if not needle:
+            return None
+
+        if len(needle) >= KGRAM_SIZE + KGRAM_STEP - 1:
+            for start in self._candidates(needle):
+                local = start - self.base
+                if local >= 0 and self.normalized.startswith(needle, local):
+                    break
+            else:
+                return None
+        else:
+            local = self.normalized.find(needle)
+            if local == -1:
+                return None
+            start = local + self.base
+
+        end = start + len(needle)
+        return self.original_offset(start), self.original_offset(end - 1) + 1
+
+    def __contains__(self, quote):
+        return self.find(quote) is not None
@@ -0,0 +1,294 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Optional price table ($ per 1k tokens) used for the cost column of the summary
+PROMPT_PRICE_PER_1K = float(os.getenv("PROMPT_PRICE_PER_1K", "0"))
+# Prompt tokens read from the provider's prompt cache (billed at a discount by most providers)
+CACHED_PROMPT_PRICE_PER_1K = float(os.getenv("CACHED_PROMPT_PRICE_PER_1K", str(PROMPT_PRICE_PER_1K)))
+COMPLETION_PRICE_PER_1K = float(os.getenv("COMPLETION_PRICE_PER_1K", "0"))
+# Calls recorded with tier="triage" run on the small routing model
+TRIAGE_PROMPT_PRICE_PER_1K = float(os.getenv("TRIAGE_PROMPT_PRICE_PER_1K", str(PROMPT_PRICE_PER_1K)))
+TRIAGE_COMPLETION_PRICE_PER_1K = float(os.getenv("TRIAGE_COMPLETION_PRICE_PER_1K", str(COMPLETION_PRICE_PER_1K)))
+
+# Counters every span carries, so the JSONL rows all have the same shape
+BASE_COUNTERS = (
+    "llm_calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "cache_write_tokens",
+    "retries",
+    "cache_hits",
+    "rejections",
+)
+
+
+def usage_from_response(response):
+    """(prompt, completion, cache read, cache write) tokens from an OpenAI-style
+    or Bedrock response; prompt includes both kinds of cached tokens"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        # OpenAI-style providers cache prefixes automatically, there are no writes
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+        return (
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+            cached or 0,
+            0,
+        )
+
+    if isinstance(response, dict):
+        usage = response.get("usage", {})
+        # Bedrock converse: inputTokens excludes cache reads and writes
+        if "inputTokens" in usage:
+            cached = usage.get("cacheReadInputTokens", 0)
+            written = usage.get("cacheWriteInputTokens", 0)
+            return usage["inputTokens"] + cached + written, usage.get("outputTokens", 0), cached, written
+        # Anthropic messages API via invoke_model
+        if "input_tokens" in usage:
+            cached = usage.get("cache_read_input_tokens", 0)
+            written = usage.get("cache_creation_input_tokens", 0)
+            return usage["input_tokens"] + cached + written, usage.get("output_tokens", 0), cached, written
+
+    return 0, 0, 0, 0
+
+
+class Span:
+    def __init__(self, span_id, name, parent_id, attrs):
+        self.span_id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.counters = Counter({key: 0 for key in BASE_COUNTERS})
+        self.rejection_reasons = Counter()
+        self.status = "ok"
+        self.error = None
+        self.start = time.time()
+        self.wall_ms = None
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            **self.attrs,
+            "start": self.start,
+            "wall_ms": self.wall_ms,
+            "status": self.status,
+            "error": self.error,
+            **self.counters,
+            "rejection_reasons": dict(self.rejection_reasons),
+        }
+
+
+class Tracer:
+    """Nested timing spans (ticker > step > chunk) with LLM token, retry,
+    cache-hit and rejection counters. Thread- and asyncio-safe: the span
+    stack is a context variable, so each thread and each task started under
+    a span has its own; finished spans go to one shared list."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._stack_var = contextvars.ContextVar("tracer_stack", default=())
+        self._next_id = 0
+
+    def _stack(self):
+        return self._stack_var.get()
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = self.start_span(name, **attrs)
+        try:
+            with self.resume(span):
+                yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        self.end_span(span)
+
+    def start_span(self, name, **attrs):
+        """Open a span under the current one without entering it, for work
+        handed from task to task (pipeline stages): each step runs inside
+        resume(span), and end_span() closes it"""
+        parent = self.current()
+        # Children inherit identifying attributes (ticker, bill, ...)
+        inherited = {k: v for k, v in (parent.attrs if parent else {}).items() if k not in attrs}
+        with self._lock:
+            self._next_id += 1
+            span = Span(self._next_id, name, parent.span_id if parent else None, {**inherited, **attrs})
+        span.perf_start = time.perf_counter()
+        return span
+
+    @contextmanager
+    def resume(self, span):
+        """Make an open span the current one for the duration of the block"""
+        token = self._stack_var.set(self._stack() + (span,))
+        try:
+            yield span
+        finally:
+            self._stack_var.reset(token)
+
+    def end_span(self, span, error=None):
+        if error is not None:
+            span.status = "error"
+            span.error = f"{type(error).__name__}: {error}"
+        span.wall_ms = round((time.perf_counter() - span.perf_start) * 1000, 3)
+        with self._lock:
+            self.spans.append(span)
+
+    def traced(self, name, **arg_attrs):
+        """Decorator opening a span per call; arg_attrs maps span attributes to
+        argument names, e.g. @tracer.traced("sec_filing", ticker="ticker")"""
+
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                attrs = {attr: bound.get(arg) for attr, arg in arg_attrs.items()}
+                with self.span(name, **attrs):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _add(self, key, value):
+        # Counters roll up to every open ancestor so step totals include chunks;
+        # an ancestor may be shared by threads working for the same company
+        with self._lock:
+            for span in self._stack():
+                span.counters[key] += value
+
+    def record_llm(
+        self,
+        prompt_tokens=0,
+        completion_tokens=0,
+        cached_tokens=0,
+        cache_write_tokens=0,
+        retries=0,
+        response=None,
+        tier=None,
+    ):
+        """tier (model routing tier, e.g. "triage") also counts the call under
+        <tier>_llm_calls / <tier>_prompt_tokens / <tier>_completion_tokens"""
+        if response is not None:
+            prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens = usage_from_response(response)
+        self._add("llm_calls", 1)
+        self._add("prompt_tokens", prompt_tokens)
+        self._add("completion_tokens", completion_tokens)
+        self._add("cached_tokens", cached_tokens)
+        self._add("cache_write_tokens", cache_write_tokens)
+        if tier:
+            self._add(f"{tier}_llm_calls", 1)
+            self._add(f"{tier}_prompt_tokens", prompt_tokens)
+            self._add(f"{tier}_completion_tokens", completion_tokens)
+        if retries:
+            self._add("retries", retries)
+
+    def count(self, key, value=1):
+        self._add(key, value)
+
+    def cache_hit(self, value=1):
+        self._add("cache_hits", value)
+
+    def reject(self, reason):
+        self._add("rejections", 1)
+        with self._lock:
+            for span in self._stack():
+                span.rejection_reasons[reason] += 1
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+
+    def export_jsonl(self, path):
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        return path
+
+    def summary(self):
+        """Aggregate finished spans by name"""
+        with self._lock:
+            spans = list(self.spans)
+
+        by_name = {}
+        for span in spans:
+            by_name.setdefault(span.name, []).append(span)
+
+        rows = []
+        for name, group in by_name.items():
+            walls = sorted(s.wall_ms for s in group)
+            totals = Counter()
+            reasons = Counter()
+            for s in group:
+                totals.update(s.counters)
+                reasons.update(s.rejection_reasons)
+            rows.append({
+                "name": name,
+                "count": len(group),
+                "errors": sum(1 for s in group if s.status == "error"),
+                "total_s": sum(walls) / 1000,
+                "mean_ms": statistics.mean(walls),
+                "p95_ms": walls[min(len(walls) - 1, int(len(walls) * 0.95))],
+                **totals,
+                "fresh_tokens": totals["prompt_tokens"] - totals["cached_tokens"],
+                "cost": (
+                    (totals["prompt_tokens"] - totals["triage_prompt_tokens"] - totals["cached_tokens"])
+                    / 1000 * PROMPT_PRICE_PER_1K
+                    + totals["cached_tokens"] / 1000 * CACHED_PROMPT_PRICE_PER_1K
+                    + (totals["completion_tokens"] - totals["triage_completion_tokens"]) / 1000 * COMPLETION_PRICE_PER_1K
+                    + totals["triage_prompt_tokens"] / 1000 * TRIAGE_PROMPT_PRICE_PER_1K
+                    + totals["triage_completion_tokens"] / 1000 * TRIAGE_COMPLETION_PRICE_PER_1K
+                ),
+                "top_rejections": reasons.most_common(3),
+            })
+
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def summary_table(self):
+        header = (
+            f"{'span':<14s} {'count':>6s} {'err':>4s} {'total s':>9s} {'mean ms':>9s} {'p95 ms':>9s} "
+            f"{'calls':>6s} {'in tok':>9s} {'fresh':>9s} {'cached':>8s} {'out tok':>8s} {'retry':>5s} "
+            f"{'hits':>5s} {'rej':>5s} {'cost $':>8s}"
+        )
+        lines = [header, "-" * len(header)]
+        for row in self.summary():
+            lines.append(
+                f"{row['name']:<14s} {row['count']:>6d} {row['errors']:>4d} {row['total_s']:>9.1f} "
+                f"{row['mean_ms']:>9.0f} {row['p95_ms']:>9.0f} {row['llm_calls']:>6d} "
+                f"{row['prompt_tokens']:>9d} {row['fresh_tokens']:>9d} {row['cached_tokens']:>8d} {row['completion_tokens']:>8d} "
+                f"{row['retries']:>5d} {row['cache_hits']:>5d} {row['rejections']:>5d} {row['cost']:>8.2f}"
+            )
+        # Root spans already include their children's rejections
+        reasons = Counter()
+        with self._lock:
+            for span in self.spans:
+                if span.parent_id is None:
+                    reasons.update(span.rejection_reasons)
+        if reasons:
+            lines.append("")
+            lines.append("Rejections: " + ", ".join(f"{r} ({n})" for r, n in reasons.most_common(5)))
+        return "\n".join(lines)
+
+
+# Process-wide tracer shared by all pipeline steps
+tracer = Tracer()
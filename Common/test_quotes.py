@@ -0,0 +1,56 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from Common.quotes import QuoteIndex, normalize_quote_text
+
+# "ﬁ" (one char) normalizes to "fi" (two chars)
+TEXT = "The proﬁt margin of steel is taxed.\n\nA ﬁnal   ruling on the ﬁle is due."
+
+
+def index_of(text, offset=0):
+    index = QuoteIndex()
+    index.add(text, offset)
+    return index
+
+
+@pytest.mark.parametrize(
+    "quote, expected",
+    [
+        # Ends right after the ligature
+        ("The proﬁ", "The proﬁ"),
+        ("The profi", "The proﬁ"),
+        # Ends inside it: the span covers the whole ligature
+        ("The prof", "The proﬁ"),
+        # Ends after it
+        ("The profit margin", "The proﬁt margin"),
+        ("A final ruling on the file", "A ﬁnal   ruling on the ﬁle"),
+        ("ruling on the ﬁle is due.", "ruling on the ﬁle is due."),
+    ],
+)
+def test_span_around_ligature(quote, expected):
+    start, end = index_of(TEXT).find(quote)
+    assert TEXT[start:end] == expected
+
+
+def test_span_offset_by_chunk_position():
+    start, end = index_of(TEXT, offset=1000).find("profit margin of steel")
+    assert (start, end) == (1004, 1004 + len("proﬁt margin of steel"))
+
+
+def test_random_quotes_with_ligatures():
+    rng = random.Random(7)
+    words = ["ﬁle", "proﬁt", "tariff", "steel", "ﬁnal", "rate", "25", "percent", "“duty”", "ﬂow"]
+    for _ in range(200):
+        text = " ".join(rng.choice(words) for _ in range(40))
+        index = index_of(text)
+        tokens = text.split(" ")
+        for _ in range(5):
+            first = rng.randrange(len(tokens) - 4)
+            quote = " ".join(tokens[first : first + rng.randint(4, 8)])
+            start, end = index.find(quote)
+            assert normalize_quote_text(text[start:end]) == normalize_quote_text(quote)
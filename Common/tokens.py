@@ -0,0 +1,36 @@
+import os
+import threading
+
+# tiktoken encoding used to measure prompts; gpt-oss and the GPT-4o family use o200k_base
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+# Fallback when tiktoken (or its encoding file) is not available
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    # Loaded once; tiktoken downloads the encoding on first use, which fails offline
+    global _encoding, _encoding_loaded
+    with _lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception:
+                _encoding = None
+        return _encoding
+
+
+def count_tokens(text):
+    """Prompt tokens of text: exact with tiktoken, ~4 chars per token otherwise"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
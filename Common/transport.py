@@ -0,0 +1,242 @@
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+# live: call the service, record: call it and store the response,
+# replay: answer from the cassette only (a request that was never recorded fails)
+TRANSPORT_MODES = ("live", "record", "replay")
+TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "live")
+CASSETTE_DIR = os.getenv("TRANSPORT_CASSETTE_DIR", str(Path(__file__).resolve().parent.parent / "cassettes"))
+
+
+class CassetteMissError(LookupError):
+    """Replay mode got a request that is not in the cassette"""
+
+
+def to_json(value):
+    """JSON-safe copy of a response: bytes become {"__bytes__": base64}"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def from_json(value):
+    if isinstance(value, dict):
+        if set(value) == {"__bytes__"}:
+            return base64.b64decode(value["__bytes__"])
+        return {key: from_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_json(item) for item in value]
+    return value
+
+
+def request_key(operation, args, kwargs):
+    """Stable hash of one request: same operation and arguments -> same key"""
+    canonical = json.dumps(
+        {"operation": operation, "args": to_json(list(args)), "kwargs": to_json(kwargs)},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded responses of one service, keyed by request hash.
+
+    Stored as gzip JSON lines; every recording is appended as its own gzip
+    member (gzip readers concatenate them), so recording never rewrites the
+    file and a crash loses at most the last entry.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    # First recording of a key wins so replay stays deterministic
+                    self.entries.setdefault(entry["key"], entry["response"])
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            # Truncated last member from an interrupted recording
+            pass
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def record(self, key, operation, response):
+        line = json.dumps({"key": key, "operation": operation, "response": response}, ensure_ascii=False)
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = response
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress((line + "\n").encode("utf-8")))
+
+
+class Transport:
+    """Routes calls of the wrapped clients through live services or cassettes"""
+
+    def __init__(self, mode=TRANSPORT_MODE, cassette_dir=CASSETTE_DIR):
+        if mode not in TRANSPORT_MODES:
+            raise ValueError(f"TRANSPORT_MODE must be one of {TRANSPORT_MODES}, got {mode!r}")
+        self.mode = mode
+        self.cassette_dir = Path(cassette_dir)
+        self.stats = Counter()
+        self._cassettes = {}
+        self._lock = threading.Lock()
+
+    def cassette(self, name):
+        with self._lock:
+            if name not in self._cassettes:
+                self._cassettes[name] = Cassette(self.cassette_dir / f"{name}.jsonl.gz")
+            return self._cassettes[name]
+
+    def call(self, cassette_name, operation, live_call, args, kwargs, encode, decode):
+        if self.mode == "live":
+            self.stats["live"] += 1
+            return live_call(*args, **kwargs)
+
+        cassette = self.cassette(cassette_name)
+        key = request_key(operation, args, kwargs)
+
+        if self.mode == "replay":
+            recorded = cassette.get(key)
+            if recorded is None:
+                self.stats["misses"] += 1
+                raise CassetteMissError(f"{cassette_name}: no recording for {operation} (key {key[:12]})")
+            self.stats["replayed"] += 1
+            return decode(recorded)
+
+        recorded = encode(live_call(*args, **kwargs))
+        cassette.record(key, operation, recorded)
+        self.stats["recorded"] += 1
+        # Hand back the decoded recording so record and replay runs see the same objects
+        return decode(recorded)
+
+    def wrap(self, cassette_name, factory, operations):
+        """Client proxy: the methods listed in operations ({dotted path:
+        (encode, decode)}) go through the transport, everything else goes to
+        the live client. factory() is only called when a live call is needed,
+        so replay works without credentials."""
+        return _ClientProxy(self, cassette_name, _LazyClient(factory), operations, "")
+
+    def wrap_openai(self, factory, cassette_name="openai"):
+        return self.wrap(cassette_name, factory, {"chat.completions.create": (_encode_openai, _decode_openai)})
+
+    def wrap_tavily(self, factory, cassette_name="tavily"):
+        return self.wrap(cassette_name, factory, {"search": (to_json, from_json)})
+
+    def wrap_sec_downloader(self, factory, cassette_name="sec"):
+        return self.wrap(cassette_name, factory, {"get_filing_html": (to_json, from_json)})
+
+    def wrap_bedrock(self, factory, cassette_name="bedrock"):
+        return self.wrap(cassette_name, factory, {
+            "invoke_model": (_encode_invoke_model, _decode_invoke_model),
+            "invoke_model_with_response_stream": (_encode_response_stream, _decode_response_stream),
+            "converse": (to_json, from_json),
+        })
+
+
+class _LazyClient:
+    def __init__(self, factory):
+        self.factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self.factory()
+            return self._client
+
+
+class _ClientProxy:
+    def __init__(self, transport, cassette_name, client, operations, path):
+        self._transport = transport
+        self._cassette_name = cassette_name
+        self._client = client
+        self._operations = operations
+        self._path = path
+
+    def _live_attr(self, dotted):
+        target = self._client.get()
+        for name in dotted.split("."):
+            target = getattr(target, name)
+        return target
+
+    def __getattr__(self, name):
+        dotted = f"{self._path}.{name}" if self._path else name
+
+        if dotted in self._operations:
+            encode, decode = self._operations[dotted]
+
+            def call(*args, **kwargs):
+                live_call = lambda *a, **kw: self._live_attr(dotted)(*a, **kw)
+                return self._transport.call(self._cassette_name, dotted, live_call, args, kwargs, encode, decode)
+
+            return call
+
+        # openai's client.chat.completions: keep proxying down to the operation
+        if any(op.startswith(dotted + ".") for op in self._operations):
+            return _ClientProxy(self._transport, self._cassette_name, self._client, self._operations, dotted)
+
+        return self._live_attr(dotted)
+
+
+# ===== RESPONSE ENCODERS =====
+
+
+def _encode_openai(response):
+    return response.model_dump(mode="json")
+
+
+def _decode_openai(data):
+    from openai.types.chat import ChatCompletion
+
+    return ChatCompletion.model_validate(data)
+
+
+def _encode_invoke_model(response):
+    return to_json({**response, "body": response["body"].read()})
+
+
+def _decode_invoke_model(data):
+    response = from_json(data)
+    response["body"] = io.BytesIO(response["body"])
+    return response
+
+
+def _encode_response_stream(response):
+    # Recording consumes the stream; replay hands the events back in one go
+    return to_json({**response, "body": list(response["body"])})
+
+
+def _decode_response_stream(data):
+    response = from_json(data)
+    response["body"] = iter(response["body"])
+    return response
+
+
+# Process-wide transport; the mode comes from TRANSPORT_MODE
+transport = Transport()
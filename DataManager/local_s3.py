@@ -0,0 +1,218 @@
+import hashlib
+import io
+import json
+import shutil
+import uuid
+from pathlib import Path
+from urllib.parse import quote, unquote
+from botocore.exceptions import ClientError
+
+
+def _client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            if token:
+                kwargs["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+
+class FilesystemS3Client:
+    """Stand-in for the subset of the boto3 S3 client used by S3Storage.
+
+    Objects live in root/<bucket>/<quoted key>, their metadata (ETag, content
+    type, encoding, user metadata) in a JSON sidecar root/.meta/<bucket>/<quoted
+    key>.json. Keys are percent-encoded into flat file names, so a key may also
+    be a prefix of another ("a" and "a/b").
+    Pass it as S3Storage(bucket, client=FilesystemS3Client("/tmp/s3")) to run
+    without AWS.
+    """
+
+    def __init__(self, root, page_size=1000):
+        self.root = Path(root)
+        self.page_size = page_size
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, bucket, key):
+        return self.root / bucket / quote(key, safe="")
+
+    def _meta_path(self, bucket, key):
+        return self.root / ".meta" / bucket / f"{quote(key, safe='')}.json"
+
+    def _require_bucket(self, bucket, operation):
+        if not (self.root / bucket).is_dir():
+            raise _client_error("NoSuchBucket", f"Bucket {bucket} does not exist", operation)
+
+    def head_bucket(self, Bucket):
+        if not (self.root / Bucket).is_dir():
+            raise _client_error("404", "Not Found", "HeadBucket")
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        (self.root / Bucket).mkdir(parents=True, exist_ok=True)
+        return {}
+
+    def put_object(self, Bucket, Key, Body, ContentType="binary/octet-stream", ContentEncoding=None, Metadata=None, **kwargs):
+        self._require_bucket(Bucket, "PutObject")
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+        path = self._object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(Body)
+
+        self._write_meta(Bucket, Key, {
+            "ETag": etag,
+            "ContentType": ContentType,
+            "ContentEncoding": ContentEncoding,
+            "Metadata": Metadata or {},
+        })
+        return {"ETag": etag}
+
+    def _write_meta(self, bucket, key, meta):
+        meta_path = self._meta_path(bucket, key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta_path.write_text(json.dumps(meta))
+
+    def create_multipart_upload(self, Bucket, Key, ContentType="binary/octet-stream", ContentEncoding=None, Metadata=None, **kwargs):
+        self._require_bucket(Bucket, "CreateMultipartUpload")
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.root / ".uploads" / upload_id
+        upload_dir.mkdir(parents=True)
+        (upload_dir / "upload.json").write_text(json.dumps({
+            "Bucket": Bucket,
+            "Key": Key,
+            "ContentType": ContentType,
+            "ContentEncoding": ContentEncoding,
+            "Metadata": Metadata or {},
+        }))
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        upload_dir = self.root / ".uploads" / UploadId
+        if not upload_dir.is_dir():
+            raise _client_error("NoSuchUpload", "The specified upload does not exist.", "UploadPart")
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        (upload_dir / f"{PartNumber:05d}.part").write_bytes(Body)
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload_dir = self.root / ".uploads" / UploadId
+        if not upload_dir.is_dir():
+            raise _client_error("NoSuchUpload", "The specified upload does not exist.", "CompleteMultipartUpload")
+        upload = json.loads((upload_dir / "upload.json").read_text())
+
+        path = self._object_path(Bucket, Key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digests = b""
+        parts = sorted(MultipartUpload["Parts"], key=lambda part: part["PartNumber"])
+        with open(path, "wb") as out:
+            for part in parts:
+                with open(upload_dir / f"{part['PartNumber']:05d}.part", "rb") as f:
+                    part_hash = hashlib.md5()
+                    for block in iter(lambda: f.read(1024 * 1024), b""):
+                        part_hash.update(block)
+                        out.write(block)
+                digests += part_hash.digest()
+
+        # Same shape as S3: md5 of the part digests, suffixed with the part count
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(parts)}"'
+        self._write_meta(Bucket, Key, {
+            "ETag": etag,
+            "ContentType": upload["ContentType"],
+            "ContentEncoding": upload["ContentEncoding"],
+            "Metadata": upload["Metadata"],
+        })
+        shutil.rmtree(upload_dir)
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(self.root / ".uploads" / UploadId, ignore_errors=True)
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._require_bucket(Bucket, "GetObject")
+        path = self._object_path(Bucket, Key)
+        if not path.is_file():
+            raise _client_error("NoSuchKey", "The specified key does not exist.", "GetObject")
+
+        meta = json.loads(self._meta_path(Bucket, Key).read_text())
+        if kwargs.get("IfNoneMatch") and kwargs["IfNoneMatch"] == meta["ETag"]:
+            raise ClientError(
+                {"Error": {"Code": "304", "Message": "Not Modified"},
+                 "ResponseMetadata": {"HTTPStatusCode": 304}},
+                "GetObject",
+            )
+
+        body = path.read_bytes()
+        response = {
+            "Body": io.BytesIO(body),
+            "ContentLength": len(body),
+            "ETag": meta["ETag"],
+            "ContentType": meta["ContentType"],
+            "Metadata": meta["Metadata"],
+        }
+        if meta.get("ContentEncoding"):
+            response["ContentEncoding"] = meta["ContentEncoding"]
+        return response
+
+    def delete_object(self, Bucket, Key):
+        self._require_bucket(Bucket, "DeleteObject")
+        for path in (self._object_path(Bucket, Key), self._meta_path(Bucket, Key)):
+            if path.is_file():
+                path.unlink()
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        deleted = []
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket=Bucket, Key=obj["Key"])
+            deleted.append({"Key": obj["Key"]})
+        return {} if Delete.get("Quiet") else {"Deleted": deleted}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, MaxKeys=None, **kwargs):
+        self._require_bucket(Bucket, "ListObjectsV2")
+        bucket_root = self.root / Bucket
+        keys = sorted(unquote(path.name) for path in bucket_root.iterdir() if path.is_file())
+        keys = [key for key in keys if key.startswith(Prefix)]
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+
+        page_size = MaxKeys or self.page_size
+        page, rest = keys[:page_size], keys[page_size:]
+        response = {
+            "Contents": [
+                {"Key": key, "Size": self._object_path(Bucket, key).stat().st_size}
+                for key in page
+            ],
+            "KeyCount": len(page),
+            "IsTruncated": bool(rest),
+        }
+        if rest:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return _ListObjectsPaginator(self)
+
+    def delete_bucket(self, Bucket):
+        shutil.rmtree(self.root / Bucket, ignore_errors=True)
+        shutil.rmtree(self.root / ".meta" / Bucket, ignore_errors=True)
+        return {}
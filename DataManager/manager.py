@@ -1,13 +1,295 @@
+import gzip
+import hashlib
 import json
+import os
+import tempfile
+import threading
+import weakref
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# S3 accepts at most 1000 keys per delete_objects call
+DELETE_BATCH_SIZE = 1000
+
+# User metadata key recording which codec wrote an object
+CODEC_METADATA_KEY = "codec"
+
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+# Codecs that can be produced incrementally by MultipartJSONWriter
+STREAMING_CODECS = ("json", "gzip")
+
+# "eager" checks the bucket in __init__, "lazy" before the first write,
+# "off" never; lazy/eager results are remembered per S3 client for the whole
+# process, so storages sharing a client check a bucket once
+BUCKET_VALIDATION_MODES = ("eager", "lazy", "off")
+
+_clients = {}
+# S3 client -> names of the buckets known to exist through it
+_validated_buckets = weakref.WeakKeyDictionary()
+_registry_lock = threading.Lock()
+
+
+def get_s3_client(region_name="us-east-1", max_pool_connections=16):
+    """Return a process-wide S3 client for this region and pool size.
+
+    boto3 clients are thread-safe and expensive to build (endpoint resolution,
+    credential lookup), so storages share them instead of creating their own.
+    """
+    key = (region_name, max_pool_connections)
+    with _registry_lock:
+        if key not in _clients:
+            _clients[key] = boto3.session.Session().client(
+                "s3",
+                region_name=region_name,
+                config=Config(max_pool_connections=max_pool_connections),
+            )
+        return _clients[key]
+
+
+def _dump_json(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode("utf-8")
+
+
+def _load_json(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload.decode("utf-8"))
+
+
+def _zstd_compress(payload):
+    if zstandard is None:
+        raise ValueError("The zstd codec requires the 'zstandard' package")
+    return zstandard.ZstdCompressor(level=10).compress(payload)
+
+
+def _zstd_decompress(payload):
+    if zstandard is None:
+        raise ValueError("The zstd codec requires the 'zstandard' package")
+    return zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+
+
+def _dump_msgpack(data):
+    if msgpack is None:
+        raise ValueError("The msgpack codec requires the 'msgpack' package")
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def _load_msgpack(payload):
+    if msgpack is None:
+        raise ValueError("The msgpack codec requires the 'msgpack' package")
+    return msgpack.unpackb(payload, raw=False)
+
+
+class Codec:
+    """How an object is serialized and which Content-Type/Content-Encoding it is stored with."""
+
+    def __init__(self, name, encode, decode, content_type="application/json", content_encoding=None):
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+
+
+CODECS = {}
+
+
+def register_codec(codec):
+    CODECS[codec.name] = codec
+    return codec
+
+
+register_codec(Codec("json", _dump_json, _load_json))
+register_codec(Codec(
+    "gzip",
+    lambda data: gzip.compress(_dump_json(data), compresslevel=6),
+    lambda payload: _load_json(gzip.decompress(payload)),
+    content_encoding="gzip",
+))
+register_codec(Codec(
+    "zstd",
+    lambda data: _zstd_compress(_dump_json(data)),
+    lambda payload: _load_json(_zstd_decompress(payload)),
+    content_encoding="zstd",
+))
+register_codec(Codec("msgpack", _dump_msgpack, _load_msgpack, content_type="application/msgpack"))
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec '{name}', expected one of {sorted(CODECS)}")
+    return CODECS[name]
+
+
+def codec_for_response(response):
+    """Pick the codec of a get_object response from its metadata, falling back to its headers."""
+    name = response.get("Metadata", {}).get(CODEC_METADATA_KEY)
+    if name in CODECS:
+        return CODECS[name]
+    for codec in CODECS.values():
+        if codec.content_encoding and codec.content_encoding == response.get("ContentEncoding"):
+            return codec
+    if response.get("ContentType") == "application/msgpack":
+        return CODECS["msgpack"]
+    return CODECS["json"]
+
+
+class MultipartJSONWriter:
+    """File-like writer that uploads to S3 with a multipart upload as data comes in.
+
+    At most one part (part_size bytes) is buffered at a time, whatever the size
+    of the document. Use as a context manager: the upload is completed on a
+    clean exit and aborted if an exception escapes.
+    """
+
+    # Small strings from the JSON encoder are joined before being encoded
+    FLUSH_SIZE = 64 * 1024
+
+    def __init__(self, storage, key, codec="json", part_size=DEFAULT_PART_SIZE):
+        if codec not in STREAMING_CODECS:
+            raise ValueError(f"Codec '{codec}' cannot be streamed, expected one of {STREAMING_CODECS}")
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+
+        storage._ensure_bucket()
+        self.storage = storage
+        self.key = key
+        self.codec = get_codec(codec)
+        self.part_size = part_size
+        self.bytes_written = 0
+        self._pending = []
+        self._pending_size = 0
+        self._buffer = bytearray()
+        self._parts = []
+        # wbits=31 produces a gzip container, readable by gzip.decompress
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if codec == "gzip" else None
+
+        extra = {"ContentEncoding": self.codec.content_encoding} if self.codec.content_encoding else {}
+        response = storage.s3.create_multipart_upload(
+            Bucket=storage.bucket_name,
+            Key=key,
+            ContentType=self.codec.content_type,
+            Metadata={CODEC_METADATA_KEY: self.codec.name},
+            **extra,
+        )
+        self.upload_id = response["UploadId"]
+
+    def write(self, text):
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.FLUSH_SIZE:
+            self._flush_pending()
+
+    def close(self):
+        try:
+            self._flush_pending()
+            if self._compressor is not None:
+                self._buffer += self._compressor.flush()
+            # The last part may be smaller than the minimum, and an empty
+            # document still needs one (empty) part
+            if self._buffer or not self._parts:
+                self._upload_part()
+
+            self.storage.s3.complete_multipart_upload(
+                Bucket=self.storage.bucket_name,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        except Exception:
+            # Uploaded parts are billed until the upload is aborted
+            self.abort()
+            raise
+        self.storage._evict_cache(self.key)
+
+    def abort(self):
+        self.storage.s3.abort_multipart_upload(
+            Bucket=self.storage.bucket_name, Key=self.key, UploadId=self.upload_id
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        payload = "".join(self._pending).encode("utf-8")
+        self._pending = []
+        self._pending_size = 0
+        self.bytes_written += len(payload)
+
+        if self._compressor is not None:
+            payload = self._compressor.compress(payload)
+        self._buffer += payload
+        while len(self._buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        body = bytes(self._buffer[: self.part_size])
+        del self._buffer[: self.part_size]
+        part_number = len(self._parts) + 1
+        response = self.storage.s3.upload_part(
+            Bucket=self.storage.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+
 class S3Storage:
-    def __init__(self, bucket_name, region_name="us-east-1"):
+    def __init__(self, bucket_name, region_name="us-east-1", max_workers=16, client=None, codec="json",
+                 cache_dir=None, offline=False, bucket_validation="lazy"):
         self.bucket_name = bucket_name
         self.region_name = region_name
-        self.s3 = boto3.client("s3", region_name=self.region_name)
-        self.ensure_bucket_exists()
+        self.max_workers = max_workers
+        self.codec = get_codec(codec)
+        # Local read-through cache: objects are revalidated by ETag, and
+        # offline mode serves them from disk without touching S3
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.offline = offline
+        if offline and self.cache_dir is None:
+            raise ValueError("offline mode requires a cache_dir")
+        if bucket_validation not in BUCKET_VALIDATION_MODES:
+            raise ValueError(f"bucket_validation must be one of {BUCKET_VALIDATION_MODES}")
+        self.bucket_validation = "off" if offline else bucket_validation
+        # The connection pool must be at least as large as the thread pool,
+        # otherwise bulk calls queue up waiting for a free connection
+        self.s3 = client or get_s3_client(self.region_name, max_workers)
+        if self.bucket_validation == "eager":
+            self._ensure_bucket()
 
     def ensure_bucket_exists(self):
         try:
@@ -15,19 +297,202 @@ class S3Storage:
         except ClientError:
             self.s3.create_bucket(Bucket=self.bucket_name)
             print(f"Bucket {self.bucket_name} created")
+        with _registry_lock:
+            _validated_buckets.setdefault(self.s3, set()).add(self.bucket_name)
+
+    def _ensure_bucket(self):
+        if self.bucket_validation == "off":
+            return
+        with _registry_lock:
+            if self.bucket_name in _validated_buckets.get(self.s3, ()):
+                return
+        self.ensure_bucket_exists()
 
-    def save_json(self, key, data):
-        json_data = json.dumps(data)
-        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=json_data, ContentType="application/json")
+    def save_json(self, key, data, codec=None):
+        self._put_json(key, data, codec)
         print(f"Saved to {self.bucket_name}/{key}")
 
     def load_json(self, key):
-        response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
-        content = response["Body"].read().decode("utf-8")
-        return json.loads(content)
+        if self.cache_dir is None:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key)
+            return codec_for_response(response).decode(response["Body"].read())
+
+        cached = self._read_cache(key)
+        if self.offline:
+            if cached is None:
+                raise FileNotFoundError(f"{self.bucket_name}/{key} is not in the local cache")
+            payload, meta = cached
+            return codec_for_response(meta).decode(payload)
+
+        conditional = {"IfNoneMatch": cached[1]["ETag"]} if cached else {}
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=key, **conditional)
+        except ClientError as e:
+            if cached and _is_not_modified(e):
+                payload, meta = cached
+                return codec_for_response(meta).decode(payload)
+            raise
+
+        payload = response["Body"].read()
+        self._write_cache(key, payload, response)
+        return codec_for_response(response).decode(payload)
 
     def delete_json(self, key):
         self.s3.delete_object(Bucket=self.bucket_name, Key=key)
+        self._evict_cache(key)
         print(f"Deleted {self.bucket_name}/{key}")
 
+    def open_writer(self, key, codec=None, part_size=DEFAULT_PART_SIZE):
+        """Return a MultipartJSONWriter streaming raw JSON text to key."""
+        return MultipartJSONWriter(self, key, codec or self.codec.name, part_size)
+
+    def save_json_stream(self, key, data, codec=None, part_size=DEFAULT_PART_SIZE):
+        """Serialize data incrementally and upload it with a multipart upload."""
+        with self.open_writer(key, codec, part_size) as writer:
+            for fragment in json.JSONEncoder().iterencode(data):
+                writer.write(fragment)
+        print(f"Streamed {writer.bytes_written:,} bytes to {self.bucket_name}/{key}")
+
+    def save_json_array(self, key, items, codec=None, part_size=DEFAULT_PART_SIZE):
+        """Stream an iterable (e.g. a generator of batch results) as a JSON array."""
+        encoder = json.JSONEncoder()
+        with self.open_writer(key, codec, part_size) as writer:
+            writer.write("[")
+            for idx, item in enumerate(items):
+                if idx:
+                    writer.write(",")
+                for fragment in encoder.iterencode(item):
+                    writer.write(fragment)
+            writer.write("]")
+        print(f"Streamed {writer.bytes_written:,} bytes to {self.bucket_name}/{key}")
+
+    def save_many(self, items):
+        """Save a {key: data} mapping concurrently."""
+        items = dict(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(lambda item: self._put_json(*item), items.items()))
+        print(f"Saved {len(items)} objects to {self.bucket_name}")
+
+    def load_many(self, keys):
+        """Load keys concurrently; returns {key: data}, missing keys are left out."""
+        keys = list(keys)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            loaded = list(pool.map(self._load_if_exists, keys))
+        return {key: data for key, data in zip(keys, loaded) if data is not None}
+
+    def delete_many(self, keys):
+        """Delete keys in batches of 1000; returns the per-key errors reported by S3."""
+        keys = list(keys)
+        batches = [
+            keys[idx : idx + DELETE_BATCH_SIZE]
+            for idx in range(0, len(keys), DELETE_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            responses = list(pool.map(self._delete_batch, batches))
+
+        errors = [error for response in responses for error in response.get("Errors", [])]
+        print(f"Deleted {len(keys) - len(errors)} objects from {self.bucket_name}")
+        return errors
+
+    def list_keys(self, prefix=""):
+        """Yield every key under prefix, following list_objects_v2 pagination."""
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def load_prefix(self, prefix=""):
+        """Load every object under prefix concurrently."""
+        return self.load_many(self.list_keys(prefix))
+
+    def _put_json(self, key, data, codec=None):
+        self._ensure_bucket()
+        codec = get_codec(codec) if codec else self.codec
+        extra = {"ContentEncoding": codec.content_encoding} if codec.content_encoding else {}
+        payload = codec.encode(data)
+        metadata = {CODEC_METADATA_KEY: codec.name}
+        response = self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=payload,
+            ContentType=codec.content_type,
+            Metadata=metadata,
+            **extra,
+        )
+        if self.cache_dir is not None and response.get("ETag"):
+            self._write_cache(key, payload, {"ETag": response["ETag"], "ContentType": codec.content_type,
+                                             "Metadata": metadata, **extra})
+
+    def _load_if_exists(self, key):
+        try:
+            return self.load_json(key)
+        except FileNotFoundError:
+            # Offline and not in the local cache
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def _delete_batch(self, keys):
+        response = self.s3.delete_objects(
+            Bucket=self.bucket_name,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+        for key in keys:
+            self._evict_cache(key)
+        return response
+
+    def _cache_paths(self, key):
+        # Flat, fixed-length file names: a key may be a prefix of another
+        # ("a" and "a/b") or longer than a file name may be
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return (
+            self.cache_dir / self.bucket_name / name,
+            self.cache_dir / ".meta" / self.bucket_name / f"{name}.json",
+        )
+
+    def _read_cache(self, key):
+        object_path, meta_path = self._cache_paths(key)
+        try:
+            return object_path.read_bytes(), json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, key, payload, response):
+        if self.cache_dir is None:
+            return
+        meta = {
+            "ETag": response.get("ETag"),
+            "ContentType": response.get("ContentType"),
+            "ContentEncoding": response.get("ContentEncoding"),
+            "Metadata": response.get("Metadata", {}),
+        }
+        object_path, meta_path = self._cache_paths(key)
+        # Payload first, metadata last: a torn write leaves no ETag pointing at stale bytes
+        _atomic_write(object_path, payload)
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def _evict_cache(self, key):
+        if self.cache_dir is None:
+            return
+        for path in reversed(self._cache_paths(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _is_not_modified(error):
+    return (
+        error.response.get("Error", {}).get("Code") in ("304", "NotModified")
+        or error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304
+    )
+
 
+def _atomic_write(path, payload):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
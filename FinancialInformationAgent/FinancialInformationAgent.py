@@ -1,11 +1,38 @@
+import asyncio
+import copy
 import json
-import boto3
+import os
+import sys
 from datetime import datetime
 import pandas as pd
-from collections import Counter
+from collections import Counter, OrderedDict
+from pathlib import Path
+from urllib.parse import quote
+import threading
 import time
 
-bedrock = boto3.client('bedrock-runtime', region_name='us-west-2')
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+try:
+    from DataManager.manager import S3Storage
+except ImportError:
+    S3Storage = None
+
+from Common.model_client import ModelResponseError, bedrock_model_client
+
+# Client modèle partagé avec les autres agents du processus : pool de connexions,
+# concurrence bornée, reprises, et transport record/replay (TRANSPORT_MODE)
+model_client = bedrock_model_client('us-west-2')
+
+# Version du prompt : à incrémenter dès que le prompt ou le modèle change,
+# pour invalider les analyses déjà en cache
+PROMPT_VERSION = "v2"
+
+# Configuration du cache (surchargeable via les variables d'environnement de la Lambda)
+CACHE_MAX_ENTRIES = int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = int(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", str(24 * 3600)))
+CACHE_BUCKET = os.environ.get("ANALYSIS_CACHE_BUCKET")
+CACHE_PREFIX = os.environ.get("ANALYSIS_CACHE_PREFIX", "analysis-cache")
 
 # Les 11 secteurs GICS du marché boursier
 GICS_SECTORS = {
@@ -55,14 +82,110 @@ GICS_SECTORS = {
     }
 }
 
-def analyze_company_with_claude(company_name):
+class AnalysisCache:
     """
-    Utilise Claude via Bedrock pour analyser une compagnie et identifier son secteur GICS
+    Cache des analyses : LRU en mémoire avec TTL (survit entre les invocations
+    d'un conteneur Lambda chaud), doublé d'un second niveau S3 optionnel
+    partagé entre les conteneurs et les exécutions batch
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS,
+                 bucket_name=CACHE_BUCKET, prefix=CACHE_PREFIX):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._storage = None
+
+    @staticmethod
+    def make_key(company_name):
+        """Clé normalisée : version du prompt + nom de compagnie en minuscules, espaces compactés"""
+        normalized = " ".join(str(company_name).lower().split())
+        return f"{PROMPT_VERSION}/{normalized}"
+
+    def _get_storage(self):
+        # Construit paresseusement pour ne pas pénaliser le démarrage à froid
+        if self._storage is None and self.bucket_name and S3Storage is not None:
+            self._storage = S3Storage(self.bucket_name)
+        return self._storage
+
+    def _s3_key(self, key):
+        return f"{self.prefix}/{quote(key, safe='/')}.json"
+
+    def _is_fresh(self, cached_at):
+        return time.time() - cached_at < self.ttl_seconds
+
+    def get(self, company_name):
+        """
+        Retourne (analyse, niveau) où niveau vaut 'memory' ou 's3',
+        ou (None, None) si la compagnie n'est pas en cache. L'analyse est une
+        copie : l'appelant peut la modifier sans toucher au cache
+        """
+        key = self.make_key(company_name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry['cached_at']):
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(entry['analysis']), 'memory'
+                del self._entries[key]
+
+        storage = self._get_storage()
+        if storage is None:
+            return None, None
+
+        try:
+            entry = storage.load_json(self._s3_key(key))
+        except Exception:
+            return None, None
+
+        if not self._is_fresh(entry.get('cached_at', 0)):
+            return None, None
+
+        self._remember(key, entry)
+        return copy.deepcopy(entry['analysis']), 's3'
+
+    def set(self, company_name, analysis):
+        key = self.make_key(company_name)
+        # Copie : l'appelant garde la main sur son dictionnaire
+        entry = {'cached_at': time.time(), 'analysis': copy.deepcopy(analysis)}
+        self._remember(key, entry)
+
+        storage = self._get_storage()
+        if storage is not None:
+            try:
+                storage.save_json(self._s3_key(key), entry)
+            except Exception as e:
+                print(f"Cache S3 indisponible: {str(e)}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Instance au niveau du module : réutilisée tant que le conteneur Lambda reste chaud
+analysis_cache = AnalysisCache()
+
+
+# Classification GICS + listes de filiales/fournisseurs : tâche de triage,
+# un petit modèle suffit (surchargeable via FIA_MODEL_ID)
+MODEL_ID = os.environ.get("FIA_MODEL_ID", 'anthropic.claude-3-haiku-20240307-v1:0')
+
+
+def build_company_prompt(company_name):
+    """
+    Construit le prompt d'analyse d'une compagnie
     """
     
     sectors_list = "\n".join([f"- {sector}" for sector in GICS_SECTORS])
     
-    prompt = f"""Tu es un analyste financier expert. Analyse l'entreprise {company_name} et fournis les informations suivantes au format JSON.
+    return f"""Tu es un analyste financier expert. Analyse l'entreprise {company_name} et fournis les informations suivantes au format JSON.
 
 IMPORTANT: Le secteur doit être UN SEUL des 11 secteurs GICS suivants (choisis le plus approprié):
 {sectors_list}
@@ -80,80 +203,300 @@ Format de réponse (JSON uniquement):
 
 Fournis uniquement le JSON, sans texte additionnel. Le champ gics_sector doit être EXACTEMENT un des 11 secteurs listés ci-dessus."""
 
+
+def build_request_body(company_name):
+    """
+    Corps de requête Bedrock du chemin streaming (format Messages d'Anthropic)
+    """
+    return json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 1000,
+        "temperature": 0.1,
+        "messages": [
+            {
+                "role": "user",
+                "content": build_company_prompt(company_name)
+            }
+        ]
+    })
+
+
+def normalize_sector(sector):
+    """
+    Ramène un secteur libre à l'un des 11 secteurs GICS (ou 'Unclassified')
+    """
+    if sector in GICS_SECTORS:
+        return sector
+    
+    for gics_sector in GICS_SECTORS:
+        if gics_sector.lower() in sector.lower() or sector.lower() in gics_sector.lower():
+            return gics_sector
+    
+    return 'Unclassified'
+
+
+def normalize_field(name, value):
+    """
+    Normalise un champ de l'analyse (secteur, capitalisation, listes)
+    """
+    if name == 'gics_sector':
+        return normalize_sector(value if isinstance(value, str) else 'Unknown')
+    
+    if name == 'marketCap' and isinstance(value, str):
+        return value.replace('$', '').replace(',', '').strip()
+    
+    if name in ('subsidiaries', 'suppliers') and isinstance(value, str):
+        return [s.strip() for s in value.split(',') if s.strip()]
+    
+    return value
+
+
+def normalize_analysis(analysis):
+    """
+    Normalise l'analyse complète retournée par Claude
+    """
+    analysis['gics_sector'] = analysis.get('gics_sector', 'Unknown')
+    analysis.setdefault('marketCap', 'N/A')
+    analysis.setdefault('subsidiaries', [])
+    analysis.setdefault('suppliers', [])
+    
+    for name in ('gics_sector', 'marketCap', 'subsidiaries', 'suppliers'):
+        analysis[name] = normalize_field(name, analysis[name])
+    
+    return analysis
+
+
+def analyze_company_with_claude(company_name):
+    """
+    Utilise Claude via Bedrock pour analyser une compagnie et identifier son secteur GICS
+    """
+    return asyncio.run(analyze_company_async(company_name))
+
+
+async def analyze_company_async(company_name):
+    """
+    Variante asynchrone de analyze_company_with_claude (étape de classification
+    du pipeline orchestré), même format de retour
+    """
+
     try:
-        response = bedrock.invoke_model(
-            modelId='anthropic.claude-3-sonnet-20240229-v1:0',
-            contentType='application/json',
-            accept='application/json',
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "temperature": 0.1,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
+        analysis = await model_client.complete_json(
+            [{"role": "user", "content": build_company_prompt(company_name)}],
+            model=MODEL_ID,
+            temperature=0.1,
+            max_tokens=1000
         )
         
-        response_body = json.loads(response['body'].read())
-        claude_response = response_body['content'][0]['text']
-        
-        start_idx = claude_response.find('{')
-        end_idx = claude_response.rfind('}') + 1
+        return {
+            'success': True,
+            'analysis': normalize_analysis(analysis)
+        }
+    
+    except ModelResponseError as e:
+        return {
+            'success': False,
+            'error': 'Format de réponse invalide',
+            'raw_response': e.text
+        }
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+# ============================================================================
+# STREAMING : ANALYSE INTERACTIVE
+# ============================================================================
+
+class IncrementalJSONParser:
+    """
+    Parseur JSON incrémental : reçoit le texte du modèle morceau par morceau et
+    retourne chaque champ de premier niveau de l'objet dès que sa valeur est complète
+    """
+
+    def __init__(self):
+        self.result = {}
+        self.done = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = 'key'
+        self._key = None
+        self._key_chars = []
+        self._value_chars = []
+
+    def feed(self, text):
+        """
+        Ajoute un morceau de texte et retourne la liste des (champ, valeur) complétés
+        """
+        completed = []
         
-        if start_idx != -1 and end_idx > start_idx:
-            analysis = json.loads(claude_response[start_idx:end_idx])
+        for char in text:
+            if self.done:
+                break
             
-            # Normaliser le secteur pour matcher les 11 secteurs GICS
-            sector = analysis.get('gics_sector', 'Unknown')
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
             
-            # Vérifier si le secteur est valide
-            if sector not in GICS_SECTORS:
-                for gics_sector in GICS_SECTORS:
-                    if gics_sector.lower() in sector.lower() or sector.lower() in gics_sector.lower():
-                        sector = gics_sector
-                        break
-                else:
-                    sector = 'Unclassified'
+            if self._in_string:
+                self._append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == 'value':
+                        self._emit(completed)
+                continue
             
-            analysis['gics_sector'] = sector
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == 'key':
+                    self._key_chars = []
+                self._append(char)
+            elif char == ':' and self._depth == 1 and self._state == 'key':
+                self._key = json.loads(''.join(self._key_chars))
+                self._value_chars = []
+                self._state = 'value'
+            elif char in '{[':
+                self._append(char)
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._state == 'value':
+                        self._emit(completed)
+                    self.done = True
+                else:
+                    self._append(char)
+                    if self._depth == 1 and self._state == 'value':
+                        self._emit(completed)
+            elif char == ',' and self._depth == 1:
+                if self._state == 'value':
+                    self._emit(completed)
+                self._state = 'key'
+            else:
+                self._append(char)
+        
+        return completed
 
-            market_cap = analysis.get('marketCap', 'N/A')
-            if isinstance(market_cap, str):
-                market_cap = market_cap.replace('$', '').replace(',', '').strip()
-                analysis['marketCap'] = market_cap
+    def _append(self, char):
+        if self._depth == 1 and self._state == 'key':
+            self._key_chars.append(char)
+        elif self._state == 'value':
+            self._value_chars.append(char)
 
-            subsidiaries = analysis.get('subsidiaries', [])
-            suppliers = analysis.get('suppliers', [])
+    def _emit(self, completed):
+        raw_value = ''.join(self._value_chars).strip()
+        self._state = 'after_value'
+        
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            return
+        
+        self.result[self._key] = value
+        completed.append((self._key, value))
 
-            if isinstance(subsidiaries, str):
-                subsidiaries = [s.strip() for s in subsidiaries.split(',') if s.strip()]
 
-            if isinstance(suppliers, str):
-                suppliers = [s.strip() for s in suppliers.split(',') if s.strip()]
+class FakeResponseStream:
+    """
+    Imite la réponse de bedrock.invoke_model_with_response_stream à partir
+    d'un texte découpé en morceaux (tests et développement hors ligne)
+    """
 
-            analysis['subsidiaries'] = subsidiaries
-            analysis['suppliers'] = suppliers
-            
-            return {
-                'success': True,
-                'analysis': analysis
+    def __init__(self, text, chunk_size=16, delay=0.0):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def __iter__(self):
+        for idx in range(0, len(self.text), self.chunk_size):
+            if self.delay:
+                time.sleep(self.delay)
+            event = {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": self.text[idx:idx + self.chunk_size]}
             }
+            yield {'chunk': {'bytes': json.dumps(event).encode('utf-8')}}
+        
+        yield {'chunk': {'bytes': json.dumps({"type": "message_stop"}).encode('utf-8')}}
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        return {'body': iter(self)}
+
+
+def iter_text_deltas(event_stream):
+    """
+    Extrait les morceaux de texte d'un flux d'événements Bedrock
+    """
+    for event in event_stream:
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+        
+        payload = json.loads(chunk['bytes'])
+        if payload.get('type') == 'content_block_delta':
+            text = payload.get('delta', {}).get('text')
+            if text:
+                yield text
+
+
+def analyze_company_with_claude_stream(company_name, client=None):
+    """
+    Variante streaming de analyze_company_with_claude pour le chemin interactif.
+    Génère un événement {'type': 'field', ...} dès qu'un champ (gics_sector,
+    industry, ...) est complet, puis un événement final {'type': 'complete', ...}
+    au même format que la version bloquante
+    """
+    
+    cached_analysis, cache_tier = analysis_cache.get(company_name)
+    if cached_analysis is not None:
+        for name, value in cached_analysis.items():
+            yield {'type': 'field', 'name': name, 'value': value}
+        yield {'type': 'complete', 'success': True, 'analysis': cached_analysis, 'cache': cache_tier}
+        return
+    
+    # Le streaming passe directement par le client Bedrock partagé
+    client = client or model_client.client
+    parser = IncrementalJSONParser()
+    raw_response = []
+    
+    try:
+        response = client.invoke_model_with_response_stream(
+            modelId=MODEL_ID,
+            contentType='application/json',
+            accept='application/json',
+            body=build_request_body(company_name)
+        )
+        
+        for text in iter_text_deltas(response['body']):
+            raw_response.append(text)
+            for name, value in parser.feed(text):
+                yield {'type': 'field', 'name': name, 'value': normalize_field(name, value)}
+        
+        if parser.done:
+            analysis = normalize_analysis(parser.result)
+            analysis_cache.set(company_name, analysis)
+            yield {'type': 'complete', 'success': True, 'analysis': analysis}
         else:
-            return {
+            yield {
+                'type': 'complete',
                 'success': False,
                 'error': 'Format de réponse invalide',
-                'raw_response': claude_response
+                'raw_response': ''.join(raw_response)
             }
-            
+    
     except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+        yield {'type': 'complete', 'success': False, 'error': str(e)}
 
 
 def lambda_handler(event, context):
@@ -181,7 +524,15 @@ def lambda_handler(event, context):
         
         print(f"Analyse de la compagnie: {company}")
         
-        analysis_result = analyze_company_with_claude(company)
+        cached_analysis, cache_tier = analysis_cache.get(company)
+        
+        if cached_analysis is not None:
+            print(f"Cache {cache_tier}: {company}")
+            analysis_result = {'success': True, 'analysis': cached_analysis}
+        else:
+            analysis_result = analyze_company_with_claude(company)
+            if analysis_result['success']:
+                analysis_cache.set(company, analysis_result['analysis'])
         
         if analysis_result['success']:
             result = {
@@ -205,7 +556,9 @@ def lambda_handler(event, context):
             'statusCode': status_code,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                'X-Cache': 'HIT' if cache_tier else 'MISS',
+                'X-Cache-Tier': cache_tier or 'none'
             },
             'body': json.dumps(result, ensure_ascii=False, indent=2)
         }
@@ -308,7 +661,9 @@ def analyze_sp500_detailed(excel_file, company_column='Company', max_companies=N
                 errors.append({'company': company, 'error': error_msg})
                 print(f"❌ Erreur: {error_msg}")
             
-            if idx < total_companies:
+            # Pas besoin de ménager Bedrock si la réponse vient du cache
+            cache_hit = result.get('headers', {}).get('X-Cache') == 'HIT'
+            if idx < total_companies and not cache_hit:
                 time.sleep(0.5)
                 
         except Exception as e:
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import FinancialInformationAgent as fia
+from FinancialInformationAgent import FakeResponseStream, IncrementalJSONParser
+
+# Réponse du modèle : texte avant l'objet, guillemets échappés, accolades et
+# crochets dans les chaînes, valeurs imbriquées et nombre en dernier champ
+ANALYSIS = {
+    "gics_sector": "Information Technology",
+    "industry": "Semiconductors \"fabless\" {design}",
+    "marketCap": "$1,234,000,000",
+    "subsidiaries": ["Alpha [EU]", "Beta, Inc."],
+    "suppliers": [{"name": "TSMC", "countries": ["Taiwan", "Japan"]}],
+    "employees": 26196,
+}
+RESPONSE = "Voici l'analyse :\n" + json.dumps(ANALYSIS, ensure_ascii=False)
+
+
+class CountingStream(FakeResponseStream):
+    """FakeResponseStream qui compte les événements déjà envoyés"""
+
+    def __init__(self, text, chunk_size=16):
+        super().__init__(text, chunk_size)
+        self.sent = 0
+        self.total = len(range(0, len(text), chunk_size)) + 1
+
+    def __iter__(self):
+        for event in super().__iter__():
+            self.sent += 1
+            yield event
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(fia, "analysis_cache", fia.AnalysisCache(bucket_name=None))
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 40))
+def test_parser_any_split(chunk_size):
+    # Toutes les tailles de morceaux : coupures au milieu des clés, des
+    # échappements, des nombres et des valeurs imbriquées
+    parser = IncrementalJSONParser()
+    completed = []
+    for idx in range(0, len(RESPONSE), chunk_size):
+        completed.extend(parser.feed(RESPONSE[idx:idx + chunk_size]))
+
+    assert parser.done
+    assert parser.result == ANALYSIS
+    assert [name for name, _ in completed] == list(ANALYSIS)
+
+
+def test_stream_emits_fields_early():
+    stream = CountingStream(RESPONSE, chunk_size=8)
+    events = fia.analyze_company_with_claude_stream("Acme", client=stream)
+
+    first = next(events)
+    assert first == {"type": "field", "name": "gics_sector", "value": "Information Technology"}
+    # Le premier champ arrive bien avant la fin du flux
+    assert stream.sent < stream.total / 4
+
+    rest = list(events)
+    fields = {event["name"]: event["value"] for event in [first] + rest if event["type"] == "field"}
+    assert fields["industry"] == 'Semiconductors "fabless" {design}'
+    assert fields["marketCap"] == "1234000000"
+    assert fields["suppliers"] == [{"name": "TSMC", "countries": ["Taiwan", "Japan"]}]
+
+    complete = rest[-1]
+    assert complete["type"] == "complete" and complete["success"]
+    assert complete["analysis"] == fia.normalize_analysis(json.loads(json.dumps(ANALYSIS)))
+    assert fia.analysis_cache.get("Acme")[0] == complete["analysis"]
+
+
+def test_stream_split_mid_token():
+    events = list(fia.analyze_company_with_claude_stream("Acme", client=FakeResponseStream(RESPONSE, chunk_size=3)))
+
+    assert [event["name"] for event in events[:-1]] == list(ANALYSIS)
+    assert events[-1]["success"]
+    assert events[-1]["analysis"]["subsidiaries"] == ["Alpha [EU]", "Beta, Inc."]
+
+
+def test_stream_truncated():
+    truncated = RESPONSE[:RESPONSE.index('"suppliers"') + 20]
+    events = list(fia.analyze_company_with_claude_stream("Acme", client=FakeResponseStream(truncated)))
+
+    complete = events[-1]
+    assert not complete["success"]
+    assert complete["raw_response"] == truncated
+    assert fia.analysis_cache.get("Acme")[0] is None
+
+
+def test_cache_returns_copies():
+    analysis = {"gics_sector": "Energy", "subsidiaries": ["Alpha"]}
+    fia.analysis_cache.set("Acme", analysis)
+    analysis["subsidiaries"].append("Beta")
+
+    cached, tier = fia.analysis_cache.get("Acme")
+    assert tier == "memory" and cached["subsidiaries"] == ["Alpha"]
+    cached["subsidiaries"].append("Gamma")
+    assert fia.analysis_cache.get("Acme")[0]["subsidiaries"] == ["Alpha"]
@@ -1,17 +1,16 @@
+import json
 import pandas as pd
 import os
-import boto3
-from markitdown import MarkItDown
+import sys
 from jsonschema import validate, ValidationError
-import json
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from bs4 import BeautifulSoup
-from bs4 import XMLParsedAsHTMLWarning
-import warnings
-from botocore.config import Config
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from Common.conversion import conversion_stage
+from Common.model_client import ModelResponseError, bedrock_model_client
 
-warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
 
 class LawReaderAgent:
     schema = {
@@ -46,17 +45,95 @@ class LawReaderAgent:
         "required": ["regionOfEffect", "sectors"]
     }
 
-    config = Config(read_timeout=300)
+    instructions = """You analyze a document chunk by chunk.
+Output ONLY a JSON in the following format, relating to the effects of the laws passed in regards to specific sectors and countries.
+
+These are the 11 sectors we will use:
+'Information Technology, Communication Services, Healthcare, Financials, Consumer Discretionary, Industrials, Energy, Materials, Consumer Staples, Utilities, Real Estate'
+
+{
+  "regionOfEffect": "region",
+  "sectors": {
+    "Information Technology": {
+      "positiveEffects": [
+        // Each element should mention a law/effect that would have a positive outcome (limit 20 words)
+        // LEAVE EACH LIST EMPTY IF THE REGULATIONS DON'T APPLY TO THE SECTOR,
+      ],
+      "negativeEffects": [
+        // Each element should mention a law/effect that would have a negative outcome (limit 20 words)
+      ],
+      "timeline": [
+        // Up to 10 (ONLY RELEVANT DATES) key dates that tell us when the effects take place (Example : XXXX-XX-XX : Negative effect #3 takes places
+        // If the effects take place based on a single law, you can have something like     "2021-11-28: Transposition deadline","2022-05-28: Application date"
+      ]
+    },
+    "Communication Services": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Healthcare": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Financials": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Consumer Discretionary": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Industrials": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Energy": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Materials": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Consumer Staples": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Utilities": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    },
+    "Real Estate": {
+      "positiveEffects": [],
+      "negativeEffects": [],
+      "timeline": []
+    }
+  }
+}
+
+With each chunk you get your previous cumulative output (may be empty).
+You can remove, add, or edit information from the previous output based on redundancy and relevance."""
 
     def __init__(self, directory="directives/", model_id="global.anthropic.claude-sonnet-4-5-20250929-v1:0"):
         self.directory = directory
         self.model_id = model_id
         self.files = [directory + file for file in os.listdir(self.directory)]
-        self.markdown = MarkItDown(enable_plugins=False)
-        self.client = boto3.client("bedrock-runtime", config=LawReaderAgent.config)
+        # Shared with the other agents of the process (Common.model_client)
+        self.model_client = bedrock_model_client()
     
     def complete_summary(self):
         summaries_list = []
+        # Convert the next directives while the model reads the current one
+        conversion_stage.prefetch("law_text", self.files)
         for file in self.files:
             summaries_list.append(self.single_law_summary(file))
         return summaries_list
@@ -65,17 +142,14 @@ class LawReaderAgent:
         text = self.retrieve_text_content(file)
         chunked_text = self.chunk_text(text)
         response = self.summarize_text_content(chunked_text)
-        parsed_response = self.parse_json_from_response(response)
-        if self.is_valid_schema(parsed_response):
-            return parsed_response
+        if response is not None and self.is_valid_schema(response):
+            return json.dumps(response.json(), ensure_ascii=False)
         else:
             print(f"Invalid file format : {file}")
 
     
     def retrieve_text_content(self, file):
-        html = str(self.markdown.convert(file))
-        text = BeautifulSoup(html, "html.parser").get_text(separator=" ", strip=True)
-        return text
+        return conversion_stage.read_text("law_text", file)
     
     def chunk_text(self, text):
         text_splitter = RecursiveCharacterTextSplitter(
@@ -86,121 +160,35 @@ class LawReaderAgent:
     
     def summarize_text_content(self, text_chunks):
         cumulative_output = ""
+        response = None
         for i, chunk in enumerate(text_chunks):
             print(f"Processing chunk {i+1}")
-            response = self.client.converse(
-            modelId=self.model_id,
-            messages=[
+            response = self.model_client.complete_sync(
+            [
+                {"role": "system", "content": LawReaderAgent.instructions},
                 {
                     "role": "user",
-                    "content": [{"text": f"""
-                                Analyze the following document (chunk {i+1}/{len(text_chunks)}): {chunk}.
-                                Output ONLY a JSON in the following format, relating to the effects of the laws passed in regards to specific sectors and countries.
-
-                                These are the 11 sectors we will use:
-                                'Information Technology, Communication Services, Healthcare, Financials, Consumer Discretionary, Industrials, Energy, Materials, Consumer Staples, Utilities, Real Estate'
+                    "content": f"""Analyze the following document (chunk {i+1}/{len(text_chunks)}): {chunk}.
 
-                                {{
-                                "regionOfEffect": "region",
-                                "sectors": {{
-                                    "Information Technology": {{
-                                    "positiveEffects": [
-                                        // Each element should mention a law/effect that would have a positive outcome (limit 20 words)
-                                        // LEAVE EACH LIST EMPTY IF THE REGULATIONS DON'T APPLY TO THE SECTOR,
-                                    ],
-                                    "negativeEffects": [
-                                        // Each element should mention a law/effect that would have a negative outcome (limit 20 words)
-                                    ],
-                                    "timeline": [
-                                        // Up to 10 (ONLY RELEVANT DATES) key dates that tell us when the effects take place (Example : XXXX-XX-XX : Negative effect #3 takes places
-                                        // If the effects take place based on a single law, you can have something like     "2021-11-28: Transposition deadline","2022-05-28: Application date"
-                                    ]
-                                    }},
-                                    "Communication Services": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Healthcare": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Financials": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Consumer Discretionary": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Industrials": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Energy": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Materials": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Consumer Staples": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Utilities": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }},
-                                    "Real Estate": {{
-                                    "positiveEffects": [],
-                                    "negativeEffects": [],
-                                    "timeline": []
-                                    }}
-                                }}
-                                }}
-
-                                Consider your previous cumulative output: {cumulative_output} (may be empty).
-                                You can remove, add, or edit information from the previous output based on redundancy and relevance.
-                                """
-                                }]
+Consider your previous cumulative output: {cumulative_output} (may be empty)."""
                 }
             ],
-            inferenceConfig={
-                "temperature": 0.5,
-            })
-
-            chunk_output = response["output"]["message"]["content"][0]["text"]
-            cumulative_output = chunk_output
-
-        return cumulative_output
-        
-    
-    def parse_json_from_response(self, text) -> str:
-    
-        start = text.find('{')
-        end = text.rfind('}')
+            model=self.model_id,
+            temperature=0.5,
+            # The instructions (~600 tokens) are under Sonnet's 1,024-token
+            # prompt caching minimum: a cache point would never be used
+            cache_system=False)
 
-        if start == -1 or end == -1 or start >= end:
-            raise ValueError("No valid JSON object found in text.")
+            cumulative_output = response.text
 
-        return text[start:end + 1]
+        return response
     
-    def is_valid_schema(self, output: str):
+    def is_valid_schema(self, response):
         try:
-            data = json.loads(output)
+            data = response.json()
             validate(instance=data, schema=LawReaderAgent.schema)
             return True
-        except json.JSONDecodeError:
+        except ModelResponseError:
             print("Model did not return valid JSON.")
             return False
         except ValidationError as e:
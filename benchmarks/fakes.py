@@ -0,0 +1,233 @@
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from Common.telemetry import tracer
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+# Bill chunks packed into one prompt (BillPromptBuilder.chunk_block)
+CHUNK_BLOCK = re.compile(r'<chunk id="(\d+)">\n(.*?)\n</chunk>', re.DOTALL)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for the fake usage blocks"""
+    return max(1, len(text) // 4)
+
+
+class Latency:
+    """Simulated service latency: mean seconds +/- jitter (uniform), seeded so
+    two runs with the same settings sleep the same total"""
+
+    def __init__(self, mean=0.0, jitter=0.0, seed=0):
+        self.mean = mean
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.mean <= 0:
+            return
+        with self._lock:
+            delay = self.mean + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, delay))
+
+
+class RecordedResponses:
+    """Model/search responses recorded in fixtures/responses.json.
+
+    Each section has a list of rules ({"match": substring, "content": ...})
+    tried in order against the request text, and a default.
+    """
+
+    def __init__(self, path=FIXTURES_DIR / "responses.json"):
+        with open(path, "r", encoding="utf-8") as f:
+            self.data = json.load(f)
+
+    @staticmethod
+    def _first_match(section, text):
+        for rule in section.get("rules", []):
+            if rule["match"] in text:
+                return rule["content"]
+        return None
+
+    def chat(self, system_text, user_text):
+        for kind, section in self.data["chat"].items():
+            if section["system_marker"] in system_text:
+                content = self._first_match(section, user_text)
+                return kind, content if content is not None else section["default"]
+        raise KeyError(f"No recorded chat responses for system prompt: {system_text[:60]!r}")
+
+    def has_findings(self, text):
+        """Whether any extraction section has a non-empty recorded answer for
+        text: the triage model's "relevant" verdict"""
+        for kind, section in self.data["chat"].items():
+            content = self._first_match(section, text)
+            if kind != "triage" and content and any(content.values()):
+                return True
+        return False
+
+    def company(self, company_name, prompt):
+        section = self.data["invoke_model"]
+        analysis = dict(section["default"])
+        analysis.update(self._first_match(section, company_name) or {})
+        text = json.dumps(analysis, ensure_ascii=False)
+        return text.replace("{company}", company_name)
+
+    def law_summary(self, prompt):
+        return json.dumps(self.data["converse"]["default"], ensure_ascii=False)
+
+    def search_answer(self, query):
+        company = query.split(" suppliers")[0]
+        return self.data["tavily"]["answer"].replace("{company}", company)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, messages, **kwargs):
+        system_text = "".join(m["content"] for m in messages if m["role"] == "system")
+        user_text = "".join(m["content"] for m in messages if m["role"] != "system")
+
+        with tracer.span("model", kind="chat"):
+            self.owner.latency.wait()
+            blocks = CHUNK_BLOCK.findall(user_text)
+            if blocks and "Triage" in system_text:
+                kind = "triage"
+                content = {
+                    "relevant": [
+                        int(chunk_id)
+                        for chunk_id, chunk_text in blocks
+                        if self.owner.responses.has_findings(chunk_text)
+                    ]
+                }
+            elif blocks:
+                # Packed bill prompt: every chunk is answered as if it were sent alone
+                impacts = []
+                for chunk_id, chunk_text in blocks:
+                    kind, chunk_content = self.owner.responses.chat(system_text, chunk_text)
+                    impacts.extend(dict(impact, chunk_id=int(chunk_id)) for impact in chunk_content["impacts"])
+                content = {"impacts": impacts}
+            else:
+                kind, content = self.owner.responses.chat(system_text, user_text)
+            self.owner.calls[kind] += 1
+
+        text = json.dumps(content)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(
+                prompt_tokens=estimate_tokens(system_text + user_text),
+                completion_tokens=estimate_tokens(text),
+                prompt_tokens_details=None,
+            ),
+        )
+
+
+class FakeOpenAIClient:
+    """Replays recorded chat completions (openai.OpenAI stand-in for main.client)"""
+
+    def __init__(self, responses, latency=None):
+        self.responses = responses
+        self.latency = latency or Latency()
+        self.calls = {kind: 0 for kind in responses.data["chat"]}
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+
+class FakeTavilyClient:
+    def __init__(self, responses, latency=None):
+        self.responses = responses
+        self.latency = latency or Latency()
+        self.calls = 0
+
+    def search(self, query, **kwargs):
+        with tracer.span("search"):
+            self.latency.wait()
+            self.calls += 1
+        return {"query": query, "answer": self.responses.search_answer(query), "results": []}
+
+
+class FakeDownloader:
+    """sec_downloader.Downloader stand-in serving fixtures/filings/<TICKER>.html.
+
+    Tickers like "ACME-3" (benchmark copies of a fixture company) map to ACME.
+    """
+
+    latency = Latency()
+
+    def __init__(self, company_name=None, email_address=None):
+        pass
+
+    def get_filing_html(self, ticker, form="10-K"):
+        with tracer.span("filing_download"):
+            FakeDownloader.latency.wait()
+            path = FIXTURES_DIR / "filings" / f"{ticker.split('-')[0]}.html"
+            return path.read_bytes()
+
+
+class FakeBedrockClient:
+    """bedrock-runtime stand-in for converse: company analyses
+    (FinancialInformationAgent) and law summaries (LawReaderAgent).
+
+    converse honours a cachePoint in the system blocks like Bedrock does: the
+    prefix before it is written to the cache on first use and read after that,
+    if it has at least min_cache_tokens.
+    """
+
+    def __init__(self, responses, latency=None, min_cache_tokens=1024):
+        self.responses = responses
+        self.latency = latency or Latency()
+        self.min_cache_tokens = min_cache_tokens
+        self.calls = {"company": 0, "law_summary": 0}
+        self._prompt_cache = set()
+
+    def _cache_usage(self, system):
+        """(cache read, cache write) tokens of the system prefix"""
+        prefix = []
+        for block in system:
+            if "cachePoint" in block:
+                break
+            prefix.append(block.get("text", ""))
+        else:
+            return 0, 0
+
+        prefix_text = "".join(prefix)
+        tokens = estimate_tokens(prefix_text)
+        if tokens < self.min_cache_tokens:
+            return 0, 0
+        if prefix_text in self._prompt_cache:
+            return tokens, 0
+        self._prompt_cache.add(prefix_text)
+        return 0, tokens
+
+    def converse(self, modelId, messages, system=(), **kwargs):
+        system_text = "".join(block.get("text", "") for block in system)
+        prompt = "".join(block["text"] for m in messages for block in m["content"])
+
+        if "Analyse l'entreprise " in prompt:
+            # build_company_prompt: "... Analyse l'entreprise <name> et fournis ..."
+            kind = "company"
+            company_name = prompt.split("Analyse l'entreprise ", 1)[-1].split(" et fournis", 1)[0]
+            text = self.responses.company(company_name, prompt)
+        else:
+            kind = "law_summary"
+            text = self.responses.law_summary(prompt)
+        cache_read, cache_write = self._cache_usage(system)
+        response = {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "usage": {
+                # Like Bedrock, inputTokens leaves out the cached prefix
+                "inputTokens": estimate_tokens(system_text + prompt) - cache_read - cache_write,
+                "outputTokens": estimate_tokens(text),
+                "cacheReadInputTokens": cache_read,
+                "cacheWriteInputTokens": cache_write,
+            },
+        }
+
+        with tracer.span("model", kind="converse"):
+            self.latency.wait()
+            self.calls[kind] += 1
+        return response
@@ -0,0 +1,453 @@
+"""Offline benchmarks for the analysis pipelines.
+
+Runs analyze_stock (AgentOrchestrator), LawReaderAgent.single_law_summary and
+analyze_sp500_detailed (FinancialInformationAgent) against the recorded
+fixtures in benchmarks/fixtures, with fake Bedrock / OpenAI / Tavily / SEC
+clients that sleep a configurable latency instead of calling the network.
+sec_parsing / sec_parsing_legacy time the 10-K HTML -> markdown conversion
+alone, on fixture filings inflated to 10-K size (--filing-copies). pipeline
+runs the same companies through AgentOrchestrator/pipeline.py, every agent as
+a concurrent stage, exporting to a local S3 stand-in.
+
+    python benchmarks/run_benchmarks.py --companies 8 --llm-latency 0.05
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+for component in ("AgentOrchestrator", "LawReaderAgent", "FinancialInformationAgent"):
+    sys.path.append(str(REPO_ROOT / component))
+
+# The agents build their clients at import time; none of these are used since
+# every client is replaced by a fake below, but they must be set
+os.environ.setdefault("BEDROCK_API_KEY", "offline")
+os.environ.setdefault("BEDROCK_ENDPOINT", "http://127.0.0.1:9/v1")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-offline")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import main as orchestrator
+import pipeline
+import FinancialInformationAgent as fia
+from agent import LawReaderAgent
+
+from Common.conversion import CONVERTERS
+from Common.model_client import BedrockModelClient, OpenAIModelClient
+from Common.telemetry import tracer
+from DataManager.local_s3 import FilesystemS3Client
+from DataManager.manager import S3Storage
+from benchmarks.fakes import (
+    FIXTURES_DIR,
+    FakeBedrockClient,
+    FakeDownloader,
+    FakeOpenAIClient,
+    FakeTavilyClient,
+    Latency,
+    RecordedResponses,
+)
+
+SCENARIOS = (
+    "analyze_stock",
+    "law_summary",
+    "fia_detailed_cold",
+    "fia_detailed_warm",
+    "sec_parsing",
+    "sec_parsing_legacy",
+    "pipeline",
+)
+# Tiers ModelClient routes and records calls under (tier= / default_tier)
+MODEL_TIERS = ("triage", "extraction")
+
+
+# ===== MEASUREMENT =====
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def step_latencies():
+    """{span name: count and p50/p95/p99 wall ms} from the tracer"""
+    by_name = {}
+    for span in tracer.spans:
+        label = f"{span.name}:{span.attrs['kind']}" if span.name == "model" else span.name
+        by_name.setdefault(label, []).append(span.wall_ms)
+
+    steps = {}
+    for name, walls in sorted(by_name.items()):
+        walls.sort()
+        steps[name] = {
+            "count": len(walls),
+            "p50_ms": round(percentile(walls, 0.50), 2),
+            "p95_ms": round(percentile(walls, 0.95), 2),
+            "p99_ms": round(percentile(walls, 0.99), 2),
+        }
+    return steps
+
+
+def run_scenario(name, func, track_memory=True, verbose=False):
+    """Run func() -> (items processed, extra dict) and measure it"""
+    tracer.reset()
+    if track_memory:
+        tracemalloc.start()
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        items, extra = func()
+    wall_s = time.perf_counter() - start
+
+    peak_mb = None
+    if track_memory:
+        peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+        tracemalloc.stop()
+
+    # Root spans already include their children's tokens
+    roots = [span for span in tracer.spans if span.parent_id is None and span.name != "model"]
+    models = [span for span in tracer.spans if span.name == "model"]
+
+    return {
+        "scenario": name,
+        "items": items,
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(items / wall_s, 3) if wall_s else 0.0,
+        "peak_memory_mb": peak_mb,
+        "model_calls": len(models),
+        "prompt_tokens": sum(span.counters["prompt_tokens"] for span in roots),
+        "completion_tokens": sum(span.counters["completion_tokens"] for span in roots),
+        "cached_tokens": sum(span.counters["cached_tokens"] for span in roots),
+        "cache_write_tokens": sum(span.counters["cache_write_tokens"] for span in roots),
+        "rejections": sum(span.counters["rejections"] for span in roots),
+        "prompted_chunks": sum(span.counters["prompted_chunks"] for span in roots),
+        "triage_positive": sum(span.counters["triage_positive"] for span in roots),
+        "triage_negative": sum(span.counters["triage_negative"] for span in roots),
+        "tiers": {
+            tier: {
+                name: sum(span.counters[f"{tier}_{name}"] for span in roots)
+                for name in ("llm_calls", "prompt_tokens", "completion_tokens")
+            }
+            for tier in MODEL_TIERS
+        },
+        "steps": step_latencies(),
+        **extra,
+    }
+
+
+# ===== SCENARIOS =====
+
+
+def benchmark_companies(count):
+    """count companies cycled from fixtures/companies.csv; copies get a -N ticker suffix"""
+    with open(FIXTURES_DIR / "companies.csv", "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    companies = []
+    for idx in range(count):
+        row = dict(rows[idx % len(rows)])
+        copy_num = idx // len(rows)
+        if copy_num:
+            row["Ticker"] = f"{row['Ticker']}-{copy_num + 1}"
+            row["Company"] = f"{row['Company']} #{copy_num + 1}"
+        companies.append(row)
+    return companies
+
+
+def bench_analyze_stock(companies, workdir, responses, args):
+    client = FakeOpenAIClient(responses, Latency(args.llm_latency, args.jitter, seed=1))
+    orchestrator.model_client = OpenAIModelClient(client, default_model=orchestrator.MODEL_ID, default_tier="extraction")
+    orchestrator.tavily_client = FakeTavilyClient(responses, Latency(args.search_latency, args.jitter, seed=2))
+    orchestrator.sec_client = FakeDownloader()
+    FakeDownloader.latency = Latency(args.sec_latency, args.jitter, seed=3)
+
+    for company in companies:
+        orchestrator.analyze_stock(
+            company["Ticker"],
+            company["Company"],
+            company["Sector"],
+            company["Industry"],
+            output_folder=str(workdir / "company_analyses"),
+            bills_folder=str(FIXTURES_DIR / "bills"),
+            state_folder=str(workdir / "company_state"),
+        )
+
+    return len(companies), {"calls_by_kind": client.calls}
+
+
+def bench_law_summary(responses, args):
+    agent = LawReaderAgent(directory=str(FIXTURES_DIR / "bills") + "/")
+    agent.model_client = BedrockModelClient(
+        FakeBedrockClient(
+            responses, Latency(args.llm_latency, args.jitter, seed=4), min_cache_tokens=args.min_cache_tokens
+        )
+    )
+
+    valid = 0
+    for file in sorted(agent.files):
+        with tracer.span("law_summary", bill=Path(file).name):
+            if agent.single_law_summary(file):
+                valid += 1
+
+    return len(agent.files), {"valid_summaries": valid}
+
+
+def bench_fia_detailed(companies, workdir, responses, args, cache):
+    csv_path = workdir / "companies.csv"
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Company"])
+        writer.writerows([company["Company"]] for company in companies)
+
+    client = FakeBedrockClient(
+        responses, Latency(args.llm_latency, args.jitter, seed=5), min_cache_tokens=args.min_cache_tokens
+    )
+    fia.model_client = BedrockModelClient(client)
+    fia.analysis_cache = cache
+
+    output = fia.analyze_sp500_detailed(str(csv_path), company_column="Company")
+    analyzed = output["summary"]["analyzed"] if output else 0
+    return len(companies), {"analyzed": analyzed, "cache_misses": client.calls["company"]}
+
+
+def bench_pipeline(companies, workdir, responses, args):
+    """The analyze_stock companies through pipeline.py (classification and
+    S3 export included), with the fixture bills summarized alongside"""
+    client = FakeOpenAIClient(responses, Latency(args.llm_latency, args.jitter, seed=1))
+    orchestrator.model_client = OpenAIModelClient(client, default_model=orchestrator.MODEL_ID, default_tier="extraction")
+    orchestrator.tavily_client = FakeTavilyClient(responses, Latency(args.search_latency, args.jitter, seed=2))
+    orchestrator.sec_client = FakeDownloader()
+    FakeDownloader.latency = Latency(args.sec_latency, args.jitter, seed=3)
+
+    bedrock = BedrockModelClient(
+        FakeBedrockClient(
+            responses, Latency(args.llm_latency, args.jitter, seed=5), min_cache_tokens=args.min_cache_tokens
+        )
+    )
+    fia.model_client = bedrock
+    fia.analysis_cache = fia.AnalysisCache(bucket_name=None)
+    law_reader = LawReaderAgent(directory=str(FIXTURES_DIR / "bills") + "/")
+    law_reader.model_client = bedrock
+
+    storage = S3Storage("benchmark", client=FilesystemS3Client(workdir / "s3"))
+    runner = pipeline.Pipeline(
+        storage,
+        bills_folder=str(FIXTURES_DIR / "bills"),
+        output_folder=str(workdir / "pipeline_analyses"),
+        state_folder=str(workdir / "pipeline_state"),
+        progress_interval=0,
+    )
+    run_companies = [
+        {
+            "ticker": company["Ticker"],
+            "company_name": company["Company"],
+            "sector": company["Sector"],
+            "industry": company["Industry"],
+        }
+        for company in companies
+    ]
+    results = asyncio.run(runner.run(run_companies, law_reader))
+
+    stages = {
+        stage.name: {"done": stage.done, "failed": stage.failed, "busy_s": round(stage.busy_s, 3)}
+        for stage in runner.progress.stages
+    }
+    return len(results), {"calls_by_kind": client.calls, "bedrock_calls": bedrock.client.calls, "stages": stages}
+
+
+def large_filings(copies):
+    """Fixture filings with their body repeated copies times (~70 tables and
+    ~0.4 MB per 10 copies), closer to a real 10-K than the fixtures themselves.
+    lxml allocates outside the Python heap, so tracemalloc undercounts the
+    peak memory of sec_parsing."""
+    filings = []
+    for path in sorted((FIXTURES_DIR / "filings").glob("*.html")):
+        html = path.read_bytes()
+        head, body = html.split(b"<body>", 1)
+        body = body.rsplit(b"</body>", 1)[0]
+        filings.append(head + b"<body>" + body * copies + b"</body></html>")
+    return filings
+
+
+def bench_sec_parsing(filings, converter):
+    convert = CONVERTERS[converter]
+    for filing in filings:
+        with tracer.span("sec_parse", converter=converter):
+            convert(filing)
+    return len(filings), {"filing_mb": round(sum(map(len, filings)) / 1024 / 1024, 2)}
+
+
+def traced_lambda_handler(handler):
+    """Wrap the FIA lambda handler in a span so each company shows up as a step"""
+
+    def wrapper(event, context):
+        with tracer.span("fia_company"):
+            return handler(event, context)
+
+    return wrapper
+
+
+def run_benchmarks(args):
+    responses = RecordedResponses()
+    companies = benchmark_companies(args.companies)
+    fia_companies = benchmark_companies(args.fia_companies)
+    filings = large_filings(args.filing_copies)
+    selected = args.scenarios or SCENARIOS
+    results = []
+
+    fia.lambda_handler = traced_lambda_handler(fia.lambda_handler)
+    fia_cache = fia.AnalysisCache(bucket_name=None)
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        workdir = Path(tmp)
+        # analyze_sec_filing and analyze_sp500_detailed write to the working directory
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            scenarios = {
+                "analyze_stock": lambda: bench_analyze_stock(companies, workdir, responses, args),
+                "law_summary": lambda: bench_law_summary(responses, args),
+                "fia_detailed_cold": lambda: bench_fia_detailed(fia_companies, workdir, responses, args, fia_cache),
+                # Same companies again: every analysis should come from the cache
+                "fia_detailed_warm": lambda: bench_fia_detailed(fia_companies, workdir, responses, args, fia_cache),
+                "sec_parsing": lambda: bench_sec_parsing(filings, "sec_filing"),
+                "sec_parsing_legacy": lambda: bench_sec_parsing(filings, "sec_filing_legacy"),
+                "pipeline": lambda: bench_pipeline(companies, workdir, responses, args),
+            }
+            for name in SCENARIOS:
+                if name not in selected:
+                    continue
+                print(f"⏱️  {name}...")
+                results.append(run_scenario(name, scenarios[name], not args.no_memory, args.verbose))
+        finally:
+            os.chdir(previous_cwd)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "settings": {
+            "companies": args.companies,
+            "fia_companies": args.fia_companies,
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "sec_latency": args.sec_latency,
+            "jitter": args.jitter,
+            "min_cache_tokens": args.min_cache_tokens,
+            "filing_copies": args.filing_copies,
+        },
+        "results": results,
+    }
+
+
+# ===== REPORTING =====
+
+
+def print_report(report):
+    print(f"\n{'=' * 70}")
+    print("📊 BENCHMARK RESULTS")
+    print(f"{'=' * 70}")
+    print(f"{'scenario':<20s} {'items':>6s} {'wall s':>8s} {'items/s':>9s} {'peak MB':>8s} {'calls':>6s} {'tokens':>9s} {'cached':>8s}")
+    for result in report["results"]:
+        peak = f"{result['peak_memory_mb']:.1f}" if result["peak_memory_mb"] is not None else "-"
+        tokens = result["prompt_tokens"] + result["completion_tokens"]
+        print(
+            f"{result['scenario']:<20s} {result['items']:>6d} {result['wall_s']:>8.2f} "
+            f"{result['throughput_per_s']:>9.2f} {peak:>8s} {result['model_calls']:>6d} {tokens:>9d} "
+            f"{result['cached_tokens']:>8d}"
+        )
+
+    for result in report["results"]:
+        if not any(tier["llm_calls"] for tier in result["tiers"].values()):
+            continue
+        print(
+            f"\n{result['scenario']} - per model tier "
+            f"(triage kept {result['triage_positive']}, dropped {result['triage_negative']} chunks)"
+        )
+        print(f"   {'tier':<22s} {'calls':>6s} {'prompt':>9s} {'completion':>11s}")
+        for name, tier in result["tiers"].items():
+            print(f"   {name:<22s} {tier['llm_calls']:>6d} {tier['prompt_tokens']:>9d} {tier['completion_tokens']:>11d}")
+
+    for result in report["results"]:
+        print(f"\n{result['scenario']} - per-step latency")
+        print(f"   {'step':<22s} {'count':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+        for name, step in result["steps"].items():
+            print(
+                f"   {name:<22s} {step['count']:>6d} {step['p50_ms']:>9.1f} "
+                f"{step['p95_ms']:>9.1f} {step['p99_ms']:>9.1f}"
+            )
+
+
+def compare_to_baseline(report, baseline_path, tolerance):
+    """Print deltas against a previous --output file; returns the regressions"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n📈 Compared to {baseline_path} (tolerance {tolerance:.0%})")
+    for result in report["results"]:
+        old = baseline.get(result["scenario"])
+        if not old:
+            continue
+
+        throughput_delta = result["throughput_per_s"] / old["throughput_per_s"] - 1 if old["throughput_per_s"] else 0.0
+        line = f"   {result['scenario']:<20s} throughput {throughput_delta:+7.1%}"
+        if throughput_delta < -tolerance:
+            regressions.append(f"{result['scenario']} throughput {throughput_delta:+.1%}")
+
+        if result["peak_memory_mb"] and old.get("peak_memory_mb"):
+            memory_delta = result["peak_memory_mb"] / old["peak_memory_mb"] - 1
+            line += f"   peak memory {memory_delta:+7.1%}"
+            if memory_delta > tolerance:
+                regressions.append(f"{result['scenario']} peak memory {memory_delta:+.1%}")
+        print(line)
+
+    for regression in regressions:
+        print(f"❌ REGRESSION: {regression}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks on recorded fixtures")
+    parser.add_argument("--companies", type=int, default=4, help="companies for analyze_stock")
+    parser.add_argument("--fia-companies", type=int, default=4, help="companies for analyze_sp500_detailed")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument("--search-latency", type=float, default=0.02, help="seconds per Tavily search")
+    parser.add_argument("--sec-latency", type=float, default=0.02, help="seconds per 10-K download")
+    parser.add_argument(
+        "--min-cache-tokens", type=int, default=1024, help="smallest prompt prefix the fake Bedrock caches"
+    )
+    parser.add_argument("--filing-copies", type=int, default=20, help="body repeats per filing for sec_parsing")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to every latency")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows allocation-heavy code)")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipelines' own output")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON from a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to: {args.output}")
+
+    if args.baseline and compare_to_baseline(report, args.baseline, args.tolerance):
+        sys.exit(1)
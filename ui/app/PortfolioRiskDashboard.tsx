@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { PieChart, Pie, Cell, ResponsiveContainer, Treemap } from "recharts";
 import { ChevronDown, ChevronUp } from "lucide-react";
 
@@ -114,6 +114,18 @@ interface Props {
     company_details: Company[];
   };
   initialAnalysis: Record<string, Analysis>;
+  detailShards?: Record<string, number>;
+  aggregates?: RiskAggregates;
+}
+
+interface SectorAggregate {
+  name: string;
+  weight: number;
+  weighted_risk: number;
+}
+
+interface RiskAggregates {
+  sectors: SectorAggregate[];
 }
 
 interface PortfolioDataItem {
@@ -139,9 +151,31 @@ interface SummaryItem {
   keypoints: string[];
 }
 
+// Detail shards are gzip-compressed JSON; decompress in the browser unless
+// the server already did it through Content-Encoding
+const fetchDetailShard = async (
+  shard: number
+): Promise<Record<string, Partial<Analysis>>> => {
+  const res = await fetch(`/bundle/details/${shard}.json.gz`);
+  if (!res.ok) {
+    throw new Error(`Failed to load detail shard ${shard}`);
+  }
+
+  const buffer = new Uint8Array(await res.arrayBuffer());
+  if (buffer[0] === 0x1f && buffer[1] === 0x8b) {
+    const stream = new Blob([buffer])
+      .stream()
+      .pipeThrough(new DecompressionStream("gzip"));
+    return new Response(stream).json();
+  }
+  return JSON.parse(new TextDecoder().decode(buffer));
+};
+
 export function PortfolioRiskDashboard({
   initialData,
   initialAnalysis,
+  detailShards,
+  aggregates,
 }: Props) {
   const [activeSection, setActiveSection] = useState<string>("portfolio");
   const [hoveredSector, setHoveredSector] = useState<number | null>(null);
@@ -153,12 +187,25 @@ export function PortfolioRiskDashboard({
   const [companyData, setCompanyData] = useState<Company[]>([]);
   const [analysisData, setAnalysisData] = useState<Record<string, Analysis>>({});
   const [sectors, setSectors] = useState<string[]>([]);
+  const loadedShards = useRef<Set<number>>(new Set());
 
   useEffect(() => {
     if (initialData && initialAnalysis) {
       setCompanyData(initialData.company_details);
       setAnalysisData(initialAnalysis);
 
+      if (aggregates) {
+        setPortfolioData(
+          aggregates.sectors.map((sector) => ({
+            name: sector.name,
+            value: sector.weight,
+            color: SECTOR_COLORS[sector.name] || "#6b7280",
+          }))
+        );
+        setSectors(aggregates.sectors.map((sector) => sector.name).sort());
+        return;
+      }
+
       const sectorMap: Record<string, number> = {};
       initialData.company_details.forEach((company) => {
         const sector = company.gics_sector;
@@ -180,7 +227,30 @@ export function PortfolioRiskDashboard({
       setPortfolioData(portfolioArray);
       setSectors(Object.keys(sectorMap).sort());
     }
-  }, [initialData, initialAnalysis]);
+  }, [initialData, initialAnalysis, aggregates]);
+
+  useEffect(() => {
+    if (!detailShards || !selectedStock) return;
+
+    const shard = detailShards[selectedStock];
+    if (shard === undefined || loadedShards.current.has(shard)) return;
+
+    loadedShards.current.add(shard);
+    fetchDetailShard(shard)
+      .then((details) => {
+        setAnalysisData((prev) => {
+          const next = { ...prev };
+          Object.entries(details).forEach(([ticker, detail]) => {
+            next[ticker] = { ...next[ticker], ...detail };
+          });
+          return next;
+        });
+      })
+      .catch((error) => {
+        console.error("Error loading analysis details:", error);
+        loadedShards.current.delete(shard);
+      });
+  }, [selectedStock, detailShards]);
 
   const getSectorStocks = (sector: string): Stock[] => {
     return companyData
@@ -241,6 +311,11 @@ export function PortfolioRiskDashboard({
   };
 
   const getCurrentSectorExposure = (sector: string): number => {
+    const precomputed = aggregates?.sectors.find((item) => item.name === sector);
+    if (precomputed) {
+      return precomputed.weighted_risk;
+    }
+
     const stocks = getSectorStocks(sector);
     let totalWeightedRisk = 0;
     let totalWeight = 0;
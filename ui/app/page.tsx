@@ -2,7 +2,57 @@ import { PortfolioRiskDashboard } from './PortfolioRiskDashboard';
 import fs from 'fs';
 import path from 'path';
 
+// Compact bundle written by AgentOrchestrator/dashboard_export.py: a columnar
+// summary for first paint, with per-ticker details fetched lazily by shard
+async function loadBundle() {
+  let summary;
+  try {
+    const summaryPath = path.join(process.cwd(), 'public', 'bundle', 'summary.json');
+    summary = JSON.parse(await fs.promises.readFile(summaryPath, 'utf-8'));
+  } catch (err) {
+    return null;
+  }
+
+  // Sector weights and weighted risk precomputed at export time
+  let aggregates;
+  try {
+    const aggregatesPath = path.join(process.cwd(), 'public', 'bundle', 'aggregates.json');
+    aggregates = JSON.parse(await fs.promises.readFile(aggregatesPath, 'utf-8'));
+  } catch (err) {
+    aggregates = undefined;
+  }
+
+  const { columns, sectors } = summary;
+  const companyDetails = [];
+  const analysisMap = {};
+  const shardOf = {};
+
+  columns.ticker.forEach((ticker, i) => {
+    companyDetails.push({
+      ticker,
+      company: columns.company[i],
+      gics_sector: sectors[columns.sector[i]],
+      weight: String(columns.weight[i]),
+    });
+    analysisMap[ticker] = {
+      DirectRiskFactor: columns.direct[i],
+      IndirectRiskFactor: columns.indirect[i],
+      TimeFactor: columns.time[i],
+      Summary: '',
+      SummaryKeypoints: []
+    };
+    shardOf[ticker] = columns.shard[i];
+  });
+
+  return { mainData: { company_details: companyDetails }, analysisMap, shardOf, aggregates };
+}
+
 async function loadPortfolioData() {
+  const bundle = await loadBundle();
+  if (bundle) {
+    return bundle;
+  }
+
   try {
     const dataPath = path.join(process.cwd(), 'app', 'data.txt');
     const dataContent = await fs.promises.readFile(dataPath, 'utf-8');
@@ -25,7 +75,7 @@ async function loadPortfolioData() {
       }
     }
     
-    return { mainData, analysisMap };
+    return { mainData, analysisMap, shardOf: undefined, aggregates: undefined };
   } catch (error) {
     console.error('Error loading data:', error);
     return null;
@@ -43,5 +93,12 @@ export default async function Page() {
     );
   }
   
-  return <PortfolioRiskDashboard initialData={data.mainData} initialAnalysis={data.analysisMap} />;
+  return (
+    <PortfolioRiskDashboard
+      initialData={data.mainData}
+      initialAnalysis={data.analysisMap}
+      detailShards={data.shardOf}
+      aggregates={data.aggregates}
+    />
+  );
 }
\ No newline at end of file